@@ -0,0 +1,229 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import bindparam, text
+
+# orjson 为可选依赖，未安装时退回标准库 json（输出格式相同）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+MAX_IDS = 1000
+
+# JSON API 资源定义：
+#   fields  对外字段名 -> SQL 表达式（field 选择只能在这里面挑）
+#   ids     ?ids= 批量查询匹配的列
+#   key     游标分页的排序键（对外字段名，须唯一且有索引）
+#   emp     ?emp_ids= 匹配的列；date ?from= / ?to= 匹配的日期列
+#   bitmap_month  读位图视图时的月份列：日期是由位图展开计算的，另按所在月份加条件才能走索引。
+#                 逐天记录已归档时，早于归档水位的部分从位图视图读取（见 fetch 的 archived_before）
+#   archive_from  结构相同的归档表：查询范围达到归档水位时与热表合并读取
+RESOURCES = {
+    'employees': {
+        'from': """
+            Employee e
+            JOIN Position p ON e.pos_id = p.pos_id
+            JOIN Department d ON p.dept_id = d.dept_id
+        """,
+        'fields': {
+            'emp_id': 'e.emp_id', 'name': 'e.name', 'gender': 'e.gender', 'education': 'e.education',
+            'phone': 'e.phone', 'email': 'e.email', 'salary': 'e.salary', 'pos_id': 'e.pos_id',
+            'pos_name': 'p.pos_name', 'dept_id': 'p.dept_id', 'dept_name': 'd.dept_name',
+        },
+        'ids': 'e.emp_id',
+        'key': ['emp_id'],
+    },
+    'positions': {
+        'from': "Position p",
+        'fields': {
+            'pos_id': 'p.pos_id', 'pos_name': 'p.pos_name', 'dept_id': 'p.dept_id',
+            'min_salary': 'p.min_salary', 'max_salary': 'p.max_salary',
+        },
+        'ids': 'p.pos_id',
+        'key': ['pos_id'],
+    },
+    'departments': {
+        'from': "Department d",
+        'fields': {
+            'dept_id': 'd.dept_id', 'dept_name': 'd.dept_name', 'manager_id': 'd.manager_id',
+            'function_desc': 'd.function_desc', 'phone': 'd.phone',
+        },
+        'ids': 'd.dept_id',
+        'key': ['dept_id'],
+    },
+    # 考勤按员工批量查询：ids 为员工编号，按 (emp_id, date) 唯一索引分页；
+    # 位图存储模式下改读兼容视图 AttendanceDays
+    'attendance': {
+        'from': "Attendance a",
+        'bitmap_from': "AttendanceDays a",
+        'bitmap_month': 'a.month',
+        'fields': {'emp_id': 'a.emp_id', 'date': 'a.date'},
+        'ids': 'a.emp_id',
+        'key': ['emp_id', 'date'],
+        'date': 'a.date',
+    },
+    'leaves': {
+        'from': "LeaveRequest l",
+        'archive_from': "LeaveRequestArchive l",
+        'fields': {
+            'leave_id': 'l.leave_id', 'emp_id': 'l.emp_id', 'leave_type': 'l.leave_type',
+            'start_date': 'l.start_date', 'end_date': 'l.end_date', 'request_time': 'l.request_time',
+            'reason': 'l.reason', 'status': 'l.status', 'reviewer_id': 'l.reviewer_id',
+            'review_time': 'l.review_time',
+        },
+        'ids': 'l.leave_id',
+        'key': ['leave_id'],
+        'emp': 'l.emp_id',
+        'date': 'l.start_date',
+    },
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    raise TypeError(f"无法序列化 {type(obj).__name__}")
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=_default, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise ApiError(400, '无效的 cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ApiError(400, '无效的 cursor')
+    return values
+
+
+def split_list(value, limit=MAX_IDS):
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if len(items) > limit:
+        raise ApiError(400, f'一次最多查询 {limit} 个编号')
+    return items
+
+
+def fetch(conn, resource, args, bitmap=False, archived_before=None):
+    # 按查询参数取一页数据，返回 {"data": [...], "next_cursor": ...}。
+    # archived_before 为归档水位（调用方仅在查询范围达到水位时传入）：有归档表的资源同时读归档表；
+    # 考勤则是水位之前的日期读位图视图、之后的仍读热表。两段各自排序取一页后 UNION ALL 合并
+    spec = RESOURCES.get(resource)
+    if spec is None:
+        raise ApiError(404, f'未知资源：{resource}')
+
+    fields = list(spec['fields'])
+    if args.get('fields'):
+        fields = split_list(args['fields'])
+        unknown = [f for f in fields if f not in spec['fields']]
+        if unknown:
+            raise ApiError(400, f"未知字段：{', '.join(unknown)}")
+    try:
+        limit = min(max(int(args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise ApiError(400, 'limit 必须是整数')
+
+    key = spec['key']
+    columns = list(dict.fromkeys(fields + key))  # 排序键总是查询出来，用于生成下一页游标
+    conditions = []
+    month_conditions = []  # 只加在位图视图上
+    params = {'limit': limit + 1}
+    expanding = []
+    history = archived_before is not None and ('archive_from' in spec or 'bitmap_month' in spec)
+
+    if args.get('ids'):
+        conditions.append(f"{spec['ids']} IN :ids")
+        params['ids'] = split_list(args['ids'])
+        expanding.append('ids')
+    if args.get('emp_ids') and 'emp' in spec:
+        conditions.append(f"{spec['emp']} IN :emp_ids")
+        params['emp_ids'] = split_list(args['emp_ids'])
+        expanding.append('emp_ids')
+    if 'date' in spec:
+        # to 为开区间，其所在月份仍可能有更早的日期，因此月份两端都是闭区间
+        for arg, op, month_op in (('from', '>=', '>='), ('to', '<', '<=')):
+            if args.get(arg):
+                try:
+                    params[f'date_{arg}'] = date.fromisoformat(args[arg])
+                except ValueError:
+                    raise ApiError(400, f'{arg} 必须是 YYYY-MM-DD 格式')
+                conditions.append(f"{spec['date']} {op} :date_{arg}")
+                if 'bitmap_month' in spec:
+                    params[f'month_{arg}'] = params[f'date_{arg}'].replace(day=1)
+                    month_conditions.append(f"{spec['bitmap_month']} {month_op} :month_{arg}")
+
+    # 键集游标：(k1, k2) > (:c0, :c1) 展开成 OR 形式，MySQL 才能用上索引范围扫描
+    if args.get('cursor'):
+        values = decode_cursor(args['cursor'], len(key))
+        clauses = []
+        for i, name in enumerate(key):
+            parts = [f"{spec['fields'][k]} = :c{j}" for j, k in enumerate(key[:i])]
+            parts.append(f"{spec['fields'][name]} > :c{i}")
+            clauses.append('(' + ' AND '.join(parts) + ')')
+            params[f'c{i}'] = values[i]
+        conditions.append('(' + ' OR '.join(clauses) + ')')
+
+    def select(source, conditions):
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"""
+            SELECT {', '.join(f"{spec['fields'][c]} AS {c}" for c in columns)}
+            FROM {source}
+            {where}
+            ORDER BY {', '.join(spec['fields'][k] for k in key)}
+            LIMIT :limit
+        """
+
+    if history:
+        if 'archive_from' in spec:
+            archived, recent = select(spec['archive_from'], conditions), select(spec['from'], conditions)
+        else:
+            params['archived_before'] = archived_before
+            archived = select(spec['bitmap_from'], conditions + month_conditions
+                              + [f"{spec['bitmap_month']} < :archived_before"])
+            recent = select(spec['from'], conditions + [f"{spec['date']} >= :archived_before"])
+        stmt = text(f"""
+            SELECT * FROM ({archived}) archived
+            UNION ALL
+            SELECT * FROM ({recent}) recent
+            ORDER BY {', '.join(key)}
+            LIMIT :limit
+        """)
+    elif bitmap and 'bitmap_from' in spec:
+        stmt = text(select(spec['bitmap_from'], conditions + month_conditions))
+    else:
+        stmt = text(select(spec['from'], conditions))
+    if expanding:
+        stmt = stmt.bindparams(*(bindparam(name, expanding=True) for name in expanding))
+    rows = conn.execute(stmt, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]._mapping[k] for k in key])
+    return {
+        'data': [{f: row._mapping[f] for f in fields} for row in rows],
+        'next_cursor': next_cursor,
+    }
@@ -1,59 +1,297 @@
 import re
-from datetime import date
-import bcrypt
+import io
+import threading
+import click
+import time
+from datetime import date, timedelta
 from flask import Flask
-from flask import request, render_template, redirect, url_for, session, flash
+from flask import request, render_template, redirect, url_for, session, flash, g, jsonify, abort, Response
 #from werkzeug.security import check_password_hash, generate_password_hash
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 import pymysql
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.exc import IntegrityError
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+from contextlib import contextmanager
+from hashing import PasswordHasher, HasherBusy
+from pool_monitor import PoolMonitor
+from checkin import CheckinBatcher, CheckinRejected
+import attendance_summary
+import employee_import
+import exports
+import datagen
+import api
+import payroll
+import salary_adjust
+import leave_calendar
+import reconcile
+import archive
+from id_allocator import DEPT_ID_MAX_LENGTH, IdAllocator, create_sequence, pos_sequence
+from ref_cache import RefDataCache
+from request_metrics import RequestMetrics
+from conditional_cache import ConditionalCache
+from cache_versions import CacheVersionTracker
+from replica_router import ReplicaRouter
+from employee_import import EDUCATION_LEVELS
 
 app = Flask(__name__)
 app.config.from_pyfile('config.py')
 db = SQLAlchemy(app)
+hasher = PasswordHasher()
+hasher.init_app(app)
+pool_monitor = PoolMonitor()
+checkin_batcher = CheckinBatcher()
+id_allocator = IdAllocator()
+ref_cache = RefDataCache()
+request_metrics = RequestMetrics()
+conditional_cache = ConditionalCache()
+cache_versions = CacheVersionTracker()
+replica_router = ReplicaRouter()
+payroll_analytics = payroll.PayrollAnalytics()
+with app.app_context():
+    pool_monitor.init_app(app, db.engine)
+    checkin_batcher.init_app(app, db.engine)
+    id_allocator.init_app(app, db.engine)
+    ref_cache.init_app(app, db.engine)
+    request_metrics.init_app(app, db.engine)
+    conditional_cache.init_app(app, db.engine, connection=lambda: get_primary_conn(),
+                               read_connection=lambda: g.get('db_read_conn'))
+    cache_versions.init_app(app, db.engine)
+    replica_router.init_app(app, db.engine)
+    for replica in replica_router.replicas:
+        request_metrics.watch(replica)
+checkin_batcher.add_flush_hook(attendance_summary.record_checkins)
+
+
+@app.cli.command('rebuild-attendance-summary')
+@click.option('--batch-size', default=500, show_default=True, help='每批处理的员工数')
+def rebuild_attendance_summary(batch_size):
+    """从 Attendance（及已有位图）全量重建月度考勤汇总与出勤位图"""
+    attendance_summary.rebuild(db.engine, batch_size=batch_size, log=click.echo)
+
+
+@app.cli.command('compact-attendance')
+@click.option('--batch-size', default=500, show_default=True, help='每批处理的员工数')
+def compact_attendance(batch_size):
+    """位图存储模式下删除已写入位图的 Attendance 逐天记录"""
+    if app.config.get('ATTENDANCE_STORAGE', 'rows') != 'bitmap':
+        raise click.ClickException("请先将 ATTENDANCE_STORAGE 设为 'bitmap'，否则导出与 API 仍读取逐天记录")
+    attendance_summary.compact(db.engine, batch_size=batch_size, log=click.echo)
+
+
+@app.cli.command('archive-history')
+@click.option('--retention-months', default=None, type=click.IntRange(min=1),
+              help='热表保留最近几个月（含当月），缺省为 ARCHIVE_RETENTION_MONTHS')
+@click.option('--batch-size', default=1000, show_default=True, help='每个事务移动的行数')
+def archive_history(retention_months, batch_size):
+    """把保留期之前已结束的考勤、请假、岗位变动记录分批移入归档表"""
+    cutoff = archive.retention_cutoff(retention_months or app.config.get('ARCHIVE_RETENTION_MONTHS', 24))
+    totals = archive.archive_closed(db.engine, cutoff, batch_size=batch_size, log=click.echo)
+    click.echo(f"{cutoff} 之前：" + '，'.join(f"{table} {moved} 行" for table, moved in totals.items()))
+
+
+@app.cli.command('reconcile-attendance')
+@click.option('--month', default=None, help='对账月份 YYYY-MM，缺省为上个月')
+@click.option('--workers', default=None, type=int, help='并行进程数，缺省为 RECONCILE_WORKERS')
+def reconcile_attendance(month, workers):
+    """按部门并行核对考勤与已批准请假，结果写入 AttendanceReconciliation"""
+    if month:
+        target = attendance_summary.parse_month(month)
+        if target is None:
+            raise click.BadParameter('格式应为 YYYY-MM', param_hint='--month')
+    else:
+        target = attendance_summary.month_start(date.today().replace(day=1) - timedelta(days=1))
+    started = time.perf_counter()
+    totals = reconcile.reconcile_month(db.engine, target, workers=workers or app.config.get('RECONCILE_WORKERS'),
+                                       engine_options=app.config.get('SQLALCHEMY_ENGINE_OPTIONS'), log=click.echo)
+    click.echo(f"{target.strftime('%Y-%m')}：{totals['departments']} 个部门，{totals['employees']} 名员工，"
+               f"未说明缺勤 {totals['absent_days']} 天，用时 {time.perf_counter() - started:.1f} 秒")
+
+
+@app.cli.command('generate-data')
+@click.option('--departments', default=100, show_default=True)
+@click.option('--positions-per-dept', default=5, show_default=True)
+@click.option('--employees', default=50000, show_default=True)
+@click.option('--attendance-days', default=730, show_default=True, help='生成最近多少天的考勤')
+@click.option('--leaves-per-employee', default=2, show_default=True)
+@click.option('--max-position-changes', default=2, show_default=True, help='每名员工最多的岗位变动次数')
+@click.option('--chunk-size', default=5000, show_default=True, help='每个事务写入的行数')
+@click.option('--fast-load', is_flag=True, help='灌数期间删除大表二级索引并关闭唯一性/外键检查，结束后重建')
+@click.option('--password', default='bench123', show_default=True, help='生成账号的统一密码')
+@click.option('--random-seed', default=42, show_default=True)
+def generate_data(departments, positions_per_dept, employees, attendance_days, leaves_per_employee,
+                  max_position_changes, chunk_size, fast_load, password, random_seed):
+    """按规模生成合成测试数据（遵守岗位变动与部门负责人触发器的约束）"""
+    counts = datagen.seed(
+        db.engine, id_allocator, departments=departments, positions_per_dept=positions_per_dept,
+        employees=employees, attendance_days=attendance_days, leaves_per_employee=leaves_per_employee,
+        max_position_changes=max_position_changes, chunk_size=chunk_size, fast_load=fast_load,
+        password=password, random_seed=random_seed, log=click.echo,
+    )
+    click.echo('，'.join(f"{key} {value}" for key, value in counts.items()))
+
+
+# 请求级数据库连接：一个请求内所有查询共用一个连接，请求结束时统一归还连接池。
+# 以 @replica_router.read_only 标记的路由读副本（用户写后粘滞期内除外），其余都走主库
+def get_conn():
+    if g.get('read_replica'):
+        if 'db_read_conn' not in g:
+            conn = replica_router.connect()
+            if conn is None:
+                g.read_replica = False
+                return get_primary_conn()
+            g.db_read_conn = conn
+        return g.db_read_conn
+    return get_primary_conn()
+
+
+def get_primary_conn():
+    if 'db_conn' not in g:
+        start = time.perf_counter()
+        g.db_conn = db.engine.connect()
+        pool_monitor.record_wait(time.perf_counter() - start)
+    return g.db_conn
+
+
+@contextmanager
+def db_connection():
+    # 只读查询使用；退出时不关闭连接，由 release_db_conn 统一归还
+    yield get_conn()
+
+
+@contextmanager
+def db_transaction():
+    # 写事务总是在主库上执行
+    conn = get_primary_conn()
+    if g.get('db_tx_active'):
+        # 嵌套调用时并入外层事务
+        yield conn
+        return
+    if conn.in_transaction():
+        # 结束此前只读查询自动开启的事务
+        conn.commit()
+    g.db_tx_active = True
+    try:
+        with conn.begin():
+            yield conn
+    finally:
+        g.db_tx_active = False
+    # 已提交：接下来一段时间该用户的读请求固定走主库
+    replica_router.mark_write()
+
+
+@app.teardown_request
+def release_db_conn(exc):
+    for key in ('db_conn', 'db_read_conn'):
+        conn = g.pop(key, None)
+        if conn is not None:
+            conn.close()
+    pool_monitor.check_request_leaks(request.endpoint)
+
+
+# 请求级身份上下文：登录时一次性写入 session，之后每个请求直接从 session 装载到 g，
+# 不再逐路由查询 systemuser
+@app.before_request
+def load_identity():
+    g.user_id = session.get('user_id')
+    g.emp_id = session.get('emp_id')
+    g.role = session.get('role')
+    g.name = session.get('name')
+
+
+def login_required(role=None):
+    # 校验登录状态，可选校验角色（'员工' / '领导'）
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if g.user_id is None or g.emp_id is None:
+                return redirect(url_for('login'))
+            if role is not None and g.role != role:
+                flash('权限不足，请重新登录', 'error')
+                return redirect(url_for('login'))
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
 
 
 @app.route("/")
 def index():
     try:
-        db.session.execute(text('SELECT 1'))  # 这里用 text() 包裹
+        get_conn().execute(text('SELECT 1'))  # 这里用 text() 包裹
         return "数据库连接成功!Flask 项目已启动。"
     except Exception as e:
         return f"数据库连接失败：{e}"
 
+@app.route('/admin/pool_stats')
+@login_required('领导')
+def pool_stats():
+    return jsonify(db_pool=pool_monitor.metrics(), bcrypt=hasher.metrics(), checkin=checkin_batcher.metrics(),
+                   id_allocator=id_allocator.metrics(), refdata=ref_cache.metrics(),
+                   requests=request_metrics.metrics(), response_cache=conditional_cache.metrics(),
+                   replicas=replica_router.metrics(), payroll=payroll_analytics.metrics(),
+                   cache_versions=cache_versions.metrics())
+
+
+# Prometheus 抓取入口：请求耗时 / SQL 统计，以及各子系统的计数
+@app.route('/metrics')
+def prometheus_metrics():
+    token = app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+    body = request_metrics.render_prometheus({
+        'db_pool': pool_monitor.metrics(),
+        'bcrypt': hasher.metrics(),
+        'checkin': checkin_batcher.metrics(),
+        'id_allocator': id_allocator.metrics(),
+        'refdata': ref_cache.metrics(),
+        'response_cache': conditional_cache.metrics(),
+        'replicas': replica_router.metrics(),
+        'payroll': payroll_analytics.metrics(),
+        'cache_versions': cache_versions.metrics(),
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
 
-        # 查询用户账号信息（带上 emp_id）
-        conn = db.engine.connect()
-        result = conn.execute(
-            text("SELECT user_id, password_hash, role, emp_id FROM systemuser WHERE username = :username"),
-            {"username": username}
-        )
-        user = result.fetchone()
+        # 一次查询取回账号信息、emp_id 与员工姓名
+        with db_connection() as conn:
+            user = conn.execute(text("""
+                SELECT u.user_id, u.password_hash, u.role, u.emp_id, e.name
+                FROM systemuser u
+                LEFT JOIN employee e ON u.emp_id = e.emp_id
+                WHERE u.username = :username
+            """), {"username": username}).fetchone()
+
+        try:
+            verified = bool(user) and hasher.check(password, user.password_hash)
+        except HasherBusy:
+            return render_template('login.html', error='登录人数过多，请稍后重试')
+
+        if verified:
+            # 哈希成本与配置不一致时，借登录成功时的明文透明地重新哈希
+            if hasher.needs_rehash(user.password_hash):
+                try:
+                    new_hash = hasher.hash(password)
+                    with db_transaction() as conn:
+                        conn.execute(
+                            text("UPDATE systemuser SET password_hash = :ph WHERE user_id = :uid"),
+                            {"ph": new_hash, "uid": user.user_id}
+                        )
+                    hasher.record_rehash()
+                except (HasherBusy, SQLAlchemyError) as e:
+                    app.logger.warning("重新哈希失败：%s", e)
 
-        if user and user[1] and bcrypt.checkpw(password.encode('utf-8'), user[1].encode('utf-8')):
             session['user_id'] = user.user_id
             session['role'] = user.role
             session['emp_id'] = user.emp_id
-
-            # 查询员工姓名
-            name_result = conn.execute(
-                text("SELECT name FROM employee WHERE emp_id = :eid"),
-                {"eid": user.emp_id}
-            ).fetchone()
-
-            if name_result:
-                session['name'] = name_result.name
-            else:
-                session['name'] = '未知'
+            session['name'] = user.name or '未知'
 
             return redirect(url_for('dashboard'))
         else:
@@ -65,11 +303,9 @@ def login():
 
 
 @app.route('/dashboard')
+@login_required()
 def dashboard():
-    if 'user_id' in session and 'role' in session:
-        return render_template('dashboard.html', role=session['role'])
-    else:
-        return redirect(url_for('login'))
+    return render_template('dashboard.html', role=g.role)
 
 
 
@@ -82,24 +318,20 @@ def logout():
 
 
 @app.route('/employee/info')
+@login_required('员工')
+@conditional_cache.cached('Employee', 'Position', 'Department')
 def employee_info():
-    if 'user_id' not in session or session['role'] != '员工':
-        return redirect(url_for('login'))
-
-    conn = db.engine.connect()
-
-    result = conn.execute(text("""
+    result = get_conn().execute(text("""
         SELECT 
             e.name, e.gender, e.education, e.phone, e.email,
             e.salary, p.pos_name,
             d.dept_name, m.name AS manager_name, d.function_desc
-        FROM systemuser u
-        JOIN employee e ON u.emp_id = e.emp_id
+        FROM employee e
         JOIN position p ON e.pos_id = p.pos_id
-        JOIN department d ON LEFT(p.pos_id, LENGTH(d.dept_id)) = d.dept_id
+        JOIN department d ON p.dept_id = d.dept_id
         LEFT JOIN employee m ON d.manager_id = m.emp_id
-        WHERE u.user_id = :uid
-    """), {"uid": session['user_id']})
+        WHERE e.emp_id = :eid
+    """), {"eid": g.emp_id})
 
     row = result.fetchone()
 
@@ -126,18 +358,9 @@ def employee_info():
 
 
 @app.route('/leave/request', methods=['GET', 'POST'])
+@login_required('员工')
 def leave_request():
-    if 'user_id' not in session or session['role'] != '员工':
-        return redirect(url_for('login'))
-
-    # 获取 emp_id
-    conn = db.engine.connect()
-    result = conn.execute(text("SELECT emp_id FROM systemuser WHERE user_id = :uid"),
-                          {"uid": session['user_id']})
-    row = result.fetchone()
-    if not row:
-        return "找不到员工信息"
-    emp_id = row[0]
+    emp_id = g.emp_id
 
     if request.method == 'POST':
         leave_type = request.form['leave_type']
@@ -145,12 +368,28 @@ def leave_request():
         end_date = request.form['end_date']
         reason = request.form['reason']
 
+        try:
+            start_date = date.fromisoformat(start_date)
+            end_date = date.fromisoformat(end_date)
+        except ValueError:
+            return render_template('leave_request_form.html', error="日期格式无效")
         if end_date <= start_date:
             return render_template('leave_request_form.html', error="结束日期必须晚于开始日期")
 
         try:
             #用 begin() 保证自动提交
-            with db.engine.begin() as conn:
+            with db_transaction() as conn:
+                # 锁定员工行，串行化同一员工的并发提交，再用 (emp_id, start_date, end_date) 索引检查重叠
+                conn.execute(text("SELECT emp_id FROM Employee WHERE emp_id = :eid FOR UPDATE"), {"eid": emp_id})
+                overlap = conn.execute(text("""
+                    SELECT start_date, end_date FROM LeaveRequest
+                    WHERE emp_id = :eid AND start_date < :ed AND end_date > :sd
+                      AND status IN ('待审批', '已批准')
+                    LIMIT 1
+                """), {"eid": emp_id, "sd": start_date, "ed": end_date}).fetchone()
+                if overlap:
+                    return render_template('leave_request_form.html',
+                                           error=f"与已有请假（{overlap.start_date} 至 {overlap.end_date}）时间重叠")
                 conn.execute(text("""
                     INSERT INTO LeaveRequest (emp_id, leave_type, start_date, end_date, request_time, reason)
                     VALUES (:eid, :lt, :sd, :ed, :rt, :rs)
@@ -171,71 +410,137 @@ def leave_request():
 
     return render_template('leave_request_form.html')
 
+# 部门请假日历：所选区间内每天的请假人数（已批准 / 含待审批），由扫描线一次算出
+@app.route('/leave/calendar')
+@login_required('领导')
+@replica_router.read_only
+def leave_calendar_view():
+    departments = fetch_departments()
+    dept_id = request.args.get('dept_id') or (departments[0].dept_id if departments else None)
+    start, end = leave_calendar.parse_range(request.args.get('start'), request.args.get('end'))
+
+    # 从部门的员工出发，逐人走 (emp_id, start_date, end_date) 索引取与区间重叠的请假；
+    # 区间早于归档水位时才读归档表（:history = 0 时该分支条件恒假，不访问归档表）
+    conn = get_conn()
+    history = archive.reaches_archive(conn, 'LeaveRequest', start)
+    leaves = conn.execute(text("""
+        SELECT l.leave_id, l.emp_id, e.name, l.leave_type, l.start_date, l.end_date, l.status
+        FROM Position p
+        JOIN Employee e ON e.pos_id = p.pos_id
+        JOIN LeaveRequest l ON l.emp_id = e.emp_id
+        WHERE p.dept_id = :did AND l.start_date < :end AND l.end_date > :start
+          AND l.status IN ('待审批', '已批准')
+        UNION ALL
+        SELECT l.leave_id, l.emp_id, e.name, l.leave_type, l.start_date, l.end_date, l.status
+        FROM Position p
+        JOIN Employee e ON e.pos_id = p.pos_id
+        JOIN LeaveRequestArchive l ON l.emp_id = e.emp_id
+        WHERE :history = 1 AND p.dept_id = :did AND l.start_date < :end AND l.end_date > :start
+          AND l.status IN ('待审批', '已批准')
+        ORDER BY start_date, emp_id
+    """), {"did": dept_id, "start": start, "end": end, "history": int(history)}).fetchall()
+
+    days = leave_calendar.build_calendar(leaves, start, end)
+    return render_template("leave_calendar.html", departments=departments, dept_id=dept_id,
+                           start=start, end=end, days=days, leaves=leaves)
+
+
+# 待审批列表每页条数、单次批量审批的上限
+LEAVE_PAGE_SIZE = 20
+LEAVE_BATCH_LIMIT = 500
+
+
 @app.route('/leave/approve', methods=['GET', 'POST'])
+@login_required('领导')
 def approve_leaves():
-    if 'user_id' not in session or session['role'] != '领导':
-        return redirect(url_for('login'))
-
-    # 新连接（仅用于获取 reviewer_id）
-    with db.engine.connect() as conn:
-        result = conn.execute(text("SELECT emp_id FROM systemuser WHERE user_id = :uid"),
-                              {"uid": session['user_id']})
-        row = result.fetchone()
-        if not row:
-            return "找不到审批者信息"
-        reviewer_id = row[0]
-
-    # POST 提交审批操作
+    reviewer_id = g.emp_id
+    message = None
+    error = None
+
+    # POST 提交审批操作：勾选的多条申请在一个事务里用一条 UPDATE ... IN (...) 处理
     if request.method == 'POST':
-        leave_id = request.form['leave_id']
+        raw_ids = request.form.getlist('leave_ids') or request.form.getlist('leave_id')
+        leave_ids = sorted({int(lid) for lid in raw_ids if lid.isdigit()})[:LEAVE_BATCH_LIMIT]
         action = request.form['action']
         new_status = '已批准' if action == 'approve' else '已拒绝'
 
-        try:
-            with db.engine.begin() as conn:
-                conn.execute(text("""
-                    UPDATE LeaveRequest
-                    SET status = :status,
-                        reviewer_id = :rid,
-                        review_time = :rt
-                    WHERE leave_id = :lid
-                """), {
-                    "status": new_status,
-                    "rid": reviewer_id,
-                    "rt": datetime.now(),
-                    "lid": leave_id
-                })
-        except Exception as e:
-            print("审批失败：", e)
+        if not leave_ids:
+            error = "请先选择要审批的申请"
+        else:
+            try:
+                with db_transaction() as conn:
+                    # 只处理仍为待审批的记录，重复提交不会覆盖已有审批结果
+                    updated = conn.execute(text("""
+                        UPDATE LeaveRequest
+                        SET status = :status,
+                            reviewer_id = :rid,
+                            review_time = :rt
+                        WHERE leave_id IN :ids AND status = '待审批'
+                    """).bindparams(bindparam('ids', expanding=True)), {
+                        "status": new_status,
+                        "rid": reviewer_id,
+                        "rt": datetime.now(),
+                        "ids": leave_ids
+                    }).rowcount
+                message = f"已{new_status[1:]} {updated} 条申请"
+            except Exception as e:
+                print("审批失败：", e)
+                error = f"审批失败：{str(e).splitlines()[0]}"
 
-    # 新连接，用于查询当前所有待审批记录
-    with db.engine.connect() as conn:
+    # 待审批列表按 (request_time, leave_id) 倒序键集分页，走 (status, request_time) 索引范围扫描
+    conn = get_conn()
+    before_time = request.args.get('before_time')
+    before_id = request.args.get('before_id', '')
+    try:
+        before_time = datetime.fromisoformat(before_time) if before_time else None
+    except ValueError:
+        before_time = None
+    if before_time and before_id.isdigit():
         result = conn.execute(text("""
-            SELECT l.leave_id, l.leave_type, l.start_date, l.end_date, l.reason, e.name
+            SELECT l.leave_id, l.leave_type, l.start_date, l.end_date, l.reason, l.request_time, e.name
             FROM LeaveRequest l
             JOIN employee e ON l.emp_id = e.emp_id
             WHERE l.status = '待审批'
-            ORDER BY l.request_time DESC
-        """))
-        leaves = [
-            {
-                'leave_id': row[0],
-                'leave_type': row[1],
-                'start_date': row[2],
-                'end_date': row[3],
-                'reason': row[4],
-                'name': row[5]
-            }
-            for row in result
-        ]
-
-    return render_template('leave_approval.html', leaves=leaves)
+              AND (l.request_time < :bt OR (l.request_time = :bt AND l.leave_id < :bid))
+            ORDER BY l.request_time DESC, l.leave_id DESC
+            LIMIT :limit
+        """), {"bt": before_time, "bid": int(before_id), "limit": LEAVE_PAGE_SIZE + 1}).fetchall()
+    else:
+        before_time = None
+        result = conn.execute(text("""
+            SELECT l.leave_id, l.leave_type, l.start_date, l.end_date, l.reason, l.request_time, e.name
+            FROM LeaveRequest l
+            JOIN employee e ON l.emp_id = e.emp_id
+            WHERE l.status = '待审批'
+            ORDER BY l.request_time DESC, l.leave_id DESC
+            LIMIT :limit
+        """), {"limit": LEAVE_PAGE_SIZE + 1}).fetchall()
+
+    next_url = None
+    if len(result) > LEAVE_PAGE_SIZE:
+        result = result[:LEAVE_PAGE_SIZE]
+        last = result[-1]
+        next_url = url_for('approve_leaves', before_time=last.request_time.isoformat(), before_id=last.leave_id)
+
+    leaves = [
+        {
+            'leave_id': row.leave_id,
+            'leave_type': row.leave_type,
+            'start_date': row.start_date,
+            'end_date': row.end_date,
+            'reason': row.reason,
+            'name': row.name
+        }
+        for row in result
+    ]
+
+    return render_template('leave_approval.html', leaves=leaves, message=message, error=error,
+                           next_url=next_url, is_first_page=before_time is None)
 
 
 @app.route('/change_password', methods=['GET', 'POST'])
+@login_required()
 def change_password():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
     if request.method == 'POST':
         old_password = request.form['old_password'].strip()
         new_password = request.form['new_password'].strip()
@@ -248,32 +553,33 @@ def change_password():
             return render_template('change_password.html', error="新密码格式错误，仅允许6-20位字母数字")
 
         # 获取旧密码哈希
-        with db.engine.connect() as conn:
+        with db_connection() as conn:
             result = conn.execute(
                 text("SELECT password_hash FROM systemuser WHERE user_id = :uid"),
-                {"uid": session['user_id']}
+                {"uid": g.user_id}
             )
             row = result.fetchone()
 
         if not row or not row[0]:
             return render_template('change_password.html', error="用户信息有误")
 
-        stored_hash = row[0].encode('utf-8')
-
-        if not bcrypt.checkpw(old_password.encode('utf-8'), stored_hash):
-            return render_template('change_password.html', error="当前密码不正确")
+        try:
+            if not hasher.check(old_password, row[0]):
+                return render_template('change_password.html', error="当前密码不正确")
 
-        # 生成新哈希
-        new_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+            # 生成新哈希
+            new_hash = hasher.hash(new_password)
+        except HasherBusy:
+            return render_template('change_password.html', error="系统繁忙，请稍后重试")
 
         # 写入数据库
-        with db.engine.begin() as conn:
+        with db_transaction() as conn:
             conn.execute(
                 text("UPDATE systemuser SET password_hash = :ph, last_password_change = :ts WHERE user_id = :uid"),
                 {
                     "ph": new_hash,
                     "ts": datetime.now(),
-                    "uid": session['user_id']
+                    "uid": g.user_id
                 }
             )
 
@@ -283,142 +589,197 @@ def change_password():
 
 
 @app.route('/attendance', methods=['GET', 'POST'])
+@login_required()
 def attendance():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    emp_id = None
-    # 查询 emp_id
-    with db.engine.connect() as conn:
-        result = conn.execute(
-            text("SELECT emp_id FROM systemuser WHERE user_id = :uid"),
-            {"uid": session['user_id']}
-        ).fetchone()
-        if result:
-            emp_id = result[0]
-        else:
-            return "系统错误：找不到员工编号", 500
+    emp_id = g.emp_id
 
     if request.method == 'POST':
-        today = date.today()
-
+        # 交给组提交流水线：重复打卡在内存中判定，新打卡等所在批次提交后才返回
         try:
-            with db.engine.begin() as conn:
-                conn.execute(
-                    text("INSERT INTO Attendance (emp_id, date) VALUES (:eid, :dt)"),
-                    {"eid": emp_id, "dt": today}
-                )
+            if not checkin_batcher.check_in(emp_id):
+                return render_template('attendance.html', error="今天已打卡")
             return render_template('attendance.html', message="打卡成功！")
-        except:
-            return render_template('attendance.html', error="今天已打卡")
+        except CheckinRejected:
+            return render_template('attendance.html', error="员工档案不存在，无法打卡")
+        except Exception as e:
+            app.logger.warning("打卡失败：%s", e)
+            return render_template('attendance.html', error="打卡失败，请稍后重试")
 
     return render_template('attendance.html')
 
 
 @app.route('/attendance/records')
+@login_required()
 def attendance_records():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    # 查询该用户的 emp_id
-    with db.engine.connect() as conn:
-        result = conn.execute(
-            text("SELECT emp_id FROM systemuser WHERE user_id = :uid"),
-            {"uid": session['user_id']}
-        ).fetchone()
-
-        if not result:
-            return "无法找到员工信息", 500
-
-        emp_id = result[0]
-
-        # 查询考勤记录
-        records = conn.execute(
-            text("SELECT date FROM Attendance WHERE emp_id = :eid ORDER BY date DESC"),
-            {"eid": emp_id}
-        ).fetchall()
-
-    return render_template("attendance_records.html", records=records)
+    summaries, month, records, stats = load_attendance(g.emp_id, request.args.get('month'))
+    return render_template("attendance_records.html", summaries=summaries, month=month, records=records,
+                           stats=stats)
+
+
+def load_attendance(emp_id, month_arg):
+    # 只读月度汇总：指定 ?month=YYYY-MM 时由该月出勤位图展开打卡明细，
+    # 本季度出勤天数、全勤月份也都由位图按位计算，不读取逐天记录
+    conn = get_conn()
+    summaries = conn.execute(text("""
+        SELECT month, days_present, first_date, last_date, current_streak, longest_streak, day_mask
+        FROM AttendanceMonthly
+        WHERE emp_id = :eid
+        ORDER BY month DESC
+    """), {"eid": emp_id}).fetchall()
+
+    month = attendance_summary.parse_month(month_arg)
+    records = []
+    if month:
+        mask = next((row.day_mask for row in summaries if row.month == month), 0)
+        records = [{'date': day} for day in reversed(attendance_summary.mask_dates(month, mask))]
+
+    today = date.today()
+    quarter = attendance_summary.quarter_start(today)
+    stats = {
+        'quarter': f"{quarter.year}Q{(quarter.month - 1) // 3 + 1}",
+        'quarter_days': attendance_summary.days_present(summaries, quarter, today + timedelta(days=1)),
+        'perfect_months': {row.month for row in summaries
+                           if attendance_summary.is_perfect(row.month, row.day_mask, today)},
+    }
+    return summaries, month, records, stats
 
 
 @app.route('/leave/records')
+@login_required()
+@conditional_cache.cached('LeaveRequest', 'ArchiveWatermark')
 def leave_records():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    with db.engine.connect() as conn:
-        # 获取当前用户的 emp_id
-        result = conn.execute(
-            text("SELECT emp_id FROM systemuser WHERE user_id = :uid"),
-            {"uid": session['user_id']}
-        ).fetchone()
-
-        if not result:
-            return "找不到用户对应员工编号", 500
-
-        emp_id = result[0]
-
+    # 默认只查热表；?history=all 时连同归档表一起查询
+    history = request.args.get('history') == 'all'
+    with db_connection() as conn:
         # 查询请假记录
         records = conn.execute(
             text("""
                 SELECT leave_type, start_date, end_date, request_time, status
                 FROM LeaveRequest
                 WHERE emp_id = :eid
+                UNION ALL
+                SELECT leave_type, start_date, end_date, request_time, status
+                FROM LeaveRequestArchive
+                WHERE emp_id = :eid AND :history = 1
                 ORDER BY request_time DESC
             """),
-            {"eid": emp_id}
+            {"eid": g.emp_id, "history": int(history)}
         ).fetchall()
+        archived_before = archive.archived_before(conn, 'LeaveRequest')
 
-    return render_template("leave_records.html", records=records)
+    return render_template("leave_records.html", records=records, history=history, archived_before=archived_before)
 
 
 @app.route('/position_change')
+@login_required()
+@conditional_cache.cached('PositionChange', 'Position', 'Department', 'ArchiveWatermark')
 def position_change():
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-
-    with db.engine.connect() as conn:
-        # 获取当前员工编号
-        result = conn.execute(
-            text("SELECT emp_id FROM systemuser WHERE user_id = :uid"),
-            {"uid": session['user_id']}
-        ).fetchone()
-
-        if not result:
-            return "找不到对应的员工编号", 500
-
-        emp_id = result[0]
-
-        # 查询变动记录，连接岗位及所属部门
+    history = request.args.get('history') == 'all'
+    with db_connection() as conn:
+        # 查询变动记录（?history=all 时含归档记录），连接岗位及所属部门；归档记录的岗位可能已被删除
         records = conn.execute(
             text("""
                 SELECT pc.change_date,
-                       p1.pos_name AS old_pos,
+                       COALESCE(p1.pos_name, pc.old_pos_id) AS old_pos,
                        d1.dept_name AS old_dept,
                        pc.old_salary,
-                       p2.pos_name AS new_pos,
+                       COALESCE(p2.pos_name, pc.new_pos_id) AS new_pos,
                        d2.dept_name AS new_dept,
                        pc.new_salary
-                FROM PositionChange pc
-                JOIN Position p1 ON pc.old_pos_id = p1.pos_id
-                JOIN Department d1 ON LEFT(p1.pos_id, LENGTH(d1.dept_id)) = d1.dept_id
-                JOIN Position p2 ON pc.new_pos_id = p2.pos_id
-                JOIN Department d2 ON LEFT(p2.pos_id, LENGTH(d2.dept_id)) = d2.dept_id
-                WHERE pc.emp_id = :eid
+                FROM (
+                    SELECT change_date, old_pos_id, new_pos_id, old_salary, new_salary
+                    FROM PositionChange
+                    WHERE emp_id = :eid
+                    UNION ALL
+                    SELECT change_date, old_pos_id, new_pos_id, old_salary, new_salary
+                    FROM PositionChangeArchive
+                    WHERE emp_id = :eid AND :history = 1
+                ) pc
+                LEFT JOIN Position p1 ON pc.old_pos_id = p1.pos_id
+                LEFT JOIN Department d1 ON p1.dept_id = d1.dept_id
+                LEFT JOIN Position p2 ON pc.new_pos_id = p2.pos_id
+                LEFT JOIN Department d2 ON p2.dept_id = d2.dept_id
                 ORDER BY pc.change_date DESC
             """),
-            {"eid": emp_id}
+            {"eid": g.emp_id, "history": int(history)}
         ).fetchall()
+        archived_before = archive.archived_before(conn, 'PositionChange')
+
+    return render_template("position_change.html", records=records, history=history,
+                           archived_before=archived_before)
 
-    return render_template("position_change.html", records=records)
 
 
 
 
+# 员工总览分页：每页行数、允许的排序列（参数值 -> SQL 列）
+EMPLOYEE_PAGE_SIZE = 50
+EMPLOYEE_SORT_COLUMNS = {
+    'emp_id': 'e.emp_id',
+    'salary': 'e.salary',
+    'name': 'e.name',
+}
+
 
 @app.route('/admin/employees')
+@replica_router.read_only
 def admin_employees():
-    with db.engine.connect() as conn:
-        result = conn.execute(text("""
+    args = request.args
+    sort = args.get('sort', 'emp_id')
+    if sort not in EMPLOYEE_SORT_COLUMNS:
+        sort = 'emp_id'
+    order = 'desc' if args.get('order') == 'desc' else 'asc'
+    filters = {k: args.get(k, '').strip() for k in ('dept_id', 'pos_id', 'education', 'min_salary', 'max_salary')}
+
+    # 所有筛选条件都下推到 SQL
+    conditions = []
+    params = {"limit": EMPLOYEE_PAGE_SIZE + 1}
+    if filters['dept_id']:
+        conditions.append("p.dept_id = :dept_id")
+        params['dept_id'] = filters['dept_id']
+    if filters['pos_id']:
+        conditions.append("e.pos_id = :pos_id")
+        params['pos_id'] = filters['pos_id']
+    if filters['education'] in EDUCATION_LEVELS:
+        conditions.append("e.education = :education")
+        params['education'] = filters['education']
+    else:
+        filters['education'] = ''
+    for key, op in (('min_salary', '>='), ('max_salary', '<=')):
+        if filters[key]:
+            try:
+                params[key] = Decimal(filters[key])
+            except InvalidOperation:
+                filters[key] = ''
+                continue
+            conditions.append(f"e.salary {op} :{key}")
+
+    # 键集（seek）分页：游标为上一页最后一行的 (排序键, emp_id)
+    sort_col = EMPLOYEE_SORT_COLUMNS[sort]
+    cmp = '<' if order == 'desc' else '>'
+    after_id = args.get('after_id')
+    if after_id:
+        params['after_id'] = after_id
+        if sort == 'emp_id':
+            conditions.append(f"e.emp_id {cmp} :after_id")
+        else:
+            after_key = args.get('after_key', '')
+            if sort == 'salary':
+                try:
+                    after_key = Decimal(after_key)
+                except InvalidOperation:
+                    after_key = Decimal(0)
+            params['after_key'] = after_key
+            conditions.append(
+                f"({sort_col} {cmp} :after_key OR ({sort_col} = :after_key AND e.emp_id {cmp} :after_id))"
+            )
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = 'DESC' if order == 'desc' else 'ASC'
+    order_by = f"e.emp_id {direction}" if sort == 'emp_id' else f"{sort_col} {direction}, e.emp_id {direction}"
+
+    with db_connection() as conn:
+        result = conn.execute(text(f"""
             SELECT
               e.emp_id,
               e.name,
@@ -432,8 +793,26 @@ def admin_employees():
             FROM Employee e
             JOIN Position p ON e.pos_id = p.pos_id
             JOIN Department d ON p.dept_id = d.dept_id
-        """)).fetchall()
-    return render_template("admin_employees.html", employees=result)
+            {where}
+            ORDER BY {order_by}
+            LIMIT :limit
+        """), params).fetchall()
+    departments = fetch_departments()
+
+    # 多取一行用于判断是否还有下一页
+    page_args = {k: v for k, v in filters.items() if v}
+    next_url = None
+    if len(result) > EMPLOYEE_PAGE_SIZE:
+        result = result[:EMPLOYEE_PAGE_SIZE]
+        last = result[-1]
+        next_url = url_for('admin_employees', **page_args, sort=sort, order=order,
+                           after_id=last.emp_id, after_key=getattr(last, sort))
+
+    return render_template("admin_employees.html", employees=result, departments=departments,
+                           positions=fetch_positions(), educations=EDUCATION_LEVELS,
+                           filters=filters, sort=sort, order=order, next_url=next_url,
+                           first_url=url_for('admin_employees', **page_args, sort=sort, order=order),
+                           is_first_page=not after_id)
 
 
 
@@ -441,11 +820,9 @@ def admin_employees():
 
 # 岗位/薪资调整：显示所有员工列表
 @app.route('/adjust_position/list')
+@login_required('领导')
 def adjust_position_list():
-    if 'role' not in session or session['role'] != '领导':
-        flash('权限不足，请重新登录', 'error')
-        return redirect(url_for('login'))
-    with db.engine.connect() as conn:
+    with db_connection() as conn:
         result = conn.execute(text("""
             SELECT e.emp_id, e.name, d.dept_name, p.pos_name, e.salary
             FROM employee e
@@ -458,14 +835,11 @@ def adjust_position_list():
 
 # 岗位/薪资调整表单页
 @app.route('/adjust_position/<emp_id>', methods=['GET', 'POST'])
+@login_required('领导')
 def adjust_position_form(emp_id):
-    if 'role' not in session or session['role'] != '领导':
-        flash('权限不足，请重新登录', 'error')
-        return redirect(url_for('login'))
-
     message = None
 
-    with db.engine.connect() as conn:
+    with db_connection() as conn:
         # 获取员工基本信息
         emp_result = conn.execute(text("""
             SELECT e.emp_id, e.name, e.salary, p.pos_id, p.pos_name, d.dept_name
@@ -476,13 +850,8 @@ def adjust_position_form(emp_id):
         """), {'emp_id': emp_id})
         emp = emp_result.fetchone()
 
-        # 获取所有岗位信息用于选择框
-        pos_result = conn.execute(text("""
-            SELECT p.pos_id, p.pos_name, d.dept_name, p.min_salary, p.max_salary
-            FROM position p
-            JOIN department d ON p.dept_id = d.dept_id
-        """))
-        positions = pos_result.fetchall()
+        # 获取所有岗位信息用于选择框（参考数据缓存）
+        positions = ref_cache.get('position_choices', conn)
 
     if request.method == 'POST':
         new_pos_id = request.form.get('new_pos_id')
@@ -495,7 +864,7 @@ def adjust_position_form(emp_id):
             return render_template("adjust_position_form.html", emp=emp, positions=positions, message=message)
 
         try:
-            with db.engine.begin() as conn:
+            with db_transaction() as conn:
                 # 先验证岗位是否存在
                 pos_check = conn.execute(text("""
                     SELECT COUNT(*) FROM position WHERE pos_id = :pid
@@ -519,7 +888,7 @@ def adjust_position_form(emp_id):
                 message = "✅ 岗位和薪资修改成功！"
 
                 # 重新加载更新后的员工信息
-                with db.engine.connect() as conn2:
+                with db_connection() as conn2:
                     emp_result = conn2.execute(text("""
                         SELECT e.emp_id, e.name, e.salary, p.pos_id, p.pos_name, d.dept_name
                         FROM employee e
@@ -528,6 +897,8 @@ def adjust_position_form(emp_id):
                         WHERE e.emp_id = :emp_id
                     """), {'emp_id': emp_id})
                     emp = emp_result.fetchone()
+            # 提交后再失效，避免并发请求在提交前重建并缓存旧的部门树
+            invalidate_dept_tree()
 
         except Exception as e:
             message = f"❌ 修改失败：{str(e).splitlines()[0]}"
@@ -535,6 +906,40 @@ def adjust_position_form(emp_id):
     return render_template("adjust_position_form.html", emp=emp, positions=positions, message=message)
 
 
+# 批量调薪：按部门、岗位或员工编号列表，按百分比或固定金额调整。
+# 先预览（在内存中裁剪到岗位薪资带、排除部门负责人），确认后分批写入 PositionChange
+BULK_ADJUST_CHUNK = 500
+BULK_ADJUST_PREVIEW_ROWS = 200
+
+
+@app.route('/adjust_position/bulk', methods=['GET', 'POST'])
+@login_required('领导')
+def bulk_adjust_salary():
+    form = request.form
+    plan = error = message = None
+    if request.method == 'POST':
+        scope = form.get('scope', '')
+        target = {'dept': form.get('dept_id'), 'pos': form.get('pos_id'), 'ids': form.get('emp_ids', '')}.get(scope)
+        try:
+            plan = salary_adjust.plan_adjustment(get_conn(), scope, target, form.get('mode', ''), form.get('value', ''))
+        except salary_adjust.AdjustmentError as e:
+            error = str(e)
+        if plan is not None and form.get('action') == 'apply':
+            if form.get('fingerprint') != plan.fingerprint:
+                error = "员工薪资或岗位在预览后发生了变化（或重复提交），请重新预览"
+            else:
+                salary_adjust.apply_adjustment(db.engine, plan, chunk_size=BULK_ADJUST_CHUNK)
+                replica_router.mark_write()
+                message = f"已调整 {plan.applied} 名员工的薪资"
+                if plan.skipped:
+                    message += f"，{len(plan.skipped)} 名员工的薪资或岗位已变化，未调整"
+                if plan.errors:
+                    error = '；'.join(f"从 {emp_id} 开始的批次失败：{msg}" for emp_id, msg in plan.errors)
+
+    return render_template("bulk_adjust.html", plan=plan, error=error, message=message, form=form,
+                           departments=fetch_departments(), positions=ref_cache.get('position_choices', get_conn()),
+                           preview_rows=BULK_ADJUST_PREVIEW_ROWS)
+
 
 @app.route('/add_employee', methods=['GET', 'POST'])
 def add_employee():
@@ -549,41 +954,27 @@ def add_employee():
         salary = float(request.form['salary'])
 
         try:
-            # 查询已有员工中最大的emp_id
-            conn = db.engine.connect()
-            result = conn.execute(text("""
-                SELECT emp_id FROM Employee ORDER BY emp_id DESC LIMIT 1
-            """)).fetchone()
-
-            # 提取当前最大emp_id中的数字部分并加1
-            if result:
-                max_emp_id = result[0]  # 获取最大emp_id
-                # 提取数字部分并加1
-                emp_id_number = int(max_emp_id[3:]) + 1  # 从第四位开始取数字部分并加1
-                # 格式化新emp_id
-                new_emp_id = f"EMP{emp_id_number:03d}"  # 格式化为EMPxxx
-            else:
-                new_emp_id = "EMP001"  # 如果没有员工，默认生成EMP001
+            with db_transaction() as conn:
+                # 确保薪资在岗位范围内
+                position = conn.execute(text("""
+                    SELECT min_salary, max_salary FROM Position WHERE pos_id = :pos_id
+                """), {"pos_id": pos_id}).fetchone()
 
-            # 确保薪资在岗位范围内
-            position = conn.execute(text("""
-                SELECT min_salary, max_salary FROM Position WHERE pos_id = :pos_id
-            """), {"pos_id": pos_id}).fetchone()
+                if position:
+                    min_salary, max_salary = position
+                    if salary < min_salary or salary > max_salary:
+                        return render_template('add_employee.html', error='薪资超出岗位范围', positions=fetch_positions())
 
-            if position:
-                min_salary, max_salary = position
-                if salary < min_salary or salary > max_salary:
-                    return render_template('add_employee.html', error='薪资超出岗位范围', positions=fetch_positions())
+                # 从 hi/lo 分配器取新 emp_id，不再扫描 Employee 表
+                new_emp_id = id_allocator.next_emp_id()
 
-            # 插入新员工记录
-            conn.execute(text("""
-                INSERT INTO Employee (emp_id, name, gender, education, phone, email, pos_id, salary)
-                VALUES (:emp_id, :name, :gender, :education, :phone, :email, :pos_id, :salary)
-            """), {"emp_id": new_emp_id, "name": name, "gender": gender, "education": education, "phone": phone, "email": email, "pos_id": pos_id, "salary": salary})
+                # 插入新员工记录（退出 with 时提交事务）
+                conn.execute(text("""
+                    INSERT INTO Employee (emp_id, name, gender, education, phone, email, pos_id, salary)
+                    VALUES (:emp_id, :name, :gender, :education, :phone, :email, :pos_id, :salary)
+                """), {"emp_id": new_emp_id, "name": name, "gender": gender, "education": education, "phone": phone, "email": email, "pos_id": pos_id, "salary": salary})
 
-            # 提交事务
-            conn.commit()
-            conn.close()
+            invalidate_dept_tree()
 
             return render_template('add_employee.html', success='员工添加成功', positions=fetch_positions())
 
@@ -593,23 +984,180 @@ def add_employee():
     # 获取所有岗位
     return render_template('add_employee.html', positions=fetch_positions())
 
-# 查询所有岗位
-def fetch_positions():
-    conn = db.engine.connect()
-    result = conn.execute(text("""
+@app.route('/admin/employees/import', methods=['GET', 'POST'])
+@login_required('领导')
+def import_employees():
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return render_template('import_employees.html', error='请选择 CSV 文件')
+        dry_run = bool(request.form.get('dry_run'))
+        # 直接包装上传流逐行解析，不把整个文件读入内存
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            result = employee_import.import_employees(
+                db.engine, id_allocator, stream,
+                create_accounts=bool(request.form.get('create_accounts')),
+                dry_run=dry_run,
+                default_password=request.form.get('default_password', '').strip() or None,
+                hasher=hasher, hash_workers=app.config.get('IMPORT_HASH_WORKERS', 1),
+            )
+        except (UnicodeDecodeError, SQLAlchemyError) as e:
+            return render_template('import_employees.html', error=f"导入失败: {str(e).splitlines()[0]}")
+        if result.imported:
+            invalidate_dept_tree()
+        return render_template('import_employees.html', result=result, dry_run=dry_run)
+    return render_template('import_employees.html')
+
+
+@app.cli.command('import-employees')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--accounts', is_flag=True, help='同时创建 SystemUser 账号')
+@click.option('--default-password', default=None, help='CSV 未提供 password 列时使用的默认密码')
+@click.option('--chunk-size', default=1000, show_default=True, help='每个事务写入的行数')
+@click.option('--dry-run', is_flag=True, help='只校验不写入')
+def import_employees_command(csv_path, accounts, default_password, chunk_size, dry_run):
+    """从 CSV 批量导入员工"""
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        result = employee_import.import_employees(
+            db.engine, id_allocator, f, create_accounts=accounts, chunk_size=chunk_size,
+            dry_run=dry_run, default_password=default_password, hasher=hasher,
+            hash_workers=app.config.get('IMPORT_HASH_WORKERS', 1),
+        )
+    for line_no, message in result.errors:
+        click.echo(f"第 {line_no} 行：{message}", err=True)
+    click.echo(f"共 {result.rows} 行，导入 {result.imported} 名员工，创建账号 {result.accounts} 个，"
+               f"写入失败 {result.failed} 行，错误 {len(result.errors)} 处")
+
+
+@app.route('/admin/export/<dataset>')
+@login_required('领导')
+def export_dataset(dataset):
+    if dataset not in exports.DATASETS:
+        abort(404)
+    params = {}
+    filename = exports.DATASETS[dataset]['filename']
+    if dataset == 'attendance':
+        start, end = exports.quarter_range(request.args.get('quarter'))
+        params = {'start': start, 'end': end}
+        filename += f"_{start.year}Q{(start.month - 1) // 3 + 1}"
+
+    # 位图存储模式，或所选季度早于考勤归档水位（逐天记录已归档，位图仍完整）时读兼容视图
+    bitmap = app.config.get('ATTENDANCE_STORAGE', 'rows') == 'bitmap' or (
+        dataset == 'attendance' and archive.reaches_archive(get_conn(), 'Attendance', params['start']))
+    # 不限日期的数据集（请假）只要归档过就同时导出归档表
+    history = dataset in exports.HISTORY_TABLES and archive.reaches_archive(
+        get_conn(), exports.HISTORY_TABLES[dataset], None)
+    # 生成器在视图返回后才执行，使用独立连接（服务端游标）而不是请求级连接；有读副本时从副本导出
+    engine = replica_router.choose() or db.engine
+    if request.args.get('format') == 'xlsx':
+        if exports.Workbook is None:
+            return "服务器未安装 openpyxl，暂不支持 xlsx 导出", 501
+        return Response(
+            exports.stream_xlsx(engine, dataset, params, bitmap=bitmap, history=history),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={'Content-Disposition': f'attachment; filename={filename}.xlsx'}
+        )
+    return Response(
+        exports.stream_csv(engine, dataset, params, bitmap=bitmap, history=history),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}.csv'}
+    )
+
+
+# 供薪资、门禁等系统集成的 JSON API：批量编号查询、键集游标分页、字段选择
+# 认证方式：领导账号的会话，或配置了 API_TOKEN 时的 Bearer 令牌
+def api_authorized():
+    token = app.config.get('API_TOKEN')
+    return g.role == '领导' or bool(token and request.headers.get('Authorization') == f'Bearer {token}')
+
+
+@app.route('/api/v1/<resource>')
+@replica_router.read_only
+def api_resource(resource):
+    if not api_authorized():
+        return Response(api.dumps({'error': '未登录或令牌无效'}), status=401, mimetype='application/json')
+    conn = get_conn()
+    bitmap = app.config.get('ATTENDANCE_STORAGE', 'rows') == 'bitmap'
+    archived_before = None
+    try:
+        # 考勤：明确给出的起点早于归档水位时，水位之前的部分改读位图视图，不给起点只查热表；
+        # 请假：起点早于水位或不给起点时同时读归档表。日期格式错误由 api.fetch 报 400
+        table = {'attendance': None if bitmap else 'Attendance', 'leaves': 'LeaveRequest'}.get(resource)
+        watermark = archive.archived_before(conn, table) if table else None
+        if watermark is not None:
+            try:
+                start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+            except ValueError:
+                start = watermark
+            if start is None and resource == 'leaves' or start is not None and start < watermark:
+                archived_before = watermark
+        payload = api.fetch(conn, resource, request.args, bitmap=bitmap, archived_before=archived_before)
+    except api.ApiError as e:
+        return Response(api.dumps({'error': e.message}), status=e.status, mimetype='application/json')
+    return Response(api.dumps(payload), mimetype='application/json')
+
+
+# 薪资分析：部门/岗位薪资汇总、薪资分布、薪资带内位置、调薪历史。
+# 报表由一次性加载的列式快照向量化计算，员工或岗位变动写入前一直复用
+@app.route('/admin/payroll')
+@login_required('领导')
+@replica_router.read_only
+def payroll_report():
+    if payroll.np is None:
+        return "服务器未安装 numpy，暂不支持薪资分析", 501
+    report = payroll_analytics.report(get_conn())
+    return render_template('payroll.html', report=report)
+
+
+@app.route('/api/v1/payroll')
+@replica_router.read_only
+def api_payroll():
+    if not api_authorized():
+        return Response(api.dumps({'error': '未登录或令牌无效'}), status=401, mimetype='application/json')
+    if payroll.np is None:
+        return Response(api.dumps({'error': '服务器未安装 numpy'}), status=501, mimetype='application/json')
+    return Response(api.dumps(payroll_analytics.report(get_conn())), mimetype='application/json')
+
+
+# 岗位、部门参考数据走版本化的进程内缓存；写 Position / Department 时
+# 提交后调用 ref_cache.invalidate()，本进程立即生效；其他进程由共享版本号感知
+@ref_cache.loader('positions')
+def load_positions(conn):
+    return conn.execute(text("""
         SELECT pos_id, pos_name, dept_id, min_salary, max_salary
         FROM Position
     """)).fetchall()
-    conn.close()
 
-    # 返回岗位数据
-    return result
+
+@ref_cache.loader('position_choices')
+def load_position_choices(conn):
+    return conn.execute(text("""
+        SELECT p.pos_id, p.pos_name, d.dept_name, p.min_salary, p.max_salary
+        FROM position p
+        JOIN department d ON p.dept_id = d.dept_id
+    """)).fetchall()
+
+
+@ref_cache.loader('departments')
+def load_departments(conn):
+    return conn.execute(text("SELECT dept_id, dept_name FROM Department")).fetchall()
+
+
+# 查询所有岗位
+def fetch_positions():
+    return ref_cache.get('positions', get_conn())
+
+
+# 查询所有部门
+def fetch_departments():
+    return ref_cache.get('departments', get_conn())
 
 
 @app.route('/delete_employee/<emp_id>', methods=['POST'])
 def delete_employee(emp_id):
     try:
-        with db.engine.begin() as conn:
+        with db_transaction() as conn:
             # 检查该员工是否为任何部门的负责人
             result = conn.execute(text("""
                 SELECT COUNT(*) FROM Department WHERE manager_id = :emp_id
@@ -624,26 +1172,25 @@ def delete_employee(emp_id):
                 DELETE FROM SystemUser WHERE emp_id = :emp_id
             """), {'emp_id': emp_id})
 
-            # 删除该员工的考勤、请假、岗位变动记录（如果有）
-            conn.execute(text("DELETE FROM Attendance WHERE emp_id = :emp_id"), {'emp_id': emp_id})
-            conn.execute(text("DELETE FROM LeaveRequest WHERE emp_id = :emp_id"), {'emp_id': emp_id})
-            conn.execute(text("DELETE FROM PositionChange WHERE emp_id = :emp_id"), {'emp_id': emp_id})
+            # 员工档案及考勤（含月度位图）、请假、岗位变动记录移入归档表；对账结果为派生数据，直接删除
+            archive.offboard(conn, emp_id)
+            conn.execute(text("DELETE FROM AttendanceReconciliation WHERE emp_id = :emp_id"), {'emp_id': emp_id})
 
             # 最后删除 Employee 表中的员工记录
             conn.execute(text("DELETE FROM Employee WHERE emp_id = :emp_id"), {'emp_id': emp_id})
 
             flash('删除成功', 'success')
+        invalidate_dept_tree()
     except Exception as e:
         flash(f'删除失败：{str(e)}', 'error')
     return redirect(url_for('admin_employees'))
 
 
 @app.route('/attendance/view/<emp_id>')
+@login_required('领导')
+@replica_router.read_only
 def view_attendance(emp_id):
-    if session.get('role') != '领导':
-        return redirect(url_for('login'))
-
-    conn = db.engine.connect()
+    conn = get_conn()
     # 查询员工信息
     emp_info = conn.execute(text("""
         SELECT e.emp_id, e.name, p.pos_name, d.dept_name
@@ -653,24 +1200,34 @@ def view_attendance(emp_id):
         WHERE e.emp_id = :emp_id
     """), {"emp_id": emp_id}).fetchone()
 
-    # 查询考勤记录
-    records = conn.execute(text("""
-        SELECT date
-        FROM Attendance
-        WHERE emp_id = :emp_id
-        ORDER BY date DESC
-    """), {"emp_id": emp_id}).fetchall()
-    conn.close()
+    # 查询考勤汇总（及所选月份的打卡记录）
+    summaries, month, records, stats = load_attendance(emp_id, request.args.get('month'))
+
+    # 对账结果（reconcile-attendance 生成）：各月未说明缺勤天数，及所选月份的缺勤日期
+    reconciled = {
+        row.month: row
+        for row in conn.execute(text("""
+            SELECT month, workdays, leave_days, absent_days, absent_mask, checked_at
+            FROM AttendanceReconciliation
+            WHERE emp_id = :eid
+        """), {"eid": emp_id})
+    }
+    absences = []
+    if month and month in reconciled:
+        absences = attendance_summary.mask_dates(month, reconciled[month].absent_mask)
+    # 整月没有打卡的月份没有汇总行，单独列出对账结果
+    summarized = {row.month for row in summaries}
+    unsummarized = [reconciled[m] for m in sorted(reconciled, reverse=True) if m not in summarized]
 
-    return render_template("attendance_view.html", emp=emp_info, records=records)
+    return render_template("attendance_view.html", emp=emp_info, summaries=summaries, month=month, records=records,
+                           stats=stats, reconciled=reconciled, absences=absences, unsummarized=unsummarized)
 
 
 @app.route('/leave/records/<emp_id>')
+@login_required('领导')
+@replica_router.read_only
 def view_leave_records(emp_id):
-    if session.get('role') != '领导':
-        return redirect(url_for('login'))
-
-    conn = db.engine.connect()
+    conn = get_conn()
 
     # 查询员工基本信息
     emp = conn.execute(text("""
@@ -681,32 +1238,38 @@ def view_leave_records(emp_id):
         WHERE e.emp_id = :emp_id
     """), {"emp_id": emp_id}).fetchone()
 
-    # 查询该员工的请假记录
+    # 查询该员工的请假记录（?history=all 时含归档记录）；审批人已离职时从离职档案取姓名
+    history = request.args.get('history') == 'all'
     leaves = conn.execute(text("""
         SELECT l.leave_id, l.leave_type, l.start_date, l.end_date,
-               l.request_time, l.status, e.name AS reviewer_name
-        FROM LeaveRequest l
+               l.request_time, l.status, COALESCE(e.name, ea.name) AS reviewer_name
+        FROM (
+            SELECT leave_id, leave_type, start_date, end_date, request_time, status, reviewer_id
+            FROM LeaveRequest
+            WHERE emp_id = :emp_id
+            UNION ALL
+            SELECT leave_id, leave_type, start_date, end_date, request_time, status, reviewer_id
+            FROM LeaveRequestArchive
+            WHERE emp_id = :emp_id AND :history = 1
+        ) l
         LEFT JOIN Employee e ON l.reviewer_id = e.emp_id
-        WHERE l.emp_id = :emp_id
+        LEFT JOIN EmployeeArchive ea ON l.reviewer_id = ea.emp_id
         ORDER BY l.request_time DESC
-    """), {"emp_id": emp_id}).fetchall()
+    """), {"emp_id": emp_id, "history": int(history)}).fetchall()
 
-    conn.close()
-    return render_template("leave_records_view.html", emp=emp, leaves=leaves)
+    return render_template("leave_records_view.html", emp=emp, leaves=leaves, history=history,
+                           archived_before=archive.archived_before(conn, 'LeaveRequest'))
 
 
 # 选择部门页面
 @app.route('/change_manager', methods=['GET'])
 def choose_department():
-    conn = db.engine.connect()
-    departments = conn.execute(text("SELECT dept_id, dept_name FROM Department")).fetchall()
-    conn.close()
-    return render_template('choose_department.html', departments=departments)
+    return render_template('choose_department.html', departments=fetch_departments())
 
 
 @app.route('/assign_manager/<dept_id>', methods=['GET', 'POST'])
 def assign_manager(dept_id):
-    conn = db.engine.connect()
+    conn = get_conn()
 
     # 获取部门名称和原负责人 ID
     dept_info = conn.execute(text("""
@@ -727,10 +1290,13 @@ def assign_manager(dept_id):
     if request.method == 'POST':
         new_manager_id = request.form['manager_id']
         try:
-            conn.execute(
-                text("UPDATE Department SET manager_id = :mid WHERE dept_id = :did"),
-                {"mid": new_manager_id, "did": dept_id}
-            )
+            with db_transaction() as conn:
+                conn.execute(
+                    text("UPDATE Department SET manager_id = :mid WHERE dept_id = :did"),
+                    {"mid": new_manager_id, "did": dept_id}
+                )
+            ref_cache.invalidate()
+            invalidate_dept_tree()
             flash("部门负责人修改成功", "success")
         except Exception as e:
             flash(f"修改失败: {str(e)}", "error")
@@ -745,8 +1311,7 @@ def assign_manager(dept_id):
 
 @app.route('/add_position', methods=['GET', 'POST'])
 def add_position():
-    with db.engine.begin() as conn:
-        departments = conn.execute(text("SELECT dept_id, dept_name FROM Department")).fetchall()
+    departments = fetch_departments()
 
     if request.method == 'POST':
         pos_name = request.form['pos_name']
@@ -758,19 +1323,9 @@ def add_position():
             if min_salary > max_salary:
                 raise ValueError("最低薪资不能大于最高薪资")
 
-            with db.engine.begin() as conn:
-                pos_ids = conn.execute(text(
-                    "SELECT pos_id FROM Position WHERE pos_id LIKE :prefix"
-                ), {"prefix": f"{dept_id}%"}).fetchall()
-
-                if pos_ids:
-                    max_index = max(int(pid[0].replace(dept_id, '')) for pid in pos_ids)
-                    new_index = max_index + 1
-                else:
-                    new_index = 1
-
-                new_pos_id = f"{dept_id}{str(new_index).zfill(3)}"
+            new_pos_id = id_allocator.next_pos_id(dept_id)
 
+            with db_transaction() as conn:
                 conn.execute(text("""
                     INSERT INTO Position (pos_id, pos_name, dept_id, min_salary, max_salary)
                     VALUES (:pos_id, :pos_name, :dept_id, :min_salary, :max_salary)
@@ -782,6 +1337,8 @@ def add_position():
                     'max_salary': max_salary
                 })
 
+            ref_cache.invalidate()
+            invalidate_dept_tree()
             message = f"岗位添加成功！岗位编号为 {new_pos_id}"
             return render_template("add_position.html", departments=departments, message=message)
 
@@ -803,11 +1360,13 @@ def add_department():
 
         if not dept_id.isalpha():
             error = "部门编码只能包含英文字母"
+        elif len(dept_id) > DEPT_ID_MAX_LENGTH:
+            error = f"部门编码最多 {DEPT_ID_MAX_LENGTH} 个字母"
         elif not dept_id or not dept_name:
             error = "部门编号和名称不能为空"
         else:
             try:
-                with db.engine.begin() as conn:
+                with db_transaction() as conn:
                     conn.execute(text("""
                         INSERT INTO Department (dept_id, dept_name, function_desc, manager_id)
                         VALUES (:dept_id, :dept_name, :function_desc, NULL)
@@ -816,6 +1375,10 @@ def add_department():
                         "dept_name": dept_name,
                         "function_desc": function_desc
                     })
+                    # 预置该部门的岗位编号序列，首次新增岗位时无需补建
+                    create_sequence(conn, pos_sequence(dept_id))
+                ref_cache.invalidate()
+                invalidate_dept_tree()
                 message = f"部门 {dept_name} 添加成功！"
             except Exception as e:
                 error = f"添加失败: {str(e)}"
@@ -824,47 +1387,83 @@ def add_department():
 
 
 @app.route("/departments")
+@replica_router.read_only
+@conditional_cache.cached('Department', 'Position', 'Employee')
 def view_departments():
-    conn = db.engine.connect()
+    departments = get_dept_tree()
+    return render_template("view_departments.html", departments=departments)
+
+
+# 部门→岗位→员工 树的进程内缓存，以三张表的共享版本号为键：其他进程、命令行导入、生成数据等
+# 任何已提交的写入都会使其失效；本进程的写操作提交后另外调用 invalidate_dept_tree() 立即失效
+DEPT_TREE_TABLES = ('Department', 'Position', 'Employee')
+_dept_tree_lock = threading.Lock()
+_dept_tree_cache = {"tree": None, "versions": None, "generation": 0}
+
+
+def invalidate_dept_tree():
+    with _dept_tree_lock:
+        _dept_tree_cache["tree"] = None
+        _dept_tree_cache["generation"] += 1
 
-    # 获取所有部门及其经理信息
+
+def get_dept_tree():
+    # 版本号与树都读主库：从有复制延迟的副本加载可能缓存住旧数据
+    conn = get_primary_conn()
+    versions = conditional_cache.versions(DEPT_TREE_TABLES, conn=conn)
+    with _dept_tree_lock:
+        if _dept_tree_cache["tree"] is not None and _dept_tree_cache["versions"] == versions:
+            return _dept_tree_cache["tree"]
+        generation = _dept_tree_cache["generation"]
+
+    tree = load_dept_tree(conn)
+
+    # 加载期间若本进程发生写操作，则不缓存这次（可能过期的）结果
+    with _dept_tree_lock:
+        if _dept_tree_cache["generation"] == generation:
+            _dept_tree_cache["tree"] = tree
+            _dept_tree_cache["versions"] = versions
+    return tree
+
+
+def load_dept_tree(conn):
+    # 两条集合查询代替逐部门、逐岗位的 N+1 查询
     departments = conn.execute(text("""
         SELECT d.dept_id, d.dept_name, d.function_desc, e.name AS manager_name
         FROM Department d
         LEFT JOIN Employee e ON d.manager_id = e.emp_id
+        ORDER BY d.dept_id
+    """)).fetchall()
+
+    rows = conn.execute(text("""
+        SELECT p.dept_id, p.pos_id, p.pos_name, e.emp_id, e.name
+        FROM Position p
+        LEFT JOIN Employee e ON e.pos_id = p.pos_id
+        ORDER BY p.dept_id, p.pos_id, e.emp_id
     """)).fetchall()
 
-    # 为每个部门获取其岗位及对应员工
-    dept_info = []
-    for dept in departments:
-        positions = conn.execute(text("""
-            SELECT p.pos_id, p.pos_name
-            FROM Position p
-            WHERE p.dept_id = :dept_id
-        """), {"dept_id": dept.dept_id}).fetchall()
-
-        pos_with_employees = []
-        for pos in positions:
-            employees = conn.execute(text("""
-                SELECT emp_id, name FROM Employee
-                WHERE pos_id = :pos_id
-            """), {"pos_id": pos.pos_id}).fetchall()
-
-            pos_with_employees.append({
-                "pos_id": pos.pos_id,
-                "pos_name": pos.pos_name,
-                "employees": employees
-            })
-
-        dept_info.append({
+    # 在内存中拼装：dept_id -> 岗位列表，pos_id -> 岗位字典
+    positions_by_dept = {}
+    pos_index = {}
+    for row in rows:
+        pos = pos_index.get(row.pos_id)
+        if pos is None:
+            pos = {"pos_id": row.pos_id, "pos_name": row.pos_name, "employees": []}
+            pos_index[row.pos_id] = pos
+            positions_by_dept.setdefault(row.dept_id, []).append(pos)
+        if row.emp_id is not None:
+            pos["employees"].append({"emp_id": row.emp_id, "name": row.name})
+
+    return [
+        {
             "dept_id": dept.dept_id,
             "dept_name": dept.dept_name,
             "function_desc": dept.function_desc,
             "manager_name": dept.manager_name,
-            "positions": pos_with_employees
-        })
-
-    return render_template("view_departments.html", departments=dept_info)
+            "positions": positions_by_dept.get(dept.dept_id, [])
+        }
+        for dept in departments
+    ]
 
 
 
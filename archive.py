@@ -0,0 +1,128 @@
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, text
+
+# 冷热分离：保留期之前已结束的考勤、请假、岗位变动记录分批移入结构相同的归档表，热表只保留近期数据。
+# MySQL 的分区表不支持外键，而这三张表都以外键关联 Employee / Position，因此不做原地分区；
+# 归档表不带外键，离职员工的历史同样移入其中。ArchiveWatermark 记录各表的归档水位，
+# 查询起点早于水位时才需要同时读归档表
+ARCHIVE_TABLES = {
+    'Attendance': {
+        'archive': 'AttendanceArchive',
+        'key': 'attendance_id',
+        'columns': 'attendance_id, emp_id, date',
+        # 只归档已计入月度位图的逐天记录：按月查询、导出可回退到位图，未回填位图的记录留在热表
+        'closed': """date < :cutoff AND EXISTS (
+            SELECT 1 FROM AttendanceMonthly m
+            WHERE m.emp_id = Attendance.emp_id
+              AND m.month = Attendance.date - INTERVAL (DAY(Attendance.date) - 1) DAY
+              AND (m.day_mask >> (DAY(Attendance.date) - 1)) & 1 = 1)""",
+    },
+    'LeaveRequest': {
+        'archive': 'LeaveRequestArchive',
+        'key': 'leave_id',
+        'columns': 'leave_id, emp_id, leave_type, start_date, end_date, request_time, reason, status, '
+                   'reviewer_id, review_time',
+        # 待审批的申请无论多早都留在热表
+        'closed': "end_date < :cutoff AND status <> '待审批'",
+    },
+    'PositionChange': {
+        'archive': 'PositionChangeArchive',
+        'key': 'change_id',
+        'columns': 'change_id, emp_id, change_date, old_pos_id, new_pos_id, old_salary, new_salary',
+        'closed': "change_date < :cutoff",
+    },
+}
+
+EMPLOYEE_COLUMNS = 'emp_id, name, gender, education, phone, email, pos_id, salary'
+MONTHLY_COLUMNS = 'emp_id, month, days_present, first_date, last_date, current_streak, longest_streak, day_mask'
+
+
+def retention_cutoff(months, today=None):
+    # 保留最近 months 个整月（含当月），返回最早保留月份的 1 日
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def archived_before(conn, table):
+    # 该表早于返回日期的已结束记录都已归档；从未归档返回 None
+    return conn.execute(text("""
+        SELECT archived_before FROM ArchiveWatermark WHERE table_name = :name
+    """), {"name": table}).scalar()
+
+
+def reaches_archive(conn, table, start):
+    # start 为查询起始日期（None 表示不限）：早于归档水位时需要回退到归档数据
+    watermark = archived_before(conn, table)
+    return watermark is not None and (start is None or start < watermark)
+
+
+def _advance_watermark(conn, table, cutoff, now):
+    current = archived_before(conn, table)
+    if current is None:
+        conn.execute(text("""
+            INSERT INTO ArchiveWatermark (table_name, archived_before, updated_at) VALUES (:name, :cutoff, :now)
+        """), {"name": table, "cutoff": cutoff, "now": now})
+    elif current < cutoff:
+        conn.execute(text("""
+            UPDATE ArchiveWatermark SET archived_before = :cutoff, updated_at = :now WHERE table_name = :name
+        """), {"name": table, "cutoff": cutoff, "now": now})
+
+
+def archive_closed(engine, cutoff, batch_size=1000, log=print):
+    # 按主键键集分批，每批一个事务：锁定本批已结束的记录，INSERT ... SELECT 复制到归档表后从热表删除。
+    # 先推进水位再搬运：搬运期间的历史查询已同时读两张表，每批原子移动，不会漏读或重复
+    now = datetime.now()
+    totals = {}
+    for table, spec in ARCHIVE_TABLES.items():
+        with engine.begin() as conn:
+            _advance_watermark(conn, table, cutoff, now)
+
+        select_batch = text(f"""
+            SELECT {spec['key']} FROM {table}
+            WHERE {spec['key']} > :after AND {spec['closed']}
+            ORDER BY {spec['key']}
+            LIMIT :limit
+            FOR UPDATE
+        """)
+        copy = text(f"""
+            INSERT INTO {spec['archive']} ({spec['columns']}, archived_at)
+            SELECT {spec['columns']}, :now FROM {table} WHERE {spec['key']} IN :ids
+        """).bindparams(bindparam('ids', expanding=True))
+        delete = text(f"DELETE FROM {table} WHERE {spec['key']} IN :ids").bindparams(bindparam('ids', expanding=True))
+
+        after, moved = 0, 0
+        while True:
+            with engine.begin() as conn:
+                ids = [row[0] for row in conn.execute(select_batch, {"after": after, "cutoff": cutoff,
+                                                                    "limit": batch_size})]
+                if not ids:
+                    break
+                conn.execute(copy, {"ids": ids, "now": now})
+                conn.execute(delete, {"ids": ids})
+            after = ids[-1]
+            moved += len(ids)
+            log(f"{table}：已归档 {moved} 行")
+        totals[table] = moved
+    return totals
+
+
+def offboard(conn, emp_id):
+    # 离职：员工档案及其考勤、请假、岗位变动历史整体移入归档表，每张表一条 INSERT ... SELECT 加一条 DELETE。
+    # 考勤月度位图同样移入：位图存储模式或压缩后它是唯一的考勤记录。
+    # 在调用方事务内执行；账号、对账结果等派生数据与 Employee 行由调用方删除
+    now = datetime.now()
+    params = {"eid": emp_id, "now": now}
+    conn.execute(text(f"""
+        INSERT INTO EmployeeArchive ({EMPLOYEE_COLUMNS}, departed_at)
+        SELECT {EMPLOYEE_COLUMNS}, :now FROM Employee WHERE emp_id = :eid
+    """), params)
+    tables = [(table, spec['archive'], spec['columns']) for table, spec in ARCHIVE_TABLES.items()]
+    tables.append(('AttendanceMonthly', 'AttendanceMonthlyArchive', MONTHLY_COLUMNS))
+    for table, archive_table, columns in tables:
+        conn.execute(text(f"""
+            INSERT INTO {archive_table} ({columns}, archived_at)
+            SELECT {columns}, :now FROM {table} WHERE emp_id = :eid
+        """), params)
+        conn.execute(text(f"DELETE FROM {table} WHERE emp_id = :eid"), params)
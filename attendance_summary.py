@@ -0,0 +1,233 @@
+import logging
+from datetime import date, timedelta
+
+from sqlalchemy import bindparam, text
+
+logger = logging.getLogger(__name__)
+
+# 员工×月份考勤汇总（AttendanceMonthly），随打卡增量维护。
+# 同一天重复写入不会重复计数；晚于 last_date 的打卡累加天数并延续 / 重置连续打卡天数。
+# day_mask 是当月出勤位图：第 n 天出勤则第 n-1 位为 1。
+# MySQL 的 ON DUPLICATE KEY UPDATE 按从左到右顺序赋值，last_date 必须最后更新
+UPSERT_SQL = """
+    INSERT INTO AttendanceMonthly
+        (emp_id, month, days_present, first_date, last_date, current_streak, longest_streak, day_mask)
+    VALUES (:eid, :month, 1, :dt, :dt, 1, 1, :bit)
+    ON DUPLICATE KEY UPDATE
+        day_mask = day_mask | VALUES(day_mask),
+        days_present = days_present + (VALUES(last_date) > last_date),
+        current_streak = IF(VALUES(last_date) = last_date + INTERVAL 1 DAY, current_streak + 1,
+                            IF(VALUES(last_date) > last_date, 1, current_streak)),
+        longest_streak = GREATEST(longest_streak, current_streak),
+        first_date = LEAST(first_date, VALUES(first_date)),
+        last_date = GREATEST(last_date, VALUES(last_date))
+"""
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def day_bit(day):
+    return 1 << (day.day - 1)
+
+
+def mask_dates(month, mask):
+    # 位图 -> 当月出勤日期（升序）；超出当月天数的位忽略
+    return [month.replace(day=n + 1) for n in range((next_month(month) - month).days) if mask >> n & 1]
+
+
+def range_mask(month, start, end):
+    # 当月落在 [start, end) 内的日期对应的位
+    first = max(start, month)
+    last = min(end, next_month(month))
+    if first >= last:
+        return 0
+    return (1 << (last - month).days) - (1 << (first - month).days)
+
+
+def workday_mask(month):
+    # 当月周一至周五对应的位
+    mask = 0
+    day = month
+    while day.month == month.month:
+        if day.weekday() < 5:
+            mask |= day_bit(day)
+        day += timedelta(days=1)
+    return mask
+
+
+def days_present(summaries, start, end):
+    # 区间出勤天数：逐月取位图与区间位的交集计数，不需要读取逐天记录
+    return sum(bin(row.day_mask & range_mask(row.month, start, end)).count('1') for row in summaries)
+
+
+def is_perfect(month, mask, today=None):
+    # 已结束的月份中，所有工作日都有打卡
+    today = today or date.today()
+    required = workday_mask(month)
+    return next_month(month) <= today and mask & required == required
+
+
+def quarter_start(day):
+    return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+
+
+def parse_month(value):
+    # 'YYYY-MM' -> 当月 1 日，格式不对返回 None
+    try:
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    except (AttributeError, ValueError):
+        return None
+
+
+def record_checkins(conn, rows):
+    # 打卡组提交钩子：与 Attendance 写入在同一事务中更新汇总
+    conn.execute(text(UPSERT_SQL), [
+        {"eid": row["eid"], "month": month_start(row["dt"]), "dt": row["dt"], "bit": day_bit(row["dt"])}
+        for row in rows
+    ])
+
+
+def summarize(dates):
+    # 已排序的打卡日期 -> {月份: 汇总}
+    months = {}
+    prev = None
+    for day in dates:
+        key = month_start(day)
+        item = months.get(key)
+        if item is None:
+            item = months[key] = {
+                'days_present': 0, 'first_date': day, 'last_date': day,
+                'current_streak': 0, 'longest_streak': 0, 'day_mask': 0,
+            }
+            prev = None
+        if prev == day:
+            continue
+        item['days_present'] += 1
+        item['current_streak'] = item['current_streak'] + 1 if prev == day - timedelta(days=1) else 1
+        item['longest_streak'] = max(item['longest_streak'], item['current_streak'])
+        item['last_date'] = day
+        item['day_mask'] |= day_bit(day)
+        prev = day
+    return months
+
+
+def rebuild(engine, batch_size=500, log=print):
+    # 从 Attendance 与已有位图的并集全量重建汇总：按 emp_id 键集分批，每批一个事务。
+    # 也用于把已有的逐天记录迁移到位图；位图存储模式下只存在于位图中的打卡不会丢失。
+    # 每批先以 FOR UPDATE 锁住这批员工的汇总行（含间隙），再读 Attendance：期间到达的打卡
+    # 在更新汇总时等待本批提交，随后合并到重建结果上，不会被 DELETE 覆盖，可在线运行
+    after = ''
+    total = 0
+    while True:
+        # 员工编号单独读取：重建事务里的第一次一致性读必须发生在加锁之后
+        with engine.connect() as conn:
+            emp_ids = [row[0] for row in conn.execute(text("""
+                SELECT emp_id FROM Employee
+                WHERE emp_id > :after
+                ORDER BY emp_id
+                LIMIT :limit
+            """), {"after": after, "limit": batch_size})]
+        if not emp_ids:
+            break
+
+        with engine.begin() as conn:
+            dates_by_emp = {emp_id: set() for emp_id in emp_ids}
+            result = conn.execute(text("""
+                SELECT emp_id, month, day_mask FROM AttendanceMonthly
+                WHERE emp_id >= :first AND emp_id <= :last
+                FOR UPDATE
+            """), {"first": emp_ids[0], "last": emp_ids[-1]})
+            for emp_id, month, mask in result:
+                if emp_id in dates_by_emp:
+                    dates_by_emp[emp_id].update(mask_dates(month, mask))
+            # 加锁之后才做第一次一致性读，快照包含加锁前已提交的全部打卡
+            result = conn.execute(text("""
+                SELECT emp_id, date FROM Attendance
+                WHERE emp_id >= :first AND emp_id <= :last
+            """), {"first": emp_ids[0], "last": emp_ids[-1]})
+            for emp_id, day in result:
+                if emp_id in dates_by_emp:
+                    dates_by_emp[emp_id].add(day)
+
+            rows = []
+            for emp_id, dates in dates_by_emp.items():
+                for month, item in summarize(sorted(dates)).items():
+                    rows.append(dict(item, emp_id=emp_id, month=month))
+
+            conn.execute(text("""
+                DELETE FROM AttendanceMonthly
+                WHERE emp_id >= :first AND emp_id <= :last
+            """), {"first": emp_ids[0], "last": emp_ids[-1]})
+            if rows:
+                conn.execute(text("""
+                    INSERT INTO AttendanceMonthly
+                        (emp_id, month, days_present, first_date, last_date, current_streak, longest_streak, day_mask)
+                    VALUES (:emp_id, :month, :days_present, :first_date, :last_date, :current_streak, :longest_streak,
+                            :day_mask)
+                """), rows)
+
+        after = emp_ids[-1]
+        total += len(emp_ids)
+        log(f"已重建 {total} 名员工的考勤汇总（至 {after}）")
+    return total
+
+
+def compact(engine, batch_size=500, log=print):
+    # 切换到位图存储后删除 Attendance 中的逐天记录：按员工分批，
+    # 先核对每条记录都已体现在位图中，核对不通过的员工保留原记录
+    after = ''
+    deleted = 0
+    kept = []
+    while True:
+        with engine.begin() as conn:
+            emp_ids = [row[0] for row in conn.execute(text("""
+                SELECT emp_id FROM Employee
+                WHERE emp_id > :after
+                ORDER BY emp_id
+                LIMIT :limit
+            """), {"after": after, "limit": batch_size})]
+            if not emp_ids:
+                break
+            bounds = {"first": emp_ids[0], "last": emp_ids[-1]}
+
+            masks = {
+                (row.emp_id, row.month): row.day_mask
+                for row in conn.execute(text("""
+                    SELECT emp_id, month, day_mask FROM AttendanceMonthly
+                    WHERE emp_id >= :first AND emp_id <= :last
+                """), bounds)
+            }
+            missing = set()
+            for emp_id, day in conn.execute(text("""
+                SELECT emp_id, date FROM Attendance
+                WHERE emp_id >= :first AND emp_id <= :last
+            """), bounds):
+                if not masks.get((emp_id, month_start(day)), 0) & day_bit(day):
+                    missing.add(emp_id)
+
+            if missing:
+                kept.extend(sorted(missing))
+                result = conn.execute(text("""
+                    DELETE FROM Attendance
+                    WHERE emp_id >= :first AND emp_id <= :last AND emp_id NOT IN :missing
+                """).bindparams(bindparam('missing', expanding=True)), dict(bounds, missing=sorted(missing)))
+            else:
+                result = conn.execute(text("""
+                    DELETE FROM Attendance
+                    WHERE emp_id >= :first AND emp_id <= :last
+                """), bounds)
+            deleted += result.rowcount
+
+        after = emp_ids[-1]
+        log(f"已清理至 {after}，共删除 {deleted} 条逐天考勤记录")
+    if kept:
+        log(f"{len(kept)} 名员工的逐天记录未完整写入位图，已保留：{', '.join(kept[:20])}"
+            "（可先运行 rebuild-attendance-summary）")
+    return deleted, kept
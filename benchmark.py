@@ -0,0 +1,568 @@
+"""全路由基准测试
+
+可选地先按配置规模向数据库灌入合成数据，然后逐个路由并发压测，统计每个路由的
+p50/p95/p99 延迟与吞吐量，结果保存为 JSON，便于与基线结果对比。
+
+用法：
+    python benchmark.py --seed --departments 100 --employees 50000 --attendance-days 400
+    python benchmark.py -n 200 -c 8 -o bench.json              # 进程内 Flask test client
+    python benchmark.py --base-url http://127.0.0.1:5000 -c 32 # 对运行中的服务发 HTTP 请求
+    python benchmark.py --baseline baseline.json --threshold 0.2
+    python benchmark.py --routes admin_employees,view_departments --writes
+
+数据库取自 config.py。库中还没有表时，先执行 database lab.sql 建表（跳过其中的建库与 USE，
+建在 config.py 指定的库中）；--seed 会向其中追加大量数据，请指向专用的测试库。
+默认只压测只读路由；加 --writes 才包括登录、登出、打卡、请假、增删员工、批量导入、调岗、批量调薪、
+改密码等写操作（删除的是没有账号、不是部门负责人的员工，改密码时新旧密码相同）。
+与基线对比时，任一路由 p95 变慢超过 --threshold 即以非零状态码退出。
+"""
+import argparse
+import csv
+import http.cookiejar
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import inspect, text
+
+import salary_adjust
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILE = os.path.join(HERE, 'database lab.sql')
+# 行尾或整行的 "-- " 注释
+SQL_COMMENT = re.compile(r'(^|\s)--(\s.*)?$')
+SKIPPED_SCHEMA_STATEMENT = re.compile(r'(CREATE\s+DATABASE|USE)\b', re.IGNORECASE)
+IMPORT_ROWS = 20
+
+RUN_ID = int(time.time())
+_serial = itertools.count()
+
+
+def letters(n):
+    code = ''
+    while True:
+        n, r = divmod(n, 26)
+        code = chr(ord('A') + r) + code
+        if not n:
+            return code
+
+
+def unique_code():
+    # 纯字母编码，最多 6 位（部门编码只能是字母且不超过 7 位，另加前缀 Z）：
+    # 运行时间戳取 4 位、序号取 2 位，本次运行内前 676 个唯一，相隔数天的运行之间也不重复
+    return letters((RUN_ID % 26 ** 4) * 26 ** 2 + next(_serial) % 26 ** 2)
+
+
+def schema_statements(path):
+    # 按 mysql 客户端的方式切分建表脚本：支持 DELIMITER 切换（触发器），去掉注释；
+    # 建库与 USE 跳过，表建在 config.py 指定的库中
+    delimiter = ';'
+    lines = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            code = SQL_COMMENT.sub('', line.rstrip())
+            if code.upper().startswith('DELIMITER '):
+                delimiter = code.split()[1]
+                continue
+            lines.append(code)
+            if code.endswith(delimiter):
+                statement = '\n'.join(lines).strip()[:-len(delimiter)].strip()
+                lines = []
+                if statement and not SKIPPED_SCHEMA_STATEMENT.match(statement):
+                    yield statement
+
+
+def ensure_schema(engine, path=SCHEMA_FILE):
+    # 库中还没有表时执行建表脚本（含触发器、初始数据与 IdSequence 预置），返回是否执行
+    if inspect(engine).has_table('Department'):
+        return False
+    with engine.begin() as conn:
+        for statement in schema_statements(path):
+            # 不经过 text()：脚本里的时间常量含冒号，会被误认为绑定参数
+            conn.exec_driver_sql(statement)
+    return True
+
+
+def sample_ids(rng, ids, n=20):
+    return ','.join(rng.sample(ids, min(n, len(ids))))
+
+
+def take(ids):
+    # 删除类路由每个编号只用一次；用完后请求一个不存在的编号
+    try:
+        return ids.pop()
+    except IndexError:
+        return 'E_NONE'
+
+
+def new_employee(rng, ctx):
+    pos_id, min_salary, max_salary = rng.choice(ctx['positions'])
+    return {'name': f'基准{rng.randrange(10 ** 6)}', 'gender': rng.choice(('男', '女')), 'education': '本科',
+            'phone': '', 'email': '', 'pos_id': pos_id, 'salary': str(rng.randint(int(min_salary), int(max_salary)))}
+
+
+def adjust_salary(rng, ctx):
+    # 原岗位内调薪，不改变员工所属部门；与路径抽到同一名员工
+    identity = rng.choice(ctx['employees'])
+    return {'new_pos_id': identity['pos_id'],
+            'new_salary': str(rng.randint(int(identity['min_salary']), int(identity['max_salary'])))}
+
+
+def import_csv(rng, ctx, dry_run):
+    # 每次上传 IMPORT_ROWS 行、不建账号的 CSV；文件对象每次请求新建
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=['name', 'gender', 'education', 'phone', 'email', 'pos_id', 'salary'])
+    writer.writeheader()
+    for _ in range(IMPORT_ROWS):
+        writer.writerow(new_employee(rng, ctx))
+    data = {'file': (io.BytesIO(out.getvalue().encode('utf-8')), 'benchmark.csv')}
+    if dry_run:
+        data['dry_run'] = '1'
+    return data
+
+
+def bulk_preview(rng, ctx):
+    return {'scope': 'dept', 'dept_id': rng.choice(ctx['dept_ids']), 'mode': 'percent', 'value': '3',
+            'action': 'preview'}
+
+
+def bulk_apply(rng, ctx):
+    # 按编号给几名普通员工加减 1%（在薪资带内来回），指纹在发请求前按当前数据算好，不计入耗时
+    emp_ids = ','.join(i['emp_id'] for i in rng.sample(ctx['employees'], min(5, len(ctx['employees']))))
+    mode, value = 'percent', rng.choice(('1', '-1'))
+    with ctx['engine'].connect() as conn:
+        plan = salary_adjust.plan_adjustment(conn, 'ids', emp_ids, mode, value)
+    return {'scope': 'ids', 'emp_ids': emp_ids, 'mode': mode, 'value': value, 'action': 'apply',
+            'fingerprint': plan.fingerprint}
+
+
+def future_leave(rng):
+    start = date.today() + timedelta(days=rng.randint(1, 60))
+    return {'leave_type': '事假', 'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=rng.randint(1, 3))).isoformat(), 'reason': '基准测试'}
+
+
+# 路由定义：name, method, path(rng, ctx), 身份角色, 请求数权重, 是否写操作, 表单数据(rng, ctx)。
+# 同一请求的 path 与表单数据拿到相同的随机序列，第一次抽样结果一致（如部门与其负责人）。
+# 表单值为 (文件对象, 文件名) 时以 multipart 上传
+ROUTES = [
+    ('index', 'GET', lambda rng, ctx: '/', None, 1, False, None),
+    ('login_page', 'GET', lambda rng, ctx: '/login', None, 1, False, None),
+    ('dashboard', 'GET', lambda rng, ctx: '/dashboard', '员工', 1, False, None),
+    ('employee_info', 'GET', lambda rng, ctx: '/employee/info', '员工', 1, False, None),
+    ('leave_request_form', 'GET', lambda rng, ctx: '/leave/request', '员工', 1, False, None),
+    ('change_password_form', 'GET', lambda rng, ctx: '/change_password', '员工', 1, False, None),
+    ('attendance_page', 'GET', lambda rng, ctx: '/attendance', '员工', 1, False, None),
+    ('attendance_records', 'GET', lambda rng, ctx: '/attendance/records', '员工', 1, False, None),
+    ('leave_records', 'GET', lambda rng, ctx: '/leave/records', '员工', 1, False, None),
+    ('position_change', 'GET', lambda rng, ctx: '/position_change', '员工', 1, False, None),
+    ('approve_leaves', 'GET', lambda rng, ctx: '/leave/approve', '领导', 1, False, None),
+    ('admin_employees', 'GET', lambda rng, ctx: '/admin/employees', '领导', 1, False, None),
+    ('admin_employees_by_salary', 'GET', lambda rng, ctx: '/admin/employees?sort=salary&order=desc',
+     '领导', 1, False, None),
+    ('admin_employees_filtered', 'GET',
+     lambda rng, ctx: f"/admin/employees?dept_id={rng.choice(ctx['dept_ids'])}&education=本科", '领导', 1, False, None),
+    ('adjust_position_list', 'GET', lambda rng, ctx: '/adjust_position/list', '领导', 0.1, False, None),
+    ('adjust_position_form', 'GET', lambda rng, ctx: f"/adjust_position/{rng.choice(ctx['emp_ids'])}",
+     '领导', 1, False, None),
+    ('add_employee_form', 'GET', lambda rng, ctx: '/add_employee', '领导', 1, False, None),
+    ('import_employees_form', 'GET', lambda rng, ctx: '/admin/employees/import', '领导', 1, False, None),
+    ('export_employees', 'GET', lambda rng, ctx: '/admin/export/employees', '领导', 0.05, False, None),
+    ('export_attendance', 'GET', lambda rng, ctx: '/admin/export/attendance', '领导', 0.05, False, None),
+    ('export_leaves', 'GET', lambda rng, ctx: '/admin/export/leaves', '领导', 0.05, False, None),
+    ('view_attendance', 'GET', lambda rng, ctx: f"/attendance/view/{rng.choice(ctx['emp_ids'])}",
+     '领导', 1, False, None),
+    ('view_leave_records', 'GET', lambda rng, ctx: f"/leave/records/{rng.choice(ctx['emp_ids'])}",
+     '领导', 1, False, None),
+    ('choose_department', 'GET', lambda rng, ctx: '/change_manager', '领导', 1, False, None),
+    ('assign_manager_form', 'GET', lambda rng, ctx: f"/assign_manager/{rng.choice(ctx['dept_ids'])}",
+     '领导', 1, False, None),
+    ('add_position_form', 'GET', lambda rng, ctx: '/add_position', '领导', 1, False, None),
+    ('add_department_form', 'GET', lambda rng, ctx: '/add_department', '领导', 1, False, None),
+    ('view_departments', 'GET', lambda rng, ctx: '/departments', '领导', 1, False, None),
+    ('pool_stats', 'GET', lambda rng, ctx: '/admin/pool_stats', '领导', 1, False, None),
+    ('metrics', 'GET', lambda rng, ctx: '/metrics', None, 1, False, None),
+    ('leave_calendar', 'GET', lambda rng, ctx: f"/leave/calendar?dept_id={rng.choice(ctx['dept_ids'])}",
+     '领导', 1, False, None),
+    ('bulk_adjust_form', 'GET', lambda rng, ctx: '/adjust_position/bulk', '领导', 1, False, None),
+    ('payroll_report', 'GET', lambda rng, ctx: '/admin/payroll', '领导', 0.1, False, None),
+    ('api_payroll', 'GET', lambda rng, ctx: '/api/v1/payroll', '领导', 0.1, False, None),
+    ('api_employees', 'GET', lambda rng, ctx: '/api/v1/employees?limit=100', '领导', 1, False, None),
+    ('api_employees_by_ids', 'GET', lambda rng, ctx: f"/api/v1/employees?ids={sample_ids(rng, ctx['emp_ids'])}",
+     '领导', 1, False, None),
+    ('api_positions', 'GET', lambda rng, ctx: '/api/v1/positions?limit=100', '领导', 1, False, None),
+    ('api_departments', 'GET', lambda rng, ctx: '/api/v1/departments?limit=100', '领导', 1, False, None),
+    ('api_attendance', 'GET',
+     lambda rng, ctx: f"/api/v1/attendance?ids={sample_ids(rng, ctx['emp_ids'])}&from={ctx['month_ago']}",
+     '领导', 1, False, None),
+    ('api_leaves', 'GET', lambda rng, ctx: f"/api/v1/leaves?emp_ids={sample_ids(rng, ctx['emp_ids'])}",
+     '领导', 1, False, None),
+    ('bulk_adjust_preview', 'POST', lambda rng, ctx: '/adjust_position/bulk', '领导', 0.2, False, bulk_preview),
+    ('import_employees_dry_run', 'POST', lambda rng, ctx: '/admin/employees/import', '领导', 0.2, False,
+     lambda rng, ctx: import_csv(rng, ctx, True)),
+    ('login', 'POST', lambda rng, ctx: '/login', None, 0.2, True,
+     lambda rng, ctx: {'username': rng.choice(ctx['employees'])['username'], 'password': ctx['password']}),
+    # 登出后恢复该线程原有的会话，后续请求仍以原身份进行
+    ('logout', 'POST', lambda rng, ctx: '/logout', '员工', 0.2, True, lambda rng, ctx: {}),
+    ('attendance_checkin', 'POST', lambda rng, ctx: '/attendance', 'rotate', 1, True, lambda rng, ctx: {}),
+    ('leave_request_submit', 'POST', lambda rng, ctx: '/leave/request', '员工', 1, True,
+     lambda rng, ctx: future_leave(rng)),
+    ('approve_leaves_batch', 'POST', lambda rng, ctx: '/leave/approve', '领导', 0.2, True,
+     lambda rng, ctx: {'leave_ids': [str(i) for i in rng.sample(ctx['pending'], min(10, len(ctx['pending'])))],
+                       'action': 'approve'}),
+    ('change_password_submit', 'POST', lambda rng, ctx: '/change_password', '员工', 0.2, True,
+     lambda rng, ctx: {'old_password': ctx['password'], 'new_password': ctx['password'],
+                       'confirm_password': ctx['password']}),
+    ('add_employee_submit', 'POST', lambda rng, ctx: '/add_employee', '领导', 0.2, True, new_employee),
+    ('adjust_position_submit', 'POST', lambda rng, ctx: f"/adjust_position/{rng.choice(ctx['employees'])['emp_id']}",
+     '领导', 0.2, True, adjust_salary),
+    ('bulk_adjust_apply', 'POST', lambda rng, ctx: '/adjust_position/bulk', '领导', 0.2, True, bulk_apply),
+    ('import_employees_submit', 'POST', lambda rng, ctx: '/admin/employees/import', '领导', 0.1, True,
+     lambda rng, ctx: import_csv(rng, ctx, False)),
+    # 重新指定部门现任负责人：走完整的写入与缓存失效路径，但不改变数据
+    ('assign_manager_submit', 'POST', lambda rng, ctx: f"/assign_manager/{rng.choice(ctx['managers'])[0]}",
+     '领导', 0.2, True, lambda rng, ctx: {'manager_id': rng.choice(ctx['managers'])[1]}),
+    ('add_position_submit', 'POST', lambda rng, ctx: '/add_position', '领导', 0.2, True,
+     lambda rng, ctx: {'pos_name': f'基准岗位{unique_code()}', 'dept_id': rng.choice(ctx['dept_ids']),
+                       'min_salary': '8000', 'max_salary': '16000'}),
+    ('add_department_submit', 'POST', lambda rng, ctx: '/add_department', '领导', 0.1, True,
+     lambda rng, ctx: {'dept_id': 'Z' + (code := unique_code()), 'dept_name': f'基准部门{code}',
+                       'function_desc': '基准测试'}),
+    ('delete_employee', 'POST', lambda rng, ctx: f"/delete_employee/{take(ctx['deletable'])}", '领导', 0.2, True,
+     lambda rng, ctx: {}),
+]
+# 会清除会话的路由
+ENDS_SESSION = {'logout'}
+
+
+def multipart(data):
+    # 编码 multipart/form-data 请求体，返回 (body, Content-Type)
+    boundary = uuid.uuid4().hex
+    body = b''
+    for name, value in data.items():
+        if isinstance(value, tuple):
+            stream, filename = value
+            header = f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\nContent-Type: text/csv'
+            content = stream.read()
+        else:
+            header = f'Content-Disposition: form-data; name="{name}"'
+            content = str(value).encode('utf-8')
+        body += f'--{boundary}\r\n{header}\r\n\r\n'.encode('utf-8') + content + b'\r\n'
+    return body + f'--{boundary}--\r\n'.encode('utf-8'), f'multipart/form-data; boundary={boundary}'
+
+
+class TestClientDriver:
+    # 进程内 Flask test client：直接写入 session 设置身份，不经过 bcrypt 登录
+    def __init__(self, app, identity):
+        self.app = app
+        self.client = app.test_client()
+        self._login(identity)
+
+    def _login(self, identity):
+        with self.client.session_transaction() as sess:
+            sess.update(user_id=identity['user_id'], emp_id=identity['emp_id'],
+                        role=identity['role'], name=identity['name'])
+
+    def request(self, method, path, data=None, identity=None):
+        if identity is not None:
+            self._login(identity)
+        start = time.perf_counter()
+        response = self.client.open(path, method=method, data=data)
+        response.get_data()
+        return response.status_code, time.perf_counter() - start
+
+    def save_session(self):
+        with self.client.session_transaction() as sess:
+            return dict(sess)
+
+    def restore_session(self, saved):
+        with self.client.session_transaction() as sess:
+            sess.clear()
+            sess.update(saved)
+
+
+class HttpDriver:
+    # 通过 HTTP 访问运行中的服务，每个并发线程各自登录一次并保存 cookie
+    def __init__(self, base_url, identity, password):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+        status, _ = self.request('POST', '/login', {'username': identity['username'], 'password': password})
+        if status >= 400:
+            raise RuntimeError(f"登录失败：{identity['username']}（HTTP {status}）")
+
+    def request(self, method, path, data=None, identity=None):
+        headers = {}
+        if data is not None and any(isinstance(value, tuple) for value in data.values()):
+            body, headers['Content-Type'] = multipart(data)
+        else:
+            body = urllib.parse.urlencode(data, doseq=True).encode('utf-8') if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        return status, time.perf_counter() - start
+
+    def save_session(self):
+        # 会话保存在签名 cookie 中，恢复 cookie 即恢复登录状态
+        return list(self.cookies)
+
+    def restore_session(self, saved):
+        self.cookies.clear()
+        for cookie in saved:
+            self.cookies.set_cookie(cookie)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def load_context(engine, http_mode, password):
+    # 压测所需的样本：员工 / 领导账号、员工编号、部门编号、岗位、部门负责人、待审批请假编号，
+    # 以及可删除的员工（没有账号、不是部门负责人）
+    with engine.connect() as conn:
+        accounts = conn.execute(text(f"""
+            SELECT u.user_id, u.username, u.role, u.emp_id, e.name, e.pos_id, p.min_salary, p.max_salary
+            FROM SystemUser u
+            JOIN Employee e ON u.emp_id = e.emp_id
+            JOIN Position p ON e.pos_id = p.pos_id
+            {"WHERE u.username LIKE 'bench%'" if http_mode else ''}
+            ORDER BY u.user_id
+            LIMIT 2000
+        """)).fetchall()
+        dept_ids = [row[0] for row in conn.execute(text("SELECT dept_id FROM Department ORDER BY dept_id"))]
+        positions = [tuple(row) for row in conn.execute(text(
+            "SELECT pos_id, min_salary, max_salary FROM Position ORDER BY pos_id"))]
+        managers = [tuple(row) for row in conn.execute(text(
+            "SELECT dept_id, manager_id FROM Department WHERE manager_id IS NOT NULL ORDER BY dept_id"))]
+        deletable = [row[0] for row in conn.execute(text("""
+            SELECT e.emp_id FROM Employee e
+            WHERE NOT EXISTS (SELECT 1 FROM SystemUser u WHERE u.emp_id = e.emp_id)
+              AND NOT EXISTS (SELECT 1 FROM Department d WHERE d.manager_id = e.emp_id)
+            ORDER BY e.emp_id
+            LIMIT 1000
+        """))]
+        pending = [row[0] for row in conn.execute(text("""
+            SELECT leave_id FROM LeaveRequest
+            WHERE status = '待审批'
+            ORDER BY request_time DESC
+            LIMIT 1000
+        """))]
+        scale = {table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                 for table in ('Department', 'Position', 'Employee', 'SystemUser', 'Attendance', 'LeaveRequest')}
+
+    identities = [dict(row._mapping) for row in accounts]
+    employees = [i for i in identities if i['role'] == '员工']
+    leaders = [i for i in identities if i['role'] == '领导']
+    if not employees or not leaders:
+        raise SystemExit('数据库中缺少员工或领导账号，请先使用 --seed 灌入数据')
+    return {
+        'employees': employees,
+        'leaders': leaders,
+        'emp_ids': [i['emp_id'] for i in identities],
+        'dept_ids': dept_ids,
+        'pending': pending or [0],
+        'positions': positions,
+        'managers': managers,
+        'deletable': deletable,
+        'month_ago': (date.today() - timedelta(days=30)).isoformat(),
+        'password': password,
+        'scale': scale,
+        'engine': engine,
+    }
+
+
+def run_route(route, workers, ctx, total, random_seed):
+    name, method, path_fn, role, weight, _, data_fn = route
+    count = max(1, int(total * weight))
+    latencies = []
+    statuses = {}
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(count))
+
+    def work(index):
+        rng = random.Random(f"{random_seed}:{name}:{index}")
+        drivers = workers[index]
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            identity = rng.choice(ctx['employees']) if role == 'rotate' else None
+            driver = drivers['领导'] if role == '领导' else drivers['员工']
+            seed = rng.random()
+            saved = driver.save_session() if name in ENDS_SESSION else None
+            try:
+                status, seconds = driver.request(method, path_fn(random.Random(seed), ctx),
+                                                 data_fn(random.Random(seed), ctx) if data_fn else None, identity)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e).splitlines()[0] if str(e) else type(e).__name__)
+                continue
+            finally:
+                if saved is not None:
+                    driver.restore_session(saved)
+            with lock:
+                latencies.append(seconds)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+        list(executor.map(work, range(len(workers))))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    server_errors = sum(n for status, n in statuses.items() if status >= 500)
+    return {
+        'requests': len(latencies),
+        'errors': len(errors) + server_errors,
+        'statuses': {str(k): v for k, v in sorted(statuses.items())},
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall > 0 else None,
+        'sample_errors': errors[:5],
+    }
+
+
+def compare(results, baseline, threshold):
+    # 返回 p95 变慢超过阈值的路由列表
+    regressions = []
+    print(f"\n{'路由':<28}{'基线 p95':>12}{'本次 p95':>12}{'变化':>10}")
+    for name, current in results['routes'].items():
+        base = baseline.get('routes', {}).get(name)
+        if not base or not base.get('p95_ms') or current.get('p95_ms') is None:
+            continue
+        change = current['p95_ms'] / base['p95_ms'] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  ← 变慢'
+        print(f"{name:<28}{base['p95_ms']:>12.2f}{current['p95_ms']:>12.2f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全路由基准测试')
+    parser.add_argument('-n', '--requests', type=int, default=100, help='每个路由的请求数（再乘以路由权重）')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='并发线程数')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='结果 JSON 路径')
+    parser.add_argument('--base-url', help='压测运行中的服务（默认使用进程内 Flask test client）')
+    parser.add_argument('--routes', help='只压测这些路由（逗号分隔）')
+    parser.add_argument('--writes', action='store_true', help='包括写操作路由')
+    parser.add_argument('--baseline', help='基线结果 JSON，用于对比')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 变慢超过该比例视为回归')
+    parser.add_argument('--password', default='bench123', help='合成账号的密码')
+    parser.add_argument('--random-seed', type=int, default=42)
+    seed_group = parser.add_argument_group('灌入合成数据')
+    seed_group.add_argument('--seed', action='store_true', help='压测前先灌入合成数据')
+    seed_group.add_argument('--departments', type=int, default=100)
+    seed_group.add_argument('--positions-per-dept', type=int, default=5)
+    seed_group.add_argument('--employees', type=int, default=50000)
+    seed_group.add_argument('--attendance-days', type=int, default=400)
+    seed_group.add_argument('--leaves-per-employee', type=int, default=2)
+    seed_group.add_argument('--max-position-changes', type=int, default=2)
+    seed_group.add_argument('--chunk-size', type=int, default=5000)
+    seed_group.add_argument('--fast-load', action='store_true', help='灌数期间删除二级索引，结束后重建')
+    args = parser.parse_args()
+
+    # 导入应用会按 config.py 建立连接池并注册各项钩子
+    from app import app, datagen, db, id_allocator, request_metrics
+
+    with app.app_context():
+        engine = db.engine
+    if ensure_schema(engine):
+        print(f"已执行 {os.path.basename(SCHEMA_FILE)} 建表")
+    if args.seed:
+        started = time.perf_counter()
+        datagen.seed(engine, id_allocator, departments=args.departments,
+                     positions_per_dept=args.positions_per_dept, employees=args.employees,
+                     attendance_days=args.attendance_days, leaves_per_employee=args.leaves_per_employee,
+                     max_position_changes=args.max_position_changes, chunk_size=args.chunk_size,
+                     fast_load=args.fast_load, password=args.password, random_seed=args.random_seed)
+        print(f"灌数据耗时 {time.perf_counter() - started:.1f}s")
+
+    ctx = load_context(engine, bool(args.base_url), args.password)
+    selected = set(args.routes.split(',')) if args.routes else None
+    routes = [r for r in ROUTES if (selected is None or r[0] in selected) and (args.writes or not r[5])]
+
+    rng = random.Random(args.random_seed)
+    workers = []
+    for _ in range(args.concurrency):
+        employee, leader = rng.choice(ctx['employees']), rng.choice(ctx['leaders'])
+        if args.base_url:
+            workers.append({'员工': HttpDriver(args.base_url, employee, args.password),
+                            '领导': HttpDriver(args.base_url, leader, args.password)})
+        else:
+            workers.append({'员工': TestClientDriver(app, employee), '领导': TestClientDriver(app, leader)})
+
+    results = {
+        'meta': {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'mode': 'http' if args.base_url else 'test_client',
+            'concurrency': args.concurrency,
+            'requests_per_route': args.requests,
+            'python': platform.python_version(),
+            'scale': ctx['scale'],
+        },
+        'routes': {},
+    }
+    print(f"{'路由':<28}{'请求':>8}{'错误':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'吞吐':>10}{'SQL/请求':>10}")
+    for route in routes:
+        statements = request_metrics.metrics()['statements']
+        stats = run_route(route, workers, ctx, args.requests, args.random_seed)
+        if not args.base_url and stats['requests']:
+            stats['queries_per_request'] = round(
+                (request_metrics.metrics()['statements'] - statements) / stats['requests'], 2)
+        results['routes'][route[0]] = stats
+        print(f"{route[0]:<28}{stats['requests']:>8}{stats['errors']:>6}"
+              f"{stats['p50_ms'] or 0:>10.2f}{stats['p95_ms'] or 0:>10.2f}{stats['p99_ms'] or 0:>10.2f}"
+              f"{stats['throughput_rps'] or 0:>10.1f}{stats.get('queries_per_request', ''):>10}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 个路由 p95 变慢超过 {args.threshold:.0%}：{', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
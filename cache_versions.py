@@ -0,0 +1,92 @@
+import logging
+import re
+import threading
+
+from sqlalchemy import bindparam, event, text
+
+logger = logging.getLogger(__name__)
+
+# 各表变更计数的维护：不用逐行触发器（所有写事务都会排队等同一计数行的行锁直到提交），
+# 而是在引擎上监听写语句，记下本事务写过的表；事务提交、连接归还连接池时，
+# 每张表的计数只加一次。计数在提交之后才变化，读到新计数的请求一定能看到已提交的数据
+VERSIONED_TABLES = ('Employee', 'Position', 'Department', 'PositionChange', 'LeaveRequest', 'ArchiveWatermark')
+
+# 数据库内的级联写入：岗位变动的触发器会更新 Employee；删除员工时外键把 Department.manager_id 置空
+CASCADES = {
+    ('PositionChange', 'INSERT'): ('Employee',),
+    ('Employee', 'DELETE'): ('Department',),
+}
+
+WRITE_TARGET = re.compile(
+    r'^\s*(INSERT|REPLACE|UPDATE|DELETE)\s+(?:IGNORE\s+)?(?:INTO\s+|FROM\s+)?`?(\w+)`?', re.IGNORECASE)
+
+PENDING_KEY = 'cache_versions_pending'  # 当前事务写过的表
+COMMITTED_KEY = 'cache_versions_committed'  # 已提交、尚未加计数的表
+
+
+def bump(conn, tables):
+    # 绕过应用引擎的写入（如专用灌数引擎）结束后，在调用方事务中手动加计数
+    conn.execute(text("UPDATE CacheVersion SET version = version + 1 WHERE cache_name IN :names")
+                 .bindparams(bindparam('names', expanding=True)), {"names": sorted(tables)})
+
+
+class CacheVersionTracker:
+    def __init__(self, tables=VERSIONED_TABLES, cascades=CASCADES):
+        self._tables = {table.lower(): table for table in tables}
+        self._cascades = cascades
+        self._lock = threading.Lock()
+        self._stats = {'transactions': 0, 'bumps': 0, 'errors': 0}
+
+    def init_app(self, app, engine):
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'commit', self._on_commit)
+        event.listen(engine, 'rollback', self._on_rollback)
+        event.listen(engine.pool, 'checkin', self._on_checkin)
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        match = WRITE_TARGET.match(statement)
+        if not match:
+            return
+        table = self._tables.get(match.group(2).lower())
+        if table is None:
+            return
+        pending = conn.info.setdefault(PENDING_KEY, set())
+        pending.add(table)
+        pending.update(self._cascades.get((table, match.group(1).upper()), ()))
+
+    def _on_commit(self, conn):
+        pending = conn.info.pop(PENDING_KEY, None)
+        if pending:
+            conn.info.setdefault(COMMITTED_KEY, set()).update(pending)
+
+    def _on_rollback(self, conn):
+        conn.info.pop(PENDING_KEY, None)
+
+    def _on_checkin(self, dbapi_connection, record):
+        # 连接归还时（事务已提交）用一个独立的短事务加计数；表名来自固定列表，直接拼入语句
+        if record is None or dbapi_connection is None:
+            return
+        record.info.pop(PENDING_KEY, None)
+        tables = record.info.pop(COMMITTED_KEY, None)
+        if not tables:
+            return
+        names = ', '.join(f"'{table}'" for table in sorted(tables))
+        try:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f"UPDATE CacheVersion SET version = version + 1 WHERE cache_name IN ({names})")
+            finally:
+                cursor.close()
+            dbapi_connection.commit()
+        except Exception:
+            logger.exception("更新缓存版本号失败：%s", names)
+            with self._lock:
+                self._stats['errors'] += 1
+            return
+        with self._lock:
+            self._stats['transactions'] += 1
+            self._stats['bumps'] += len(tables)
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._stats)
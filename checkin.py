@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from datetime import date
+
+from sqlalchemy import bindparam, text
+
+logger = logging.getLogger(__name__)
+
+
+class CheckinTimeout(Exception):
+    """打卡批次未能在超时时间内落库"""
+
+
+class CheckinRejected(Exception):
+    """打卡员工已不存在（已删除或离职但会话仍有效）"""
+
+
+# 早高峰打卡的组提交流水线：
+# 1. 进程内维护“当天已打卡”的 emp_id 集合，重复打卡直接在内存中判定，不访问数据库；
+# 2. 新打卡进入待写队列，后台线程每隔几毫秒（或攒满一批）用一条多行 INSERT IGNORE
+#    在一个事务里提交整批记录；
+# 3. 请求线程等待所在批次提交成功后才返回“打卡成功”。
+# 写入前先剔除已不存在的员工；整批写入失败时逐条重试，只有出错的打卡返回失败。
+# 位图存储模式（ATTENDANCE_STORAGE = 'bitmap'）下不写 Attendance，打卡只记入钩子维护的月度位图
+class CheckinBatcher:
+    def __init__(self, flush_interval=0.005, max_batch=500, timeout=5):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._engine = None
+        self.write_rows = True
+        self._cond = threading.Condition()
+        self._pending = []  # [(emp_id, day, future)]
+        self._day = None
+        self._punched = set()
+        self._thread = None
+        self._flush_hooks = []
+        self._stats = {
+            'checkins': 0,
+            'duplicates': 0,
+            'batches': 0,
+            'largest_batch': 0,
+            'failures': 0,  # 写入失败的打卡数
+            'rejected': 0,  # 员工已不存在的打卡数
+        }
+
+    def init_app(self, app, engine):
+        self._engine = engine
+        self.flush_interval = app.config.get('CHECKIN_FLUSH_MS', self.flush_interval * 1000) / 1000
+        self.max_batch = app.config.get('CHECKIN_MAX_BATCH', self.max_batch)
+        self.timeout = app.config.get('CHECKIN_TIMEOUT', self.timeout)
+        self.write_rows = app.config.get('ATTENDANCE_STORAGE', 'rows') != 'bitmap'
+
+    def add_flush_hook(self, hook):
+        # hook(conn, rows) 在写入 Attendance 的同一事务中执行，用于维护派生数据
+        self._flush_hooks.append(hook)
+
+    def check_in(self, emp_id, day=None):
+        # 返回 True 表示本次打卡已落库，False 表示当天已打过卡
+        day = day or date.today()
+        while True:
+            if self._day != day:
+                self._load_day(day)
+            with self._cond:
+                # 装载期间又被切换到别的日期时重新装载
+                if self._day == day:
+                    break
+        with self._cond:
+            if emp_id in self._punched:
+                self._stats['duplicates'] += 1
+                return False
+            self._punched.add(emp_id)
+            future = Future()
+            self._pending.append((emp_id, day, future))
+            self._ensure_thread()
+            self._cond.notify()
+
+        try:
+            future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise CheckinTimeout('打卡写入超时')
+        return True
+
+    def _load_day(self, day):
+        # 跨天时重新从数据库装载当天已打卡名单（多进程部署时其它进程的打卡由 INSERT IGNORE 兜底）。
+        # 查询不持有 _cond，不阻塞其他打卡请求；并发装载同一天时取并集，不丢掉已记入的打卡
+        with self._engine.connect() as conn:
+            if self.write_rows:
+                rows = conn.execute(
+                    text("SELECT emp_id FROM Attendance WHERE date = :dt"),
+                    {"dt": day}
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    text("SELECT emp_id FROM AttendanceMonthly WHERE month = :month AND (day_mask & :bit) <> 0"),
+                    {"month": day.replace(day=1), "bit": 1 << (day.day - 1)}
+                ).fetchall()
+        with self._cond:
+            if self._day == day:
+                self._punched.update(row[0] for row in rows)
+            else:
+                self._day = day
+                self._punched = {row[0] for row in rows}
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='checkin-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # 攒批：等到间隔结束或达到批量上限
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            with self._engine.connect() as conn:
+                known = {row[0] for row in conn.execute(
+                    text("SELECT emp_id FROM Employee WHERE emp_id IN :ids")
+                    .bindparams(bindparam('ids', expanding=True)),
+                    {"ids": sorted({emp_id for emp_id, _, _ in batch})}
+                )}
+        except Exception as e:
+            logger.exception("打卡批次写入失败（%d 条）", len(batch))
+            self._fail(batch, e)
+            return
+        rejected = [item for item in batch if item[0] not in known]
+        if rejected:
+            with self._cond:
+                self._stats['rejected'] += len(rejected)
+            self._fail(rejected, CheckinRejected('员工不存在'))
+        batch = [item for item in batch if item[0] in known]
+        if not batch:
+            return
+
+        try:
+            with self._engine.begin() as conn:
+                self._write(conn, batch)
+        except Exception as e:
+            # 连接已失效时逐条重试也无济于事，整批失败
+            if len(batch) == 1 or getattr(e, 'connection_invalidated', False):
+                logger.exception("打卡批次写入失败（%d 条）", len(batch))
+                self._fail(batch, e)
+                return
+            logger.warning("打卡批次写入失败（%d 条），逐条重试：%s", len(batch), e)
+            self._retry_each(batch)
+            return
+        self._succeed(batch)
+
+    def _write(self, conn, batch):
+        rows = [{"eid": emp_id, "dt": day} for emp_id, day, _ in batch]
+        # 参数列表交给 executemany，PyMySQL 会将其改写为一条多行 INSERT
+        if self.write_rows:
+            conn.execute(text("INSERT IGNORE INTO Attendance (emp_id, date) VALUES (:eid, :dt)"), rows)
+        for hook in self._flush_hooks:
+            hook(conn, rows)
+
+    def _retry_each(self, batch):
+        written = []
+        for item in batch:
+            try:
+                with self._engine.begin() as conn:
+                    self._write(conn, [item])
+            except Exception as e:
+                logger.warning("打卡写入失败：%s %s：%s", item[0], item[1], e)
+                self._fail([item], e)
+            else:
+                written.append(item)
+        self._succeed(written)
+
+    def _succeed(self, items):
+        if not items:
+            return
+        with self._cond:
+            self._stats['checkins'] += len(items)
+            self._stats['batches'] += 1
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(items))
+        for _, _, future in items:
+            future.set_result(True)
+
+    def _fail(self, items, error):
+        # 失败的打卡移出当天已打卡名单，员工可以重新打卡
+        with self._cond:
+            if not isinstance(error, CheckinRejected):
+                self._stats['failures'] += len(items)
+            for emp_id, day, _ in items:
+                if day == self._day:
+                    self._punched.discard(emp_id)
+        for _, _, future in items:
+            future.set_exception(error)
+
+    def metrics(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        return stats
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, request
+from sqlalchemy import bindparam, text
+
+
+# 只读页面的条件 GET 与渲染结果缓存。
+# 各表在 CacheVersion 中有一个变更计数（由 cache_versions 在写事务提交后递增，覆盖路由、导入、命令行与触发器级联），
+# 页面的 ETag = 相关表的版本向量 + 当前用户身份 + 路由参数；ETag 未变时直接返回 304，
+# 否则优先从以 ETag 为键的 LRU 中取渲染好的 HTML，都未命中才执行视图。
+# 版本向量总是读主库：副本有复制延迟，读到旧版本会让新数据的页面长期沿用旧 ETag
+class ConditionalCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._connection = None
+        self._read_connection = None
+        self._salt = ''
+        self._lock = threading.Lock()
+        self._bodies = OrderedDict()  # ETag -> HTML
+        self._stats = {'not_modified': 0, 'lru_hits': 0, 'renders': 0, 'replica_behind': 0}
+
+    def init_app(self, app, engine=None, connection=None, read_connection=None):
+        # connection：返回请求级主库连接的函数；read_connection：返回本请求已使用的副本连接（未使用时为 None）
+        self.max_entries = app.config.get('RESPONSE_CACHE_SIZE', self.max_entries)
+        self._connection = connection
+        self._read_connection = read_connection
+        # 模板或代码更新后页面内容会变，ETag 需随之变化；同一次部署的各进程取值相同
+        template_dir = os.path.join(app.root_path, app.template_folder or 'templates')
+        paths = [os.path.join(template_dir, name) for name in os.listdir(template_dir)]
+        paths.append(os.path.join(app.root_path, 'app.py'))
+        self._salt = str(max(os.path.getmtime(path) for path in paths if os.path.exists(path)))
+
+    def versions(self, tables, conn=None):
+        rows = (conn or self._connection()).execute(
+            text("SELECT cache_name, version FROM CacheVersion WHERE cache_name IN :names")
+            .bindparams(bindparam('names', expanding=True)),
+            {"names": list(tables)}
+        ).fetchall()
+        found = dict(rows)
+        return [found.get(table, 0) for table in tables]
+
+    def etag(self, versions):
+        key = [
+            self._salt, request.endpoint, request.view_args, request.query_string.decode('utf-8'),
+            [g.get('user_id'), g.get('emp_id'), g.get('role'), g.get('name')],
+            versions,
+        ]
+        return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def cached(self, *tables):
+        # 装饰只读 GET 视图；tables 为页面数据依赖的表
+        def decorator(view):
+            @wraps(view)
+            def wrapped(*args, **kwargs):
+                if request.method != 'GET':
+                    return view(*args, **kwargs)
+                versions = self.versions(tables)
+                etag = self.etag(versions)
+                if request.if_none_match.contains_weak(etag):
+                    with self._lock:
+                        self._stats['not_modified'] += 1
+                    return self._respond(Response(status=304), etag)
+
+                with self._lock:
+                    body = self._bodies.get(etag)
+                    if body is not None:
+                        self._bodies.move_to_end(etag)
+                        self._stats['lru_hits'] += 1
+                if body is None:
+                    rv = view(*args, **kwargs)
+                    if not isinstance(rv, str):
+                        return rv
+                    body = rv
+                    replica = self._read_connection() if self._read_connection else None
+                    if replica is not None and self.versions(tables, conn=replica) != versions:
+                        # 视图读的副本与主库版本不一致，页面可能是旧数据：不缓存，也不给 ETag
+                        with self._lock:
+                            self._stats['replica_behind'] += 1
+                        return Response(body, mimetype='text/html')
+                    with self._lock:
+                        self._stats['renders'] += 1
+                        self._bodies[etag] = body
+                        while len(self._bodies) > self.max_entries:
+                            self._bodies.popitem(last=False)
+                return self._respond(Response(body, mimetype='text/html'), etag)
+            return wrapped
+        return decorator
+
+    def _respond(self, response, etag):
+        response.set_etag(etag, weak=True)
+        # 页面与用户相关，只允许浏览器缓存，且每次使用前都要带 If-None-Match 重新验证
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._bodies)
+        return stats
@@ -247,6 +247,175 @@ ADD COLUMN reviewer_id VARCHAR(10),
 ADD COLUMN review_time DATETIME,
 ADD FOREIGN KEY (reviewer_id) REFERENCES employee(emp_id);
 
+-- 员工总览（/admin/employees）键集分页、筛选与排序所用索引
+CREATE INDEX idx_employee_salary ON Employee (salary, emp_id);
+CREATE INDEX idx_employee_name ON Employee (name, emp_id);
+CREATE INDEX idx_employee_education ON Employee (education, emp_id);
+CREATE INDEX idx_employee_pos ON Employee (pos_id, emp_id);
 
+-- 打卡组提交按日期装载当天已打卡名单
+CREATE INDEX idx_attendance_date ON Attendance (date, emp_id);
 
+-- 员工×月份考勤汇总，打卡时增量维护；可用 flask --app app rebuild-attendance-summary 从 Attendance 重建
+CREATE TABLE AttendanceMonthly (
+    emp_id VARCHAR(10) NOT NULL,
+    month DATE NOT NULL COMMENT '当月1日',
+    days_present INT NOT NULL DEFAULT 0,
+    first_date DATE NOT NULL,
+    last_date DATE NOT NULL,
+    current_streak INT NOT NULL DEFAULT 0 COMMENT '截至 last_date 的连续打卡天数',
+    longest_streak INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (emp_id, month),
+    FOREIGN KEY (emp_id) REFERENCES Employee(emp_id)
+);
+
+-- 编号序列表：应用以号段（hi/lo）方式预留 emp_id / user_id / pos_id 编号
+-- seq_name 取值 EMP、USER、POS:<dept_id>；建库时按现有最大编号预置，新增部门时在同一事务中预置该部门的岗位序列
+CREATE TABLE IdSequence (
+    seq_name VARCHAR(30) PRIMARY KEY,
+    next_value BIGINT NOT NULL
+);
+INSERT INTO IdSequence (seq_name, next_value)
+SELECT 'EMP', COALESCE(MAX(CAST(SUBSTRING(emp_id, 4) AS UNSIGNED)), 0) + 1 FROM Employee WHERE emp_id LIKE 'EMP%';
+INSERT INTO IdSequence (seq_name, next_value)
+SELECT 'USER', COALESCE(MAX(CAST(SUBSTRING(user_id, 2) AS UNSIGNED)), 0) + 1 FROM SystemUser WHERE user_id LIKE 'U%';
+INSERT INTO IdSequence (seq_name, next_value)
+SELECT CONCAT('POS:', d.dept_id), COALESCE(MAX(CAST(SUBSTRING(p.pos_id, CHAR_LENGTH(d.dept_id) + 1) AS UNSIGNED)), 0) + 1
+FROM Department d
+LEFT JOIN `Position` p ON p.dept_id = d.dept_id
+GROUP BY d.dept_id;
+
+-- 待审批列表按状态过滤、按申请时间倒序分页
+CREATE INDEX idx_leave_status_time ON LeaveRequest (status, request_time);
+
+-- 进程内缓存的共享版本号：每张表一行变更计数（见下），各进程据此判断本地缓存是否过期
+CREATE TABLE CacheVersion (
+    cache_name VARCHAR(30) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- 各表变更计数：由应用（cache_versions.py）在写事务提交后每个事务每张表加一次，只读页面据此计算 ETag（条件 GET）。
+-- 不用 FOR EACH ROW 触发器：那样所有写事务都要持有同一计数行的行锁直到提交，全公司的写入被串行化。
+-- 在应用之外手工修改这些表后，需执行 UPDATE CacheVersion SET version = version + 1 WHERE cache_name = '<表名>'
+INSERT INTO CacheVersion (cache_name, version) VALUES
+    ('Employee', 0),
+    ('Position', 0),
+    ('Department', 0),
+    ('PositionChange', 0),
+    ('LeaveRequest', 0);
+
+-- 考勤位图：day_mask 的第 n-1 位表示当月第 n 天已打卡，每个员工每月一个 31 位整数。
+-- 已有数据升级：执行本段后运行 flask --app app rebuild-attendance-summary 从 Attendance 回填位图
+ALTER TABLE AttendanceMonthly
+    ADD COLUMN day_mask INT UNSIGNED NOT NULL DEFAULT 0 COMMENT '第 n 天出勤则第 n-1 位为 1';
+-- 位图存储模式下按月份查询当天已打卡名单、按季度导出
+CREATE INDEX idx_attendance_monthly_month ON AttendanceMonthly (month);
+
+-- 1..31 的日序号，用于把位图展开成逐天记录
+CREATE TABLE DayOfMonth (
+    n TINYINT PRIMARY KEY
+);
+INSERT INTO DayOfMonth VALUES
+    (1), (2), (3), (4), (5), (6), (7), (8), (9), (10), (11), (12), (13), (14), (15), (16),
+    (17), (18), (19), (20), (21), (22), (23), (24), (25), (26), (27), (28), (29), (30), (31);
+
+-- 兼容视图：与 Attendance 同形状的 (emp_id, date)，另带 month 以便按月走索引筛选
+CREATE VIEW AttendanceDays AS
+SELECT m.emp_id, m.month, m.month + INTERVAL (d.n - 1) DAY AS date
+FROM AttendanceMonthly m
+JOIN DayOfMonth d ON (m.day_mask >> (d.n - 1)) & 1 = 1;
+
+-- 请假区间索引：提交时按员工检查时间重叠、部门请假日历逐人取区间内的请假
+CREATE INDEX idx_leave_emp_period ON LeaveRequest (emp_id, start_date, end_date);
+
+-- 考勤对账结果：每名员工每月一行，absent_mask 第 n-1 位为 1 表示第 n 天是既无打卡、也无已批准请假的工作日。
+-- 由 flask --app app reconcile-attendance --month YYYY-MM 按部门并行重算
+CREATE TABLE AttendanceReconciliation (
+    emp_id VARCHAR(10) NOT NULL,
+    month DATE NOT NULL,
+    dept_id VARCHAR(20) NOT NULL,
+    workdays TINYINT UNSIGNED NOT NULL,
+    present_days TINYINT UNSIGNED NOT NULL,
+    leave_days TINYINT UNSIGNED NOT NULL,
+    absent_days TINYINT UNSIGNED NOT NULL,
+    absent_mask INT UNSIGNED NOT NULL,
+    checked_at DATETIME NOT NULL,
+    PRIMARY KEY (emp_id, month),
+    INDEX idx_reconciliation_month_dept (month, dept_id),
+    FOREIGN KEY (emp_id) REFERENCES Employee(emp_id)
+);
+
+-- 冷数据归档：保留期之前已结束的考勤、请假、岗位变动由 flask --app app archive-history 分批移入下列归档表，
+-- 离职员工的档案与全部历史在办理离职时移入。分区表不支持外键，因此采用独立归档表；归档表不设外键
+CREATE TABLE AttendanceArchive (
+    attendance_id INT PRIMARY KEY,
+    emp_id VARCHAR(10) NOT NULL,
+    date DATE NOT NULL,
+    archived_at DATETIME NOT NULL,
+    INDEX idx_attendance_archive_emp (emp_id, date)
+);
+
+CREATE TABLE LeaveRequestArchive (
+    leave_id INT PRIMARY KEY,
+    emp_id VARCHAR(10) NOT NULL,
+    leave_type VARCHAR(50) NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    request_time DATETIME NOT NULL,
+    reason TEXT,
+    status ENUM('待审批', '已批准', '已拒绝'),
+    reviewer_id VARCHAR(10),
+    review_time DATETIME,
+    archived_at DATETIME NOT NULL,
+    INDEX idx_leave_archive_emp_time (emp_id, request_time),
+    INDEX idx_leave_archive_emp_period (emp_id, start_date, end_date)
+);
+
+CREATE TABLE PositionChangeArchive (
+    change_id INT PRIMARY KEY,
+    emp_id VARCHAR(10) NOT NULL,
+    change_date DATETIME NOT NULL,
+    old_pos_id VARCHAR(10) NOT NULL,
+    new_pos_id VARCHAR(10) NOT NULL,
+    old_salary DECIMAL(10,2) NOT NULL,
+    new_salary DECIMAL(10,2) NOT NULL,
+    archived_at DATETIME NOT NULL,
+    INDEX idx_position_change_archive_emp (emp_id, change_date)
+);
+
+-- 离职员工的考勤月度汇总：位图存储模式或压缩逐天记录后，day_mask 是唯一的考勤记录，离职时随档案一起移入
+CREATE TABLE AttendanceMonthlyArchive (
+    emp_id VARCHAR(10) NOT NULL,
+    month DATE NOT NULL,
+    days_present INT NOT NULL,
+    first_date DATE NOT NULL,
+    last_date DATE NOT NULL,
+    current_streak INT NOT NULL,
+    longest_streak INT NOT NULL,
+    day_mask INT UNSIGNED NOT NULL,
+    archived_at DATETIME NOT NULL,
+    PRIMARY KEY (emp_id, month)
+);
+
+-- 离职员工档案（离职时的岗位与薪资），供归档历史中的审批人等回查姓名
+CREATE TABLE EmployeeArchive (
+    emp_id VARCHAR(10) PRIMARY KEY,
+    name VARCHAR(50) NOT NULL,
+    gender ENUM('男', '女') NOT NULL,
+    education ENUM('中专', '高中', '大专', '本科', '硕士', '博士') NOT NULL,
+    phone VARCHAR(20),
+    email VARCHAR(100),
+    pos_id VARCHAR(10) NOT NULL,
+    salary DECIMAL(10,2) NOT NULL,
+    departed_at DATETIME NOT NULL
+);
+
+-- 归档水位：table_name 表中早于 archived_before 的已结束记录都已移入归档表，查询起点早于水位时才读归档表
+CREATE TABLE ArchiveWatermark (
+    table_name VARCHAR(30) PRIMARY KEY,
+    archived_before DATE NOT NULL,
+    updated_at DATETIME NOT NULL
+);
 
+-- 归档水位也有变更计数：水位推进后，含归档记录的历史页面（?history=all）需要重新计算 ETag
+INSERT INTO CacheVersion (cache_name, version) VALUES ('ArchiveWatermark', 0);
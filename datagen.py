@@ -0,0 +1,284 @@
+import random
+from datetime import date, datetime, timedelta
+
+import bcrypt
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+
+import attendance_summary
+import cache_versions
+from employee_import import EDUCATION_LEVELS, GENDERS
+from id_allocator import create_sequence, format_emp_id, format_pos_id, format_user_id, pos_sequence
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈'
+GIVEN_CHARS = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉萍红建文辉力云飞鹏宇浩晨欣怡佳悦子涵轩'
+LEAVE_TYPES = ('事假', '病假', '年假', '婚假', '产假')
+LEAVE_STATUSES = ('待审批', '已批准', '已拒绝')
+LEAVE_STATUS_WEIGHTS = (1, 7, 2)
+
+INSERT_DEPARTMENT = """
+    INSERT INTO Department (dept_id, dept_name, function_desc, phone)
+    VALUES (:dept_id, :dept_name, :function_desc, :phone)
+"""
+INSERT_POSITION = """
+    INSERT INTO Position (pos_id, pos_name, dept_id, min_salary, max_salary)
+    VALUES (:pos_id, :pos_name, :dept_id, :min_salary, :max_salary)
+"""
+INSERT_ATTENDANCE = "INSERT INTO Attendance (emp_id, date) VALUES (:emp_id, :date)"
+INSERT_MONTHLY = """
+    INSERT INTO AttendanceMonthly
+        (emp_id, month, days_present, first_date, last_date, current_streak, longest_streak, day_mask)
+    VALUES (:emp_id, :month, :days_present, :first_date, :last_date, :current_streak, :longest_streak, :day_mask)
+"""
+INSERT_POSITION_CHANGE = """
+    INSERT INTO PositionChange (emp_id, change_date, old_pos_id, new_pos_id, old_salary, new_salary)
+    VALUES (:emp_id, :change_date, :old_pos_id, :new_pos_id, :old_salary, :new_salary)
+"""
+INSERT_LEAVE = """
+    INSERT INTO LeaveRequest
+        (emp_id, leave_type, start_date, end_date, request_time, reason, status, reviewer_id, review_time)
+    VALUES (:emp_id, :leave_type, :start_date, :end_date, :request_time, :reason, :status, :reviewer_id, :review_time)
+"""
+
+
+def dept_code(n):
+    # 部门编码只能是字母：B + 三位 26 进制字母（BAAA、BAAB ...）
+    letters = ''
+    for _ in range(3):
+        n, r = divmod(n, 26)
+        letters = chr(ord('A') + r) + letters
+    return 'B' + letters
+
+
+def random_name(rng):
+    return rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_CHARS) for _ in range(rng.randint(1, 2)))
+
+
+def random_salary(rng, position):
+    return rng.randrange(position['min_salary'], position['max_salary'] + 1, 100)
+
+
+# 大批量灌数的表：灌数期间删除其普通二级索引，结束后一次性重建
+BULK_TABLES = ('employee', 'attendance', 'leaverequest', 'positionchange')
+
+
+def bulk_engine(engine):
+    # 专用灌数引擎：会话级关闭唯一性与外键检查（生成的数据自身保证一致），触发器照常执行。
+    # 单独建引擎，避免这些会话设置随连接回到应用的连接池
+    if engine.dialect.name != 'mysql':
+        return engine
+    return create_engine(engine.url, pool_size=1, max_overflow=0, connect_args={
+        'init_command': 'SET SESSION unique_checks = 0, foreign_key_checks = 0'
+    })
+
+
+def drop_secondary_indexes(engine, tables=BULK_TABLES, log=print):
+    # InnoDB 不支持 ALTER TABLE ... DISABLE KEYS，改为删除普通二级索引、灌完后排序重建；
+    # 外键依赖的索引无法删除（MySQL 1553），原样保留。返回 [(表, 索引, 列定义)]
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT table_name, index_name,
+                   GROUP_CONCAT(CONCAT('`', column_name, '`') ORDER BY seq_in_index) AS columns
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND LOWER(table_name) IN :tables
+              AND index_name <> 'PRIMARY' AND non_unique = 1
+            GROUP BY table_name, index_name
+        """).bindparams(bindparam('tables', expanding=True)), {"tables": list(tables)}).fetchall()
+    dropped = []
+    for table, index, columns in rows:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE `{table}` DROP INDEX `{index}`"))
+        except SQLAlchemyError as e:
+            log(f"保留索引 {table}.{index}：{str(e.orig if hasattr(e, 'orig') else e).splitlines()[0]}")
+            continue
+        dropped.append((table, index, columns))
+    if dropped:
+        log(f"已删除 {len(dropped)} 个二级索引：{', '.join(f'{t}.{i}' for t, i, _ in dropped)}")
+    return dropped
+
+
+def rebuild_indexes(engine, dropped, log=print):
+    # 同一张表的索引合并为一条 ALTER TABLE，只扫描一遍表
+    by_table = {}
+    for table, index, columns in dropped:
+        by_table.setdefault(table, []).append(f"ADD INDEX `{index}` ({columns})")
+    for table, clauses in by_table.items():
+        started = datetime.now()
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE `{table}` {', '.join(clauses)}"))
+        log(f"已重建 {table} 的 {len(clauses)} 个索引，用时 {(datetime.now() - started).total_seconds():.1f}s")
+
+
+def position_history(rng, final, salary, positions_by_dept, position_rows, changes, days):
+    # 倒推岗位变动链：返回 (初始岗位, 初始薪资, [(变动时间, 原岗位, 新岗位, 原薪资, 新薪资)])，
+    # 每一步的新薪资都在目标岗位范围内（BeforePositionChangeInsert 的校验），最后一步落在 final
+    chain = [(final, salary)]
+    for _ in range(changes):
+        dept_positions = positions_by_dept[chain[0][0]['dept_id']]
+        previous = rng.choice(dept_positions if rng.random() < 0.7 else position_rows)
+        chain.insert(0, (previous, random_salary(rng, previous)))
+    moments = sorted(
+        datetime.combine(days[rng.randrange(len(days))], datetime.min.time()) + timedelta(minutes=rng.randint(540, 1080))
+        for _ in range(changes)
+    ) if days else [datetime.now()] * changes
+    steps = [
+        (moment, old[0]['pos_id'], new[0]['pos_id'], old[1], new[1])
+        for moment, old, new in zip(moments, chain, chain[1:])
+    ]
+    return chain[0][0], chain[0][1], steps
+
+
+# 合成数据生成器：按规模向已建好表结构的库中追加部门、岗位、员工、账号、考勤、请假与岗位变动数据。
+# 编号通过 IdAllocator 取号，与现有数据及应用后续取号不冲突；所有写入按 chunk_size 分批 executemany。
+# 生成的账号统一使用同一个密码（只做一次 bcrypt），每个部门的第一名员工为“领导”并任部门负责人。
+# 与触发器保持一致：员工先以变动前的岗位 / 薪资写入，再按时间顺序插入 PositionChange，
+# 由 AfterPositionChangeInsert 把员工更新到最终岗位；部门负责人没有岗位变动，且最后才设置
+# （before_department_update 要求负责人属于本部门）。
+# fast_load=True 时删除大表的二级索引并关闭唯一性 / 外键检查，灌完后重建索引
+def seed(engine, allocator, departments=100, positions_per_dept=5, employees=50000, attendance_days=400,
+         leaves_per_employee=2, max_position_changes=2, chunk_size=5000, fast_load=False,
+         password='bench123', random_seed=42, log=print):
+    rng = random.Random(random_seed)
+    counts = dict.fromkeys(('departments', 'positions', 'employees', 'accounts', 'attendance', 'leaves',
+                            'position_changes'), 0)
+
+    with engine.connect() as conn:
+        existing = conn.execute(text("SELECT COUNT(*) FROM Department WHERE dept_id LIKE 'B___'")).scalar()
+
+    dept_rows = []
+    position_rows = []
+    positions_by_dept = {}
+    for i in range(existing, existing + departments):
+        dept_id = dept_code(i)
+        dept_rows.append({'dept_id': dept_id, 'dept_name': f'基准部门{i:04d}',
+                          'function_desc': '基准测试生成', 'phone': f'010-{rng.randint(10000000, 99999999)}'})
+        for k in range(1, positions_per_dept + 1):
+            min_salary = rng.randrange(5000, 30000, 1000)
+            position = {'pos_id': format_pos_id(dept_id, k), 'pos_name': f'岗位{k}', 'dept_id': dept_id,
+                        'min_salary': min_salary, 'max_salary': min_salary * 2}
+            position_rows.append(position)
+            positions_by_dept.setdefault(dept_id, []).append(position)
+    with engine.begin() as conn:
+        conn.execute(text(INSERT_DEPARTMENT), dept_rows)
+        conn.execute(text(INSERT_POSITION), position_rows)
+        for row in dept_rows:
+            create_sequence(conn, pos_sequence(row['dept_id']), positions_per_dept + 1)
+    counts['departments'] = len(dept_rows)
+    counts['positions'] = len(position_rows)
+    log(f"已生成 {len(dept_rows)} 个部门、{len(position_rows)} 个岗位")
+
+    load = bulk_engine(engine) if fast_load else engine
+    dropped = drop_secondary_indexes(load, log=log) if fast_load and engine.dialect.name == 'mysql' else []
+    try:
+        managers = _seed_employees(load, allocator, rng, counts, position_rows, positions_by_dept, employees,
+                                   attendance_days, leaves_per_employee, max_position_changes, chunk_size,
+                                   password, log)
+    finally:
+        if dropped:
+            rebuild_indexes(load, dropped, log=log)
+        if load is not engine:
+            load.dispose()
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE Department SET manager_id = :emp_id WHERE dept_id = :dept_id"),
+                     [{'emp_id': emp_id, 'dept_id': dept_id} for dept_id, emp_id in managers.items()])
+        if load is not engine:
+            # 灌数引擎不在变更计数的监听范围内，这里补加一次
+            cache_versions.bump(conn, cache_versions.VERSIONED_TABLES)
+    return counts
+
+
+def _seed_employees(engine, allocator, rng, counts, position_rows, positions_by_dept, employees, attendance_days,
+                    leaves_per_employee, max_position_changes, chunk_size, password, log):
+    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    days = [date.today() - timedelta(days=n) for n in range(attendance_days, 0, -1)]
+    workdays = [day for day in days if day.weekday() < 5]
+    managers = {}  # dept_id -> 负责人 emp_id
+
+    buffers = {INSERT_ATTENDANCE: [], INSERT_MONTHLY: [], INSERT_LEAVE: [], INSERT_POSITION_CHANGE: []}
+
+    def flush(sql, force=False):
+        rows = buffers[sql]
+        if rows and (force or len(rows) >= chunk_size):
+            with engine.begin() as conn:
+                conn.execute(text(sql), rows)
+            buffers[sql] = []
+
+    for offset in range(0, employees, chunk_size):
+        size = min(chunk_size, employees - offset)
+        emp_rows, user_rows = [], []
+        for number, user_number in zip(allocator.allocate('EMP', size), allocator.allocate('USER', size)):
+            position = rng.choice(position_rows)
+            salary = random_salary(rng, position)
+            emp_id = format_emp_id(number)
+            is_manager = position['dept_id'] not in managers
+            if is_manager:
+                managers[position['dept_id']] = emp_id
+            changes = 0 if is_manager else rng.randint(0, max_position_changes)
+            initial, initial_salary, steps = position_history(rng, position, salary, positions_by_dept,
+                                                              position_rows, changes, days)
+            emp_rows.append({
+                'emp_id': emp_id, 'name': random_name(rng), 'gender': rng.choice(GENDERS),
+                'education': rng.choice(EDUCATION_LEVELS), 'phone': f'1{rng.randint(3000000000, 9999999999)}',
+                'email': f'{emp_id.lower()}@example.com', 'pos_id': initial['pos_id'], 'salary': initial_salary,
+                'dept_id': position['dept_id'], 'steps': steps,
+            })
+            user_rows.append({'user_id': format_user_id(user_number), 'username': f'bench{number}',
+                              'password_hash': password_hash, 'role': '领导' if is_manager else '员工',
+                              'emp_id': emp_id})
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO Employee (emp_id, name, gender, education, phone, email, pos_id, salary)
+                VALUES (:emp_id, :name, :gender, :education, :phone, :email, :pos_id, :salary)
+            """), emp_rows)
+            conn.execute(text("""
+                INSERT INTO SystemUser (user_id, username, password_hash, role, emp_id)
+                VALUES (:user_id, :username, :password_hash, :role, :emp_id)
+            """), user_rows)
+        counts['employees'] += len(emp_rows)
+        counts['accounts'] += len(user_rows)
+
+        # 考勤等明细行数远大于员工数，攒满 chunk_size 行即写入一个事务，内存占用与总规模无关
+        for emp in emp_rows:
+            dates = [day for day in workdays if rng.random() < 0.92]
+            buffers[INSERT_ATTENDANCE].extend({'emp_id': emp['emp_id'], 'date': day} for day in dates)
+            counts['attendance'] += len(dates)
+            for month, item in attendance_summary.summarize(dates).items():
+                buffers[INSERT_MONTHLY].append(dict(item, emp_id=emp['emp_id'], month=month))
+
+            reviewer = managers[emp['dept_id']]
+            taken = []  # 待审批 / 已批准的请假不能重叠，与提交时的检查一致
+            for _ in range(leaves_per_employee):
+                start = days[rng.randrange(len(days))] if days else date.today()
+                end = start + timedelta(days=rng.randint(1, 5))
+                status = rng.choices(LEAVE_STATUSES, LEAVE_STATUS_WEIGHTS)[0]
+                if status != '已拒绝':
+                    if any(start < hi and end > lo for lo, hi in taken):
+                        continue
+                    taken.append((start, end))
+                requested = datetime.combine(start, datetime.min.time()) - timedelta(days=rng.randint(1, 14),
+                                                                                     minutes=rng.randint(0, 1439))
+                buffers[INSERT_LEAVE].append({
+                    'emp_id': emp['emp_id'], 'leave_type': rng.choice(LEAVE_TYPES), 'start_date': start,
+                    'end_date': end, 'request_time': requested,
+                    'reason': '基准测试生成', 'status': status,
+                    'reviewer_id': None if status == '待审批' else reviewer,
+                    'review_time': None if status == '待审批' else requested + timedelta(hours=rng.randint(1, 48)),
+                })
+                counts['leaves'] += 1
+
+            # 同一员工的变动按时间顺序写入，触发器逐行把 Employee 推进到最终岗位
+            buffers[INSERT_POSITION_CHANGE].extend(
+                {'emp_id': emp['emp_id'], 'change_date': moment, 'old_pos_id': old_pos, 'new_pos_id': new_pos,
+                 'old_salary': old_salary, 'new_salary': new_salary}
+                for moment, old_pos, new_pos, old_salary, new_salary in emp['steps']
+            )
+            counts['position_changes'] += len(emp['steps'])
+            for sql in buffers:
+                flush(sql)
+        log(f"已生成 {counts['employees']}/{employees} 名员工，考勤 {counts['attendance']} 条")
+
+    for sql in buffers:
+        flush(sql, force=True)
+    return managers
@@ -0,0 +1,169 @@
+import csv
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from hashing import HasherBusy
+from id_allocator import format_emp_id, format_user_id
+
+GENDERS = ('男', '女')
+EDUCATION_LEVELS = ('中专', '高中', '大专', '本科', '硕士', '博士')
+ROLES = ('员工', '领导')
+REQUIRED_COLUMNS = ('name', 'gender', 'education', 'pos_id', 'salary')
+# 共享哈希线程池排队已满时的重试间隔（秒）：导入让位于登录
+HASH_RETRY_SECONDS = 0.05
+
+INSERT_EMPLOYEE = """
+    INSERT INTO Employee (emp_id, name, gender, education, phone, email, pos_id, salary)
+    VALUES (:emp_id, :name, :gender, :education, :phone, :email, :pos_id, :salary)
+"""
+INSERT_USER = """
+    INSERT INTO SystemUser (user_id, username, password_hash, role, emp_id)
+    VALUES (:user_id, :username, :password_hash, :role, :emp_id)
+"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.accounts = 0
+        self.rows = 0
+        self.failed = 0  # 校验通过但所在批次写入失败的行数
+        self.errors = []  # [(行号或行号范围, 错误信息)]
+
+
+def validate_row(row, positions, usernames, create_accounts, default_password):
+    # 返回 (清洗后的数据, 错误信息)；岗位薪资范围与用户名去重都在内存中完成
+    missing = [col for col in REQUIRED_COLUMNS if not (row.get(col) or '').strip()]
+    if missing:
+        return None, f"缺少字段：{', '.join(missing)}"
+    data = {
+        'name': row['name'].strip(),
+        'gender': row['gender'].strip(),
+        'education': row['education'].strip(),
+        'phone': (row.get('phone') or '').strip() or None,
+        'email': (row.get('email') or '').strip() or None,
+        'pos_id': row['pos_id'].strip(),
+    }
+    if data['gender'] not in GENDERS:
+        return None, f"性别无效：{data['gender']}"
+    if data['education'] not in EDUCATION_LEVELS:
+        return None, f"学历无效：{data['education']}"
+    salary_range = positions.get(data['pos_id'])
+    if salary_range is None:
+        return None, f"岗位不存在：{data['pos_id']}"
+    try:
+        data['salary'] = Decimal(row['salary'].strip())
+    except InvalidOperation:
+        return None, f"薪资无效：{row['salary']}"
+    if not salary_range[0] <= data['salary'] <= salary_range[1]:
+        return None, f"薪资超出岗位范围（{salary_range[0]} ~ {salary_range[1]}）"
+
+    if create_accounts:
+        username = (row.get('username') or '').strip()
+        if not username:
+            return None, "缺少字段：username"
+        if username in usernames:
+            return None, f"用户名重复：{username}"
+        password = (row.get('password') or '').strip() or default_password
+        if not password:
+            return None, "缺少字段：password"
+        role = (row.get('role') or '').strip() or '员工'
+        if role not in ROLES:
+            return None, f"角色无效：{role}"
+        data.update(username=username, password=password, role=role)
+    return data, None
+
+
+def import_employees(engine, allocator, stream, create_accounts=False, chunk_size=1000, dry_run=False,
+                     default_password=None, hasher=None, hash_workers=1):
+    # 流式读取 CSV：逐行校验，合法行攒满 chunk_size 后用 executemany 在一个事务中写入，
+    # 出错行跳过并记录行号；某一批写入失败时整批回滚、记录该批的行号范围，后续批次照常导入，
+    # 返回的结果反映已提交的部分；dry_run 时只校验不写入
+    result = ImportResult()
+    reader = csv.DictReader(stream)
+    missing = [col for col in REQUIRED_COLUMNS if col not in (reader.fieldnames or [])]
+    if missing:
+        result.errors.append((1, f"表头缺少列：{', '.join(missing)}"))
+        return result
+
+    with engine.connect() as conn:
+        positions = {
+            row.pos_id: (row.min_salary, row.max_salary)
+            for row in conn.execute(text("SELECT pos_id, min_salary, max_salary FROM Position"))
+        }
+        usernames = set()
+        if create_accounts:
+            usernames = {row[0] for row in conn.execute(text("SELECT username FROM SystemUser"))}
+
+    # 密码经应用共享的有界哈希线程池（hashing.PasswordHasher）计算，导入同时占用的名额
+    # 不超过 hash_workers，且至少给登录留出一个计算线程
+    executor = None
+    if create_accounts and not dry_run:
+        executor = ThreadPoolExecutor(max_workers=max(1, min(hash_workers, hasher.max_workers - 1)),
+                                      thread_name_prefix='import-hash')
+
+    def hash_password(password):
+        while True:
+            try:
+                return hasher.hash(password)
+            except HasherBusy:
+                time.sleep(HASH_RETRY_SECONDS)
+
+    def flush(chunk, lines):
+        if dry_run or not chunk:
+            return
+        try:
+            write_chunk(chunk)
+        except SQLAlchemyError as e:
+            result.failed += len(chunk)
+            result.errors.append((f"{lines[0]}-{lines[-1]}", f"整批写入失败，未导入：{str(e).splitlines()[0]}"))
+
+    def write_chunk(chunk):
+        # 每批一次性从分配器取号
+        for data, number in zip(chunk, allocator.allocate('EMP', len(chunk))):
+            data['emp_id'] = format_emp_id(number)
+        users = []
+        if create_accounts:
+            hashes = executor.map(hash_password, [data['password'] for data in chunk])
+            user_numbers = allocator.allocate('USER', len(chunk))
+            users = [
+                {'user_id': format_user_id(number), 'username': data['username'], 'password_hash': password_hash,
+                 'role': data['role'], 'emp_id': data['emp_id']}
+                for data, password_hash, number in zip(chunk, hashes, user_numbers)
+            ]
+        with engine.begin() as conn:
+            conn.execute(text(INSERT_EMPLOYEE), chunk)
+            if users:
+                conn.execute(text(INSERT_USER), users)
+        result.imported += len(chunk)
+        result.accounts += len(users)
+
+    chunk, lines = [], []
+    line_no = 1
+    try:
+        try:
+            for line_no, row in enumerate(reader, start=2):
+                result.rows += 1
+                data, error = validate_row(row, positions, usernames, create_accounts, default_password)
+                if error:
+                    result.errors.append((line_no, error))
+                    continue
+                if create_accounts:
+                    usernames.add(data['username'])
+                chunk.append(data)
+                lines.append(line_no)
+                if len(chunk) >= chunk_size:
+                    flush(chunk, lines)
+                    chunk, lines = [], []
+        except UnicodeDecodeError as e:
+            # 编码错误之后的内容无法继续解析：已读出的行照常写入，其余内容放弃
+            result.errors.append((line_no + 1, f"文件编码错误，之后的内容未导入：{e.reason}"))
+        flush(chunk, lines)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return result
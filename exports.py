@@ -0,0 +1,155 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+
+from sqlalchemy import text
+
+# openpyxl 为可选依赖，未安装时只提供 CSV 导出
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+# 每次从服务端游标取回的行数
+FETCH_SIZE = 1000
+
+# 导出数据集：SQL 均按索引顺序输出，服务端游标无需等待排序即可开始返回数据
+DATASETS = {
+    'employees': {
+        'filename': 'employees',
+        'header': ['工号', '姓名', '性别', '学历', '电话', '邮箱', '部门', '岗位', '薪资'],
+        'sql': """
+            SELECT e.emp_id, e.name, e.gender, e.education, e.phone, e.email,
+                   d.dept_name, p.pos_name, e.salary
+            FROM Employee e
+            JOIN Position p ON e.pos_id = p.pos_id
+            JOIN Department d ON p.dept_id = d.dept_id
+            ORDER BY e.emp_id
+        """,
+    },
+    'attendance': {
+        'filename': 'attendance',
+        'header': ['日期', '工号', '姓名'],
+        'sql': """
+            SELECT a.date, a.emp_id, e.name
+            FROM Attendance a
+            JOIN Employee e ON a.emp_id = e.emp_id
+            WHERE a.date >= :start AND a.date < :end
+            ORDER BY a.date, a.emp_id
+        """,
+        # 位图存储模式：从兼容视图逐天展开；季度边界都是月初，按月份走索引筛选，展开后需要排序
+        'bitmap_sql': """
+            SELECT a.date, a.emp_id, e.name
+            FROM AttendanceDays a
+            JOIN Employee e ON a.emp_id = e.emp_id
+            WHERE a.month >= :start AND a.month < :end
+            ORDER BY a.date, a.emp_id
+        """,
+    },
+    'leaves': {
+        'filename': 'leave_requests',
+        'header': ['编号', '工号', '姓名', '类型', '开始日期', '结束日期', '申请时间', '事由', '状态', '审批人', '审批时间'],
+        'sql': """
+            SELECT l.leave_id, l.emp_id, e.name, l.leave_type, l.start_date, l.end_date,
+                   l.request_time, l.reason, l.status, r.name, l.review_time
+            FROM LeaveRequest l
+            JOIN Employee e ON l.emp_id = e.emp_id
+            LEFT JOIN Employee r ON l.reviewer_id = r.emp_id
+            ORDER BY l.leave_id
+        """,
+        # 请假归档过（有水位）时连同归档表导出：归档记录的申请人、审批人可能已离职，从离职档案取姓名；
+        # 两张表合并后需要排序
+        'history_sql': """
+            SELECT l.leave_id, l.emp_id, COALESCE(e.name, ea.name), l.leave_type, l.start_date, l.end_date,
+                   l.request_time, l.reason, l.status, COALESCE(r.name, ra.name), l.review_time
+            FROM (
+                SELECT leave_id, emp_id, leave_type, start_date, end_date, request_time, reason, status,
+                       reviewer_id, review_time
+                FROM LeaveRequest
+                UNION ALL
+                SELECT leave_id, emp_id, leave_type, start_date, end_date, request_time, reason, status,
+                       reviewer_id, review_time
+                FROM LeaveRequestArchive
+            ) l
+            LEFT JOIN Employee e ON l.emp_id = e.emp_id
+            LEFT JOIN EmployeeArchive ea ON l.emp_id = ea.emp_id
+            LEFT JOIN Employee r ON l.reviewer_id = r.emp_id
+            LEFT JOIN EmployeeArchive ra ON l.reviewer_id = ra.emp_id
+            ORDER BY l.leave_id
+        """,
+    },
+}
+
+# 数据集对应的归档表：有归档水位时改用 history_sql
+HISTORY_TABLES = {'leaves': 'LeaveRequest'}
+
+
+def quarter_range(value=None):
+    # '2025Q2' / '2025-Q2' -> (起始日, 下一季度起始日)；缺省或格式不对时取当前季度
+    today = date.today()
+    year, quarter = today.year, (today.month - 1) // 3 + 1
+    if value:
+        try:
+            y, q = value.upper().replace('-', '').split('Q')
+            if 1 <= int(q) <= 4:
+                year, quarter = int(y), int(q)
+        except ValueError:
+            pass
+    start = date(year, 3 * quarter - 2, 1)
+    end = date(year + 1, 1, 1) if quarter == 4 else date(year, 3 * quarter + 1, 1)
+    return start, end
+
+
+def _stream_rows(engine, sql, params):
+    # stream_results 让 PyMySQL 使用无缓冲的 SSCursor，内存占用与结果集大小无关
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=FETCH_SIZE).execute(text(sql), params)
+        for partition in result.partitions():
+            yield partition
+
+
+def dataset_sql(spec, bitmap=False, history=False):
+    if history and 'history_sql' in spec:
+        return spec['history_sql']
+    return spec['bitmap_sql'] if bitmap and 'bitmap_sql' in spec else spec['sql']
+
+
+def stream_csv(engine, dataset, params, bitmap=False, history=False):
+    spec = DATASETS[dataset]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    # 先输出表头（带 BOM 便于 Excel 识别 UTF-8），查询开始前首字节即可发出
+    writer.writerow(spec['header'])
+    yield '\ufeff' + buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    for rows in _stream_rows(engine, dataset_sql(spec, bitmap, history), params):
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+def stream_xlsx(engine, dataset, params, chunk_size=64 * 1024, bitmap=False, history=False):
+    # xlsx 是 zip 容器，必须整体写完才能输出；用 write_only 模式逐行写入临时文件，内存仍然恒定
+    spec = DATASETS[dataset]
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(spec['filename'])
+    sheet.append(spec['header'])
+    for rows in _stream_rows(engine, dataset_sql(spec, bitmap, history), params):
+        for row in rows:
+            sheet.append(list(row))
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
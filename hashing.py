@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """哈希线程池排队已满或等待超时"""
+
+
+# bcrypt 校验 / 生成放到专用的有界线程池中执行：
+# 同时计算的数量不超过 max_workers，排队数量不超过 max_queue，超出时直接拒绝，
+# 避免登录高峰把所有 Web 工作线程都占满在 CPU 计算上
+class PasswordHasher:
+    def __init__(self, rounds=12, max_workers=2, max_queue=32, timeout=30):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'rehashed': 0,
+            'running': 0,
+            'queued': 0,
+            'max_queued': 0,
+            'total_seconds': 0.0,
+        }
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_ROUNDS', self.rounds)
+        self.timeout = app.config.get('BCRYPT_TIMEOUT', self.timeout)
+        max_workers = app.config.get('BCRYPT_MAX_WORKERS', self.max_workers)
+        max_queue = app.config.get('BCRYPT_MAX_QUEUE', self.max_queue)
+        if (max_workers, max_queue) != (self.max_workers, self.max_queue):
+            self._executor.shutdown(wait=False)
+            self.max_workers = max_workers
+            self.max_queue = max_queue
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+            self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HasherBusy('密码校验排队已满')
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['queued'] += 1
+            self._stats['max_queued'] = max(self._stats['max_queued'], self._stats['queued'])
+        try:
+            future = self._executor.submit(self._run, fn, *args)
+        except BaseException:
+            with self._lock:
+                self._stats['queued'] -= 1
+            self._slots.release()
+            raise
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # 超时按繁忙处理；仍在排队的任务直接取消并归还名额，已在计算的任务算完后由 _run 归还
+            with self._lock:
+                self._stats['timeouts'] += 1
+            if future.cancel():
+                with self._lock:
+                    self._stats['queued'] -= 1
+                self._slots.release()
+            raise HasherBusy('密码校验等待超时')
+
+    def _run(self, fn, *args):
+        with self._lock:
+            self._stats['queued'] -= 1
+            self._stats['running'] += 1
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._stats['running'] -= 1
+                self._stats['completed'] += 1
+                self._stats['total_seconds'] += time.perf_counter() - start
+            self._slots.release()
+
+    def check(self, password, hashed):
+        if not hashed:
+            return False
+        return self._submit(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._submit(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def needs_rehash(self, hashed):
+        # bcrypt 哈希格式：$2b$<cost>$<salt+hash>
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return False
+
+    def record_rehash(self):
+        with self._lock:
+            self._stats['rehashed'] += 1
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['rounds'] = self.rounds
+        stats['max_workers'] = self.max_workers
+        stats['max_queue'] = self.max_queue
+        return stats
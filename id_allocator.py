@@ -0,0 +1,120 @@
+import threading
+
+from sqlalchemy import text
+
+# 序列行由建库脚本（database lab.sql）、新增部门与生成数据时预置；缺失时（早于预置的旧库）才用已有数据中的
+# 最大编号补建（按数值比较，避免 EMP999 > EMP1000 的字符串排序问题）。
+# 员工编号同时计入离职档案：离职员工的编号不能再发放，否则离职归档时主键冲突
+SEED_SQL = {
+    'EMP': ("""
+        SELECT MAX(n) FROM (
+            SELECT CAST(SUBSTRING(emp_id, 4) AS UNSIGNED) AS n FROM Employee WHERE emp_id LIKE 'EMP%'
+            UNION ALL
+            SELECT CAST(SUBSTRING(emp_id, 4) AS UNSIGNED) AS n FROM EmployeeArchive WHERE emp_id LIKE 'EMP%'
+        ) ids
+    """, {}),
+    'USER': ("SELECT MAX(CAST(SUBSTRING(user_id, 2) AS UNSIGNED)) FROM SystemUser WHERE user_id LIKE 'U%'", {}),
+}
+POS_SEED_SQL = "SELECT MAX(CAST(SUBSTRING(pos_id, :offset) AS UNSIGNED)) FROM Position WHERE dept_id = :dept_id"
+
+# Position.pos_id 为 VARCHAR(10)，岗位编号 = 部门编码 + 至少 3 位序号
+POS_ID_LENGTH = 10
+DEPT_ID_MAX_LENGTH = POS_ID_LENGTH - 3
+
+
+def pos_sequence(dept_id):
+    return f"POS:{dept_id}"
+
+
+def format_emp_id(n):
+    return f"EMP{n:03d}"
+
+
+def format_user_id(n):
+    return f"U{n:03d}"
+
+
+def format_pos_id(dept_id, n):
+    pos_id = f"{dept_id}{n:03d}"
+    if len(pos_id) > POS_ID_LENGTH:
+        raise ValueError(f"岗位编号 {pos_id} 超过 {POS_ID_LENGTH} 位（部门编码过长或岗位序号过大）")
+    return pos_id
+
+
+def create_sequence(conn, name, next_value=1):
+    # 在调用方事务中预置序列行（新增部门、生成数据时），已存在则保持不变
+    conn.execute(text("INSERT IGNORE INTO IdSequence (seq_name, next_value) VALUES (:name, :value)"),
+                 {"name": name, "value": next_value})
+
+
+# hi/lo 编号分配器：每个进程一次从 IdSequence 表预留一段编号（hi），
+# 之后在内存中逐个发放（lo）；只有号段用完时才访问数据库，
+# 且预留在独立的短事务中完成，不会与业务事务互相阻塞
+class IdAllocator:
+    def __init__(self, block_sizes=None, default_block=20):
+        self.block_sizes = block_sizes or {}
+        self.default_block = default_block
+        self._engine = None
+        self._lock = threading.Lock()
+        self._blocks = {}  # 序列名 -> [下一个可用编号, 号段上界(不含)]
+        self._stats = {'allocated': 0, 'reservations': 0}
+
+    def init_app(self, app, engine):
+        self._engine = engine
+        self.block_sizes = app.config.get('ID_BLOCK_SIZES', self.block_sizes)
+
+    def _block_size(self, name):
+        return self.block_sizes.get(name.split(':')[0], self.default_block)
+
+    def _seed(self, conn, name):
+        if name.startswith('POS:'):
+            dept_id = name[4:]
+            sql, params = POS_SEED_SQL, {"offset": len(dept_id) + 1, "dept_id": dept_id}
+        else:
+            sql, params = SEED_SQL[name]
+        current = conn.execute(text(sql), params).scalar() or 0
+        create_sequence(conn, name, int(current) + 1)
+
+    def _reserve(self, name, count):
+        # 行锁只在这个短事务内持有
+        while True:
+            with self._engine.begin() as conn:
+                row = conn.execute(text("SELECT next_value FROM IdSequence WHERE seq_name = :name FOR UPDATE"),
+                                   {"name": name}).fetchone()
+                if row is not None:
+                    start = row[0]
+                    conn.execute(text("UPDATE IdSequence SET next_value = :value WHERE seq_name = :name"),
+                                 {"value": start + count, "name": name})
+                    break
+            # 序列行缺失：先结束持有间隙锁的事务，再在独立短事务中不加锁地补建，
+            # 避免多个进程首次使用时各自持有间隙锁再插入而互相死锁
+            with self._engine.begin() as conn:
+                self._seed(conn, name)
+        self._stats['reservations'] += 1
+        return start, start + count
+
+    def allocate(self, name, count=1):
+        # 返回 count 个唯一编号（整数，不保证连续）
+        with self._lock:
+            block = self._blocks.setdefault(name, [0, 0])
+            numbers = list(range(block[0], min(block[0] + count, block[1])))
+            block[0] += len(numbers)
+            if len(numbers) < count:
+                need = count - len(numbers)
+                start, end = self._reserve(name, max(need, self._block_size(name)))
+                numbers.extend(range(start, start + need))
+                self._blocks[name] = [start + need, end]
+            self._stats['allocated'] += count
+        return numbers
+
+    def next_emp_id(self):
+        return format_emp_id(self.allocate('EMP')[0])
+
+    def next_pos_id(self, dept_id):
+        return format_pos_id(dept_id, self.allocate(pos_sequence(dept_id))[0])
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached'] = {name: end - start for name, (start, end) in self._blocks.items()}
+        return stats
@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+# 请假区间按半开区间 [start_date, end_date) 处理：end_date 为返岗日（表上 CHECK end_date > start_date）
+ACTIVE_STATUSES = ('待审批', '已批准')
+MAX_DAYS = 92
+
+
+def merge_intervals(intervals):
+    # 同一员工重叠 / 相接的请假合并成一段，避免同一人在同一天被重复计数
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def daily_headcount(intervals_by_emp, start, end):
+    # 扫描线：每段区间在起点 +1、终点 -1，事件按日期排序后顺序累加，得到 [start, end) 内每天的请假人数。
+    # 复杂度 O(n log n + 天数)，与每天逐条判断重叠的 O(n × 天数) 相比不随区间长度放大
+    events = {}
+    for intervals in intervals_by_emp.values():
+        for lo, hi in merge_intervals(intervals):
+            lo, hi = max(lo, start), min(hi, end)
+            if lo >= hi:
+                continue
+            events[lo] = events.get(lo, 0) + 1
+            events[hi] = events.get(hi, 0) - 1
+
+    counts = []
+    current = 0
+    pending = sorted(events.items())
+    i = 0
+    day = start
+    while day < end:
+        while i < len(pending) and pending[i][0] <= day:
+            current += pending[i][1]
+            i += 1
+        counts.append((day, current))
+        day += timedelta(days=1)
+    return counts
+
+
+def build_calendar(leaves, start, end):
+    # leaves: 与 [start, end) 重叠的请假行（含 emp_id、start_date、end_date、status）
+    # 返回每天的 (日期, 已批准人数, 含待审批的总人数)
+    approved, active = {}, {}
+    for leave in leaves:
+        interval = (leave.start_date, leave.end_date)
+        active.setdefault(leave.emp_id, []).append(interval)
+        if leave.status == '已批准':
+            approved.setdefault(leave.emp_id, []).append(interval)
+    return [
+        (day, approved_count, total)
+        for (day, approved_count), (_, total) in zip(daily_headcount(approved, start, end),
+                                                     daily_headcount(active, start, end))
+    ]
+
+
+def parse_range(start_arg, end_arg, today=None):
+    # 缺省为本月；区间最长 MAX_DAYS 天
+    today = today or date.today()
+    try:
+        start = date.fromisoformat(start_arg) if start_arg else today.replace(day=1)
+    except ValueError:
+        start = today.replace(day=1)
+    try:
+        end = date.fromisoformat(end_arg) if end_arg else None
+    except ValueError:
+        end = None
+    if end is None or end <= start:
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start, min(end, start + timedelta(days=MAX_DAYS))
@@ -0,0 +1,229 @@
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+import archive
+
+# numpy 为可选依赖，未安装时不提供薪资分析
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 薪资分布直方图的分桶数
+HISTOGRAM_BINS = 10
+
+# 快照依赖的表：任一表的 CacheVersion 变化后重新加载
+SNAPSHOT_TABLES = ('Employee', 'PositionChange', 'Position', 'Department')
+
+
+def load_payroll_snapshot(conn):
+    # 一次性读出分析所需的全部数据，按列存成 numpy 数组；后续统计全部是向量化运算。
+    # 调薪历史不限起点：岗位变动归档过（有水位）即同时读归档表
+    employees = conn.execute(text("""
+        SELECT e.salary, e.pos_id, p.dept_id
+        FROM Employee e
+        JOIN Position p ON e.pos_id = p.pos_id
+    """)).fetchall()
+    positions = conn.execute(text("""
+        SELECT p.pos_id, p.pos_name, p.dept_id, p.min_salary, p.max_salary
+        FROM Position p
+    """)).fetchall()
+    departments = conn.execute(text("""
+        SELECT dept_id, dept_name FROM Department
+    """)).fetchall()
+    changes = conn.execute(text("""
+        SELECT pc.change_date, pc.old_salary, pc.new_salary, p.dept_id
+        FROM PositionChange pc
+        JOIN Position p ON pc.new_pos_id = p.pos_id
+        UNION ALL
+        SELECT pc.change_date, pc.old_salary, pc.new_salary, p.dept_id
+        FROM PositionChangeArchive pc
+        JOIN Position p ON pc.new_pos_id = p.pos_id
+        WHERE :history = 1
+    """), {"history": int(archive.reaches_archive(conn, 'PositionChange', None))}).fetchall()
+
+    def columns(rows, count):
+        return list(zip(*rows)) if rows else [()] * count
+
+    # 岗位、部门按编号排序，之后用二分查找把员工映射到组下标
+    positions = sorted(positions, key=lambda row: row.pos_id)
+    departments = sorted(departments, key=lambda row: row.dept_id)
+    salaries, emp_pos, emp_dept = columns(employees, 3)
+    pos_ids, pos_names, pos_depts, min_salaries, max_salaries = columns(positions, 5)
+    dept_ids, dept_names = columns(departments, 2)
+    change_dates, old_salaries, new_salaries, change_depts = columns(changes, 4)
+    return {
+        'salary': np.array(salaries, dtype=np.float64),
+        'emp_pos': np.array(emp_pos, dtype=str),
+        'emp_dept': np.array(emp_dept, dtype=str),
+        'pos_id': np.array(pos_ids, dtype=str),
+        'pos_name': list(pos_names),
+        'pos_dept': list(pos_depts),
+        'min_salary': np.array(min_salaries, dtype=np.float64),
+        'max_salary': np.array(max_salaries, dtype=np.float64),
+        'dept_id': np.array(dept_ids, dtype=str),
+        'dept_name': list(dept_names),
+        'change_month': np.array(change_dates, dtype='datetime64[M]'),
+        'old_salary': np.array(old_salaries, dtype=np.float64),
+        'new_salary': np.array(new_salaries, dtype=np.float64),
+        'change_dept': np.array(change_depts, dtype=str),
+    }
+
+
+def group_index(keys, values):
+    # values 中每个元素在 keys（已排序）中的下标
+    return np.searchsorted(keys, values)
+
+
+def group_stats(index, salary, groups):
+    # 按组下标一次性汇总人数、总额、均值、最低、最高
+    count = np.bincount(index, minlength=groups)
+    total = np.bincount(index, weights=salary, minlength=groups)
+    low = np.full(groups, np.inf)
+    high = np.full(groups, -np.inf)
+    np.minimum.at(low, index, salary)
+    np.maximum.at(high, index, salary)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / np.maximum(count, 1), 0.0)
+    low[count == 0] = 0
+    high[count == 0] = 0
+    return count, total, mean, low, high
+
+
+def histogram(salary, index, groups):
+    # 全体共用一组分桶边界，同时统计每组的分布
+    if salary.size == 0:
+        return [], np.zeros((groups, HISTOGRAM_BINS), dtype=np.int64)
+    edges = np.histogram_bin_edges(salary, bins=HISTOGRAM_BINS)
+    bucket = np.clip(np.searchsorted(edges, salary, side='right') - 1, 0, HISTOGRAM_BINS - 1)
+    counts = np.bincount(index * HISTOGRAM_BINS + bucket, minlength=groups * HISTOGRAM_BINS)
+    return edges.tolist(), counts.reshape(groups, HISTOGRAM_BINS)
+
+
+def build_report(snap):
+    salary = snap['salary']
+    dept_ids, pos_ids = snap['dept_id'], snap['pos_id']
+    dept_index = group_index(dept_ids, snap['emp_dept'])
+    pos_index = group_index(pos_ids, snap['emp_pos'])
+
+    # 部门汇总与各部门的薪资分布
+    count, total, mean, low, high = group_stats(dept_index, salary, len(dept_ids))
+    edges, dept_hist = histogram(salary, dept_index, len(dept_ids))
+    departments = [
+        {'dept_id': str(dept_ids[i]), 'dept_name': snap['dept_name'][i], 'headcount': int(count[i]),
+         'total': round(float(total[i]), 2), 'average': round(float(mean[i]), 2),
+         'min': float(low[i]), 'max': float(high[i]), 'histogram': dept_hist[i].tolist()}
+        for i in range(len(dept_ids))
+    ]
+
+    # 岗位汇总与薪资带内位置：(薪资 - 下限) / (上限 - 下限)，0 为下限，1 为上限
+    count, total, mean, low, high = group_stats(pos_index, salary, len(pos_ids))
+    band_min, band_max = snap['min_salary'], snap['max_salary']
+    width = (band_max - band_min)[pos_index]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        band = np.where(width > 0, (salary - band_min[pos_index]) / np.where(width > 0, width, 1), 1.0)
+    band_total = np.bincount(pos_index, weights=band, minlength=len(pos_ids))
+    below = np.bincount(pos_index, weights=salary < band_min[pos_index], minlength=len(pos_ids))
+    above = np.bincount(pos_index, weights=salary > band_max[pos_index], minlength=len(pos_ids))
+    dept_name = dict(zip(dept_ids.tolist(), snap['dept_name']))
+    positions = [
+        {'pos_id': str(pos_ids[i]), 'pos_name': snap['pos_name'][i], 'dept_id': snap['pos_dept'][i],
+         'dept_name': dept_name.get(snap['pos_dept'][i]), 'headcount': int(count[i]),
+         'total': round(float(total[i]), 2), 'average': round(float(mean[i]), 2),
+         'min': float(low[i]), 'max': float(high[i]),
+         'band_min': float(band_min[i]), 'band_max': float(band_max[i]),
+         'band_position': round(float(band_total[i] / count[i]), 4) if count[i] else None,
+         'below_band': int(below[i]), 'above_band': int(above[i])}
+        for i in range(len(pos_ids))
+    ]
+
+    # 调薪历史：按月份汇总变动次数、涨薪人次、涨薪总额与平均涨幅；按部门汇总涨薪总额
+    old, new = snap['old_salary'], snap['new_salary']
+    delta = new - old
+    raised = delta > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pct = np.where(old > 0, delta / np.where(old > 0, old, 1), 0.0)
+    months, month_index = np.unique(snap['change_month'], return_inverse=True)
+    months = np.datetime_as_string(months, unit='M')
+    month_changes = np.bincount(month_index, minlength=len(months))
+    month_raises = np.bincount(month_index, weights=raised, minlength=len(months))
+    month_amount = np.bincount(month_index, weights=np.where(raised, delta, 0), minlength=len(months))
+    month_pct = np.bincount(month_index, weights=np.where(raised, pct, 0), minlength=len(months))
+    raises = [
+        {'month': str(months[i]), 'changes': int(month_changes[i]), 'raises': int(month_raises[i]),
+         'raise_total': round(float(month_amount[i]), 2),
+         'average_raise_pct': round(float(month_pct[i] / month_raises[i]) * 100, 2) if month_raises[i] else 0.0}
+        for i in range(len(months))
+    ]
+    change_index = group_index(dept_ids, snap['change_dept'])
+    dept_amount = np.bincount(change_index, weights=np.where(raised, delta, 0), minlength=len(dept_ids))
+    dept_raises = np.bincount(change_index, weights=raised, minlength=len(dept_ids))
+    for i, item in enumerate(departments):
+        item['raises'] = int(dept_raises[i])
+        item['raise_total'] = round(float(dept_amount[i]), 2)
+
+    return {
+        'summary': {
+            'headcount': int(salary.size),
+            'total': round(float(salary.sum()), 2),
+            'average': round(float(salary.mean()), 2) if salary.size else 0.0,
+            'median': round(float(np.median(salary)), 2) if salary.size else 0.0,
+            'min': float(salary.min()) if salary.size else 0.0,
+            'max': float(salary.max()) if salary.size else 0.0,
+            'histogram': dept_hist.sum(axis=0).tolist(),
+        },
+        'histogram_edges': [round(edge, 2) for edge in edges],
+        'departments': departments,
+        'positions': positions,
+        'raises': raises,
+    }
+
+
+# 薪资分析报表缓存：以相关表的 CacheVersion 版本向量为键，员工或岗位变动发生写入后
+# 下次访问重新加载快照并重算；未变化时直接返回上次的结果
+class PayrollAnalytics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._versions = None
+        self._report = None
+        self._stats = {'hits': 0, 'builds': 0, 'last_build_seconds': 0.0}
+
+    def versions(self, conn):
+        rows = conn.execute(
+            text("SELECT cache_name, version FROM CacheVersion WHERE cache_name IN :names")
+            .bindparams(bindparam('names', expanding=True)),
+            {"names": list(SNAPSHOT_TABLES)}
+        ).fetchall()
+        found = dict(rows)
+        return tuple(found.get(table, 0) for table in SNAPSHOT_TABLES)
+
+    def report(self, conn):
+        versions = self.versions(conn)
+        with self._lock:
+            if self._versions == versions:
+                self._stats['hits'] += 1
+                return self._report
+        # 同一时刻只重算一次，其余请求等待后直接复用
+        with self._build_lock:
+            with self._lock:
+                if self._versions == versions:
+                    self._stats['hits'] += 1
+                    return self._report
+            start = time.perf_counter()
+            report = build_report(load_payroll_snapshot(conn))
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._versions = versions
+                self._report = report
+                self._stats['builds'] += 1
+                self._stats['last_build_seconds'] = round(elapsed, 4)
+        return report
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached'] = self._report is not None
+        return stats
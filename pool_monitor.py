@@ -0,0 +1,83 @@
+import logging
+import threading
+import traceback
+
+from flask import g, has_request_context
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+# 连接池监控：统计借出 / 归还次数、等待时间，并在请求结束时检查
+# 本请求借出但仍未归还的连接（泄漏）；调试模式下记录借出时的调用栈
+class PoolMonitor:
+    def __init__(self):
+        self.debug = False
+        self._engine = None
+        self._lock = threading.Lock()
+        self._owners = {}  # id(connection_record) -> (请求标记, 借出调用栈)
+        self._stats = {
+            'checkouts': 0,
+            'checkins': 0,
+            'checked_out': 0,
+            'max_checked_out': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'leaks': 0,
+        }
+
+    def init_app(self, app, engine):
+        self.debug = app.config.get('DB_LEAK_DEBUG', False)
+        self._engine = engine
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+
+    def _on_checkout(self, dbapi_conn, record, proxy):
+        token = g.setdefault('db_request_token', object()) if has_request_context() else None
+        stack = ''.join(traceback.format_stack(limit=12)) if self.debug else None
+        with self._lock:
+            self._owners[id(record)] = (token, stack)
+            self._stats['checkouts'] += 1
+            self._stats['checked_out'] += 1
+            self._stats['max_checked_out'] = max(self._stats['max_checked_out'], self._stats['checked_out'])
+
+    def _on_checkin(self, dbapi_conn, record):
+        with self._lock:
+            if self._owners.pop(id(record), None) is not None:
+                self._stats['checkins'] += 1
+                self._stats['checked_out'] -= 1
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self._stats['wait_seconds'] += seconds
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], seconds)
+
+    def check_request_leaks(self, endpoint=None):
+        token = g.get('db_request_token')
+        if token is None:
+            return 0
+        with self._lock:
+            leaked = [key for key, (owner, _) in self._owners.items() if owner is token]
+            stacks = []
+            for key in leaked:
+                # 已报告的连接不再归属任何请求，避免重复计数
+                _, stack = self._owners[key]
+                self._owners[key] = (None, stack)
+                stacks.append(stack)
+            self._stats['leaks'] += len(leaked)
+        for stack in stacks:
+            if stack:
+                logger.warning("请求 %s 结束时仍有连接未归还，借出位置：\n%s", endpoint, stack)
+            else:
+                logger.warning("请求 %s 结束时仍有连接未归还（开启 DB_LEAK_DEBUG 可查看借出位置）", endpoint)
+        return len(leaked)
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        pool = self._engine.pool if self._engine is not None else None
+        if pool is not None and hasattr(pool, 'size'):
+            stats['pool_size'] = pool.size()
+            stats['pool_overflow'] = pool.overflow()
+            stats['pool_checked_in'] = pool.checkedin()
+        return stats
@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, text
+
+import archive
+from attendance_summary import next_month, range_mask, workday_mask
+
+# 考勤与请假对账：找出既没有打卡、也没有已批准请假的工作日（未说明缺勤）。
+# 日期运算全部在 31 位月度位图上进行：出勤位图来自 AttendanceMonthly.day_mask，
+# 请假按区间转成位图后按位或，缺勤 = 工作日 & ~出勤 & ~请假，每名员工只需几次整数运算。
+# 各部门互不依赖，交给进程池并行计算并各自写入结果
+
+EMPLOYEES_SQL = """
+    SELECT e.emp_id, COALESCE(m.day_mask, 0) AS day_mask
+    FROM Position p
+    JOIN Employee e ON e.pos_id = p.pos_id
+    LEFT JOIN AttendanceMonthly m ON m.emp_id = e.emp_id AND m.month = :month
+    WHERE p.dept_id = :did
+"""
+# 对账月份早于请假归档水位时（:history = 1）同时读取归档表中的请假
+LEAVES_SQL = """
+    SELECT l.emp_id, l.start_date, l.end_date
+    FROM Position p
+    JOIN Employee e ON e.pos_id = p.pos_id
+    JOIN LeaveRequest l ON l.emp_id = e.emp_id
+    WHERE p.dept_id = :did AND l.start_date < :end AND l.end_date > :month
+      AND l.status = '已批准'
+    UNION ALL
+    SELECT l.emp_id, l.start_date, l.end_date
+    FROM Position p
+    JOIN Employee e ON e.pos_id = p.pos_id
+    JOIN LeaveRequestArchive l ON l.emp_id = e.emp_id
+    WHERE :history = 1 AND p.dept_id = :did AND l.start_date < :end AND l.end_date > :month
+      AND l.status = '已批准'
+"""
+INSERT_SQL = """
+    INSERT INTO AttendanceReconciliation
+        (emp_id, month, dept_id, workdays, present_days, leave_days, absent_days, absent_mask, checked_at)
+    VALUES (:emp_id, :month, :dept_id, :workdays, :present_days, :leave_days, :absent_days, :absent_mask,
+            :checked_at)
+"""
+
+_engine = None
+
+
+def bit_count(mask):
+    return bin(mask).count('1')
+
+
+def month_workdays(month, today):
+    # 需要核对的工作日：当月尚未结束时只核对到昨天
+    mask = workday_mask(month)
+    if next_month(month) > today:
+        mask &= range_mask(month, month, today)
+    return mask
+
+
+def _init_worker(uri, options):
+    # 每个工作进程使用自己的引擎，连接不跨进程共享
+    global _engine
+    _engine = create_engine(uri, **options)
+
+
+def reconcile_department(dept_id, month, today, history=False):
+    workdays = month_workdays(month, today)
+    with _engine.begin() as conn:
+        employees = conn.execute(text(EMPLOYEES_SQL), {"did": dept_id, "month": month}).fetchall()
+        leave_masks = {}
+        result = conn.execution_options(yield_per=1000).execute(
+            text(LEAVES_SQL), {"did": dept_id, "month": month, "end": next_month(month), "history": int(history)})
+        for emp_id, start, end in result:
+            leave_masks[emp_id] = leave_masks.get(emp_id, 0) | range_mask(month, start, end)
+
+        checked_at = datetime.now().replace(microsecond=0)
+        rows = []
+        for emp_id, present in employees:
+            present &= workdays
+            on_leave = leave_masks.get(emp_id, 0) & workdays & ~present
+            absent = workdays & ~present & ~on_leave
+            rows.append({
+                'emp_id': emp_id, 'month': month, 'dept_id': dept_id, 'workdays': bit_count(workdays),
+                'present_days': bit_count(present), 'leave_days': bit_count(on_leave),
+                'absent_days': bit_count(absent), 'absent_mask': absent, 'checked_at': checked_at,
+            })
+        if rows:
+            conn.execute(text(INSERT_SQL), rows)
+    return dept_id, len(rows), sum(row['absent_days'] for row in rows)
+
+
+def reconcile_month(engine, month, workers=None, engine_options=None, log=print):
+    # 先清除该月旧结果，再按部门并行重算；workers=1 时在当前进程内顺序执行。
+    # engine_options 为工作进程建引擎的参数（与应用一致），每个进程只需一个连接
+    global _engine
+    with engine.begin() as conn:
+        dept_ids = [row[0] for row in conn.execute(text("SELECT dept_id FROM Department ORDER BY dept_id"))]
+        conn.execute(text("DELETE FROM AttendanceReconciliation WHERE month = :month"), {"month": month})
+        history = archive.reaches_archive(conn, 'LeaveRequest', month)
+
+    today = date.today()
+    workers = min(workers or os.cpu_count() or 1, max(len(dept_ids), 1))
+    totals = {'departments': 0, 'employees': 0, 'absent_days': 0}
+
+    def record(dept_id, employees, absent_days):
+        totals['departments'] += 1
+        totals['employees'] += employees
+        totals['absent_days'] += absent_days
+        log(f"{dept_id}：{employees} 名员工，未说明缺勤 {absent_days} 天")
+
+    if workers == 1:
+        _engine = engine
+        for dept_id in dept_ids:
+            record(*reconcile_department(dept_id, month, today, history))
+        return totals
+
+    # 使用 spawn 启动工作进程，避免 fork 继承父进程的连接池与后台线程
+    uri = engine.url.render_as_string(hide_password=False)
+    options = dict(engine_options or {}, pool_size=1, max_overflow=0)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(uri, options)) as pool:
+        futures = [pool.submit(reconcile_department, dept_id, month, today, history) for dept_id in dept_ids]
+        for future in as_completed(futures):
+            record(*future.result())
+    return totals
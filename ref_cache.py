@@ -0,0 +1,95 @@
+import threading
+import time
+
+from sqlalchemy import bindparam, text
+
+
+# 岗位、部门等参考数据的进程内缓存。
+# 以 Department、Position 两张表在共享表 CacheVersion 中的变更计数为版本（由 cache_versions 在任何
+# 写事务提交后递增，包括其他进程、命令行导入与生成数据），各进程最多每 check_interval 秒读一次
+# 版本号（主键查询），发现变化即丢弃本地数据重新加载；本进程内的写操作提交后调用 invalidate()，下次读取立即生效
+class RefDataCache:
+    def __init__(self, tables=('Department', 'Position'), check_interval=1.0):
+        self.tables = tuple(tables)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaders = {}  # 数据集名 -> loader(conn)
+        self._data = {}  # 数据集名 -> 已加载的行
+        self._version = None  # 本地数据对应的共享版本号
+        self._checked_at = 0.0
+        self._generation = 0  # 本进程失效计数，用于丢弃加载期间过期的结果
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'version_checks': 0,
+            'invalidations': 0,
+            'remote_invalidations': 0,
+        }
+
+    def init_app(self, app, engine=None):
+        self.check_interval = app.config.get('REFDATA_CHECK_INTERVAL', self.check_interval)
+
+    def loader(self, dataset):
+        # 装饰器：注册数据集的加载函数
+        def decorator(func):
+            self._loaders[dataset] = func
+            return func
+        return decorator
+
+    def get(self, dataset, conn):
+        self._check_version(conn)
+        with self._lock:
+            rows = self._data.get(dataset)
+            if rows is not None:
+                self._stats['hits'] += 1
+                return rows
+            self._stats['misses'] += 1
+            generation = self._generation
+
+        rows = tuple(self._loaders[dataset](conn))
+
+        with self._lock:
+            if self._generation == generation:
+                self._data[dataset] = rows
+        return rows
+
+    def _check_version(self, conn):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            self._stats['version_checks'] += 1
+
+        found = dict(conn.execute(
+            text("SELECT cache_name, version FROM CacheVersion WHERE cache_name IN :names")
+            .bindparams(bindparam('names', expanding=True)),
+            {"names": list(self.tables)}
+        ).fetchall())
+        version = tuple(found.get(table, 0) for table in self.tables)
+
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self._stats['remote_invalidations'] += 1
+                self._data.clear()
+                self._generation += 1
+                self._version = version
+
+    def invalidate(self):
+        # 本进程写操作提交后调用：清空本地数据，并在下次读取时重新核对版本号
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+            self._version = None  # 自己提交的版本变化不计入 remote_invalidations
+            self._checked_at = 0.0
+            self._stats['invalidations'] += 1
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['version'] = self._version
+            stats['datasets'] = sorted(self._data)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
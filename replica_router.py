@@ -0,0 +1,77 @@
+import itertools
+import logging
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, session
+from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+
+# 读写分离：写入与普通请求一律走主库；标记为只读的报表类路由轮询读副本。
+# 用户提交写事务后在 session 中记下时间，此后 pin_seconds 秒内该用户的请求全部走主库，
+# 避免因复制延迟读不到自己刚写入的数据（read-your-writes）
+class ReplicaRouter:
+    def __init__(self, pin_seconds=5):
+        self.pin_seconds = pin_seconds
+        self.replicas = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = {'replica_reads': 0, 'pinned_reads': 0, 'fallbacks': 0}
+
+    def init_app(self, app, engine=None):
+        self.pin_seconds = app.config.get('READ_YOUR_WRITES_SECONDS', self.pin_seconds)
+        # 副本与主库使用相同的连接池参数
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        self.replicas = [create_engine(uri, **options) for uri in app.config.get('REPLICA_DATABASE_URIS', [])]
+
+    def read_only(self, view):
+        # 装饰只读视图：本请求的 get_conn() 优先返回副本连接
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            g.read_replica = True
+            return view(*args, **kwargs)
+        return wrapped
+
+    def mark_write(self):
+        if has_request_context():
+            session['last_write'] = time.time()
+
+    def pinned(self):
+        return time.time() - session.get('last_write', 0) < self.pin_seconds
+
+    def choose(self):
+        # 返回本请求应读取的副本引擎；没有副本或用户处于写后粘滞期时返回 None（走主库）
+        if not self.replicas:
+            return None
+        if self.pinned():
+            with self._lock:
+                self._stats['pinned_reads'] += 1
+            return None
+        return self.replicas[next(self._counter) % len(self.replicas)]
+
+    def connect(self):
+        engine = self.choose()
+        if engine is None:
+            return None
+        try:
+            conn = engine.connect()
+        except SQLAlchemyError as e:
+            # 副本不可用时退回主库，不让只读页面因此报错
+            with self._lock:
+                self._stats['fallbacks'] += 1
+            logger.warning("读副本 %s 连接失败，改读主库：%s", engine.url.render_as_string(), e)
+            return None
+        with self._lock:
+            self._stats['replica_reads'] += 1
+        return conn
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['replicas'] = len(self.replicas)
+        stats['pool_checked_out'] = sum(engine.pool.checkedout() for engine in self.replicas)
+        return stats
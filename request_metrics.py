@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# 直方图分桶：请求耗时（秒）、单个请求的 SQL 条数
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            yield f"{name}_bucket{format_labels(dict(labels, le=str(bound)))} {cumulative}"
+        yield f"{name}_bucket{format_labels(dict(labels, le='+Inf'))} {self.count}"
+        yield f"{name}_sum{format_labels(labels)} {self.sum}"
+        yield f"{name}_count{format_labels(labels)} {self.count}"
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+# 请求级观测：记录每个路由的耗时直方图、每个请求执行的 SQL 条数与耗时、慢查询样本；
+# 单个请求的 SQL 条数超过阈值时记录警告（N+1 报警）
+class RequestMetrics:
+    def __init__(self, slow_query_ms=200, query_warn=30, slow_samples=50):
+        self.slow_query = slow_query_ms / 1000
+        self.query_warn = query_warn
+        self._lock = threading.Lock()
+        self._latency = {}  # endpoint -> Histogram
+        self._queries = {}  # endpoint -> Histogram
+        self._requests = {}  # (endpoint, method, status) -> 次数
+        self._sql_seconds = {}  # endpoint -> SQL 累计耗时
+        self._alarms = {}  # endpoint -> N+1 报警次数
+        self._slow = deque(maxlen=slow_samples)
+        self._stats = {'statements': 0, 'background_statements': 0, 'slow_queries': 0}
+
+    def init_app(self, app, engine):
+        self.slow_query = app.config.get('METRICS_SLOW_QUERY_MS', self.slow_query * 1000) / 1000
+        self.query_warn = app.config.get('METRICS_QUERY_WARN', self.query_warn)
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish_request)
+        self.watch(engine)
+
+    def watch(self, engine):
+        # 统计该引擎上执行的 SQL；主库之外的引擎（读副本）也需调用
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._on_error)
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_seconds = 0.0
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish_request(self, exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        status = g.get('metrics_status', 500)
+        count = g.get('sql_count', 0)
+        with self._lock:
+            self._latency.setdefault(endpoint, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self._queries.setdefault(endpoint, Histogram(QUERY_COUNT_BUCKETS)).observe(count)
+            key = (endpoint, request.method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._sql_seconds[endpoint] = self._sql_seconds.get(endpoint, 0.0) + g.get('sql_seconds', 0.0)
+            if count > self.query_warn:
+                self._alarms[endpoint] = self._alarms.get(endpoint, 0) + 1
+        if count > self.query_warn:
+            logger.warning("请求 %s %s 执行了 %d 条 SQL（阈值 %d），疑似 N+1 查询",
+                           request.method, request.path, count, self.query_warn)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        in_request = has_request_context()
+        if in_request:
+            g.sql_count = g.get('sql_count', 0) + 1
+            g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+        with self._lock:
+            self._stats['statements' if in_request else 'background_statements'] += 1
+            if elapsed >= self.slow_query:
+                self._stats['slow_queries'] += 1
+                self._slow.append({
+                    'endpoint': request.endpoint if in_request else None,
+                    'seconds': round(elapsed, 4),
+                    'statement': ' '.join(statement.split())[:500],
+                    'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                })
+        if elapsed >= self.slow_query:
+            logger.warning("慢查询 %.3fs：%s", elapsed, ' '.join(statement.split())[:200])
+
+    def _on_error(self, context):
+        # 执行出错时不会触发 after_cursor_execute，这里弹出对应的开始时间
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['alarms'] = dict(self._alarms)
+            stats['slow_samples'] = list(self._slow)
+        return stats
+
+    def render_prometheus(self, gauges=None):
+        # gauges: {子系统名: metrics() 字典}，其中的数值（及一层嵌套的数值字典）按 gauge 输出
+        lines = []
+        with self._lock:
+            lines.append('# TYPE app_requests_total counter')
+            for (endpoint, method, status), n in sorted(self._requests.items()):
+                lines.append(f"app_requests_total{format_labels({'endpoint': endpoint, 'method': method, 'status': status})} {n}")
+            lines.append('# TYPE app_request_duration_seconds histogram')
+            for endpoint, hist in sorted(self._latency.items()):
+                lines.extend(hist.lines('app_request_duration_seconds', {'endpoint': endpoint}))
+            lines.append('# TYPE app_request_queries histogram')
+            for endpoint, hist in sorted(self._queries.items()):
+                lines.extend(hist.lines('app_request_queries', {'endpoint': endpoint}))
+            lines.append('# TYPE app_request_sql_seconds_total counter')
+            for endpoint, seconds in sorted(self._sql_seconds.items()):
+                lines.append(f"app_request_sql_seconds_total{format_labels({'endpoint': endpoint})} {seconds}")
+            lines.append('# TYPE app_request_query_alarms_total counter')
+            for endpoint, n in sorted(self._alarms.items()):
+                lines.append(f"app_request_query_alarms_total{format_labels({'endpoint': endpoint})} {n}")
+            for key, value in self._stats.items():
+                lines.append(f'# TYPE app_sql_{key}_total counter')
+                lines.append(f"app_sql_{key}_total {value}")
+
+        for subsystem, values in (gauges or {}).items():
+            for key, value in values.items():
+                name = f"app_{subsystem}_{key}"
+                if isinstance(value, bool) or value is None:
+                    continue
+                if isinstance(value, (int, float)):
+                    lines.append(f'# TYPE {name} gauge')
+                    lines.append(f"{name} {value}")
+                elif isinstance(value, dict) and value and all(
+                        isinstance(v, (int, float)) and not isinstance(v, bool) for v in value.values()):
+                    lines.append(f'# TYPE {name} gauge')
+                    for label, v in sorted(value.items()):
+                        lines.append(f"{name}{format_labels({'key': label})} {v}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,159 @@
+import hashlib
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+
+SCOPES = ('dept', 'pos', 'ids')
+MODES = ('percent', 'amount')
+MAX_IDS = 5000
+CENT = Decimal('0.01')
+
+# 候选员工连同岗位薪资带、是否部门负责人一次查出，范围裁剪与负责人排除都在内存中完成
+CANDIDATES_SQL = """
+    SELECT e.emp_id, e.name, e.salary, e.pos_id, p.pos_name, p.min_salary, p.max_salary, d.dept_name,
+           EXISTS (SELECT 1 FROM Department m WHERE m.manager_id = e.emp_id) AS is_manager
+    FROM Employee e
+    JOIN Position p ON e.pos_id = p.pos_id
+    JOIN Department d ON p.dept_id = d.dept_id
+    WHERE {condition}
+    ORDER BY e.emp_id
+"""
+SCOPE_CONDITIONS = {
+    'dept': "p.dept_id = :target",
+    'pos': "e.pos_id = :target",
+    'ids': "e.emp_id IN :target",
+}
+
+# 同一批次的员工先加行锁，确认薪资与岗位仍是预览时的值再写入
+LOCK_SQL = """
+    SELECT emp_id, salary, pos_id FROM Employee WHERE emp_id IN :ids FOR UPDATE
+"""
+INSERT_CHANGE = """
+    INSERT INTO PositionChange (emp_id, change_date, old_pos_id, new_pos_id, old_salary, new_salary)
+    VALUES (:emp_id, :change_date, :pos_id, :pos_id, :old_salary, :new_salary)
+"""
+
+
+class AdjustmentError(Exception):
+    pass
+
+
+class AdjustmentPlan:
+    def __init__(self):
+        self.changes = []  # 需要调整的员工：dict(emp_id, name, ..., old_salary, new_salary, clamped)
+        self.managers = []  # 因是部门负责人而排除的员工
+        self.unchanged = 0  # 调整后薪资不变（已在薪资带边界）的人数
+        self.missing = []  # 按编号调整时不存在的编号
+        self.fingerprint = ''
+        self.applied = 0
+        self.skipped = []  # 执行时薪资或岗位已变化而跳过的员工编号
+        self.errors = []  # 执行失败的批次：(首个员工编号, 错误信息)
+
+    @property
+    def clamped(self):
+        return sum(1 for change in self.changes if change['clamped'])
+
+    @property
+    def total_delta(self):
+        return sum((change['new_salary'] - change['old_salary'] for change in self.changes), Decimal(0))
+
+
+def parse_ids(value):
+    ids = list(dict.fromkeys(item.strip() for item in value.replace('\n', ',').split(',') if item.strip()))
+    if not ids:
+        raise AdjustmentError('请填写员工编号')
+    if len(ids) > MAX_IDS:
+        raise AdjustmentError(f'一次最多调整 {MAX_IDS} 名员工')
+    return ids
+
+
+def parse_value(mode, value):
+    if mode not in MODES:
+        raise AdjustmentError('调整方式无效')
+    try:
+        amount = Decimal(value.strip())
+    except (InvalidOperation, AttributeError):
+        raise AdjustmentError('调整幅度必须是数字')
+    if not amount.is_finite() or (mode == 'percent' and amount <= -100):
+        raise AdjustmentError('调整幅度无效')
+    return amount
+
+
+def adjusted_salary(old, mode, amount):
+    if mode == 'percent':
+        new = old * (1 + amount / 100)
+    else:
+        new = old + amount
+    return new.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def plan_adjustment(conn, scope, target, mode, value):
+    # 预览（dry-run）：计算每名员工的新薪资并裁剪到岗位薪资带内，不写数据库
+    if scope not in SCOPES:
+        raise AdjustmentError('调整范围无效')
+    amount = parse_value(mode, value)
+    stmt = text(CANDIDATES_SQL.format(condition=SCOPE_CONDITIONS[scope]))
+    if scope == 'ids':
+        target = parse_ids(target)
+        stmt = stmt.bindparams(bindparam('target', expanding=True))
+    elif not target:
+        raise AdjustmentError('请选择调整范围')
+    rows = conn.execute(stmt, {'target': target}).fetchall()
+
+    plan = AdjustmentPlan()
+    if scope == 'ids':
+        found = {row.emp_id for row in rows}
+        plan.missing = [emp_id for emp_id in target if emp_id not in found]
+    digest = hashlib.sha1(f"{scope}|{target}|{mode}|{amount};".encode('utf-8'))
+    for row in rows:
+        old = Decimal(row.salary)
+        digest.update(f"{row.emp_id}|{old}|{row.pos_id};".encode('utf-8'))
+        if row.is_manager:
+            plan.managers.append({'emp_id': row.emp_id, 'name': row.name, 'dept_name': row.dept_name})
+            continue
+        new = adjusted_salary(old, mode, amount)
+        clamped = min(max(new, Decimal(row.min_salary)), Decimal(row.max_salary))
+        if clamped == old:
+            plan.unchanged += 1
+            continue
+        plan.changes.append({
+            'emp_id': row.emp_id, 'name': row.name, 'pos_id': row.pos_id, 'pos_name': row.pos_name,
+            'dept_name': row.dept_name, 'min_salary': row.min_salary, 'max_salary': row.max_salary,
+            'old_salary': old, 'new_salary': clamped, 'clamped': clamped != new,
+        })
+    # 调整参数及预览时员工集合与薪资的指纹；执行时重新计算，不一致说明数据已变化（或重复提交），需重新预览
+    plan.fingerprint = digest.hexdigest()
+    return plan
+
+
+def apply_adjustment(engine, plan, chunk_size=500):
+    # 按 chunk_size 分批，每批一个事务：锁定本批员工、核对预览时的薪资与岗位，
+    # 再用 executemany 一次插入整批 PositionChange（PyMySQL 会改写成多行 INSERT），
+    # 由触发器校验薪资带并更新 Employee
+    change_date = datetime.now()
+    lock = text(LOCK_SQL).bindparams(bindparam('ids', expanding=True))
+    for start in range(0, len(plan.changes), chunk_size):
+        chunk = plan.changes[start:start + chunk_size]
+        try:
+            with engine.begin() as conn:
+                current = {
+                    row.emp_id: (Decimal(row.salary), row.pos_id)
+                    for row in conn.execute(lock, {'ids': [change['emp_id'] for change in chunk]})
+                }
+                rows = []
+                for change in chunk:
+                    if current.get(change['emp_id']) != (change['old_salary'], change['pos_id']):
+                        plan.skipped.append(change['emp_id'])
+                        continue
+                    rows.append({
+                        'emp_id': change['emp_id'], 'change_date': change_date, 'pos_id': change['pos_id'],
+                        'old_salary': change['old_salary'], 'new_salary': change['new_salary'],
+                    })
+                if rows:
+                    conn.execute(text(INSERT_CHANGE), rows)
+            plan.applied += len(rows)
+        except SQLAlchemyError as e:
+            plan.errors.append((chunk[0]['emp_id'], str(e.orig if hasattr(e, 'orig') else e).splitlines()[0]))
+    return plan
@@ -0,0 +1,43 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from api import ApiError, decode_cursor, encode_cursor, split_list
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(['EMP001', '2024-02-29'])
+    assert '=' not in cursor
+    assert decode_cursor(cursor, 2) == ['EMP001', '2024-02-29']
+
+
+def test_cursor_serializes_dates_and_decimals():
+    # 游标中的日期与金额按 JSON 响应的格式编码，解码后直接作为绑定参数
+    assert decode_cursor(encode_cursor([date(2024, 1, 31), 'EMP002']), 2) == ['2024-01-31', 'EMP002']
+    assert decode_cursor(encode_cursor([Decimal('9500.50'), 'EMP003']), 2) == [9500.5, 'EMP003']
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(['员工' * 10, '?&/+'])
+    assert all(ch.isalnum() or ch in '-_' for ch in cursor)
+    assert decode_cursor(cursor, 2) == ['员工' * 10, '?&/+']
+
+
+@pytest.mark.parametrize('cursor', [
+    '!!!',
+    'bm90IGpzb24',  # "not json"
+    encode_cursor({'emp_id': 'EMP001'}),
+    encode_cursor(['EMP001']),
+    encode_cursor(['EMP001', '2024-01-01', 'extra']),
+])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(ApiError) as info:
+        decode_cursor(cursor, 2)
+    assert info.value.status == 400
+
+
+def test_split_list():
+    assert split_list(' EMP001, ,EMP002,') == ['EMP001', 'EMP002']
+    with pytest.raises(ApiError):
+        split_list('a,b,c', limit=2)
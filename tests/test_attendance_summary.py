@@ -0,0 +1,134 @@
+from collections import namedtuple
+from datetime import date, timedelta
+
+import attendance_summary as summary
+
+Row = namedtuple('Row', 'month day_mask')
+
+
+def days(first, last):
+    # [first, last] 内的每一天
+    return [first + timedelta(days=n) for n in range((last - first).days + 1)]
+
+
+def test_day_bit_uses_bit_30_for_the_31st():
+    assert summary.day_bit(date(2024, 1, 1)) == 1
+    assert summary.day_bit(date(2024, 1, 31)) == 1 << 30
+
+
+def test_month_helpers():
+    assert summary.month_start(date(2024, 2, 29)) == date(2024, 2, 1)
+    assert summary.next_month(date(2024, 1, 1)) == date(2024, 2, 1)
+    assert summary.next_month(date(2024, 12, 1)) == date(2025, 1, 1)
+    assert summary.quarter_start(date(2024, 6, 30)) == date(2024, 4, 1)
+    assert summary.parse_month('2024-02') == date(2024, 2, 1)
+    assert summary.parse_month('2024-13') is None
+    assert summary.parse_month('bad') is None
+    assert summary.parse_month(None) is None
+
+
+def test_mask_dates_round_trips_a_full_31_day_month():
+    month = date(2024, 1, 1)
+    mask = 0
+    for day in days(month, date(2024, 1, 31)):
+        mask |= summary.day_bit(day)
+    assert mask == (1 << 31) - 1
+    assert summary.mask_dates(month, mask) == days(month, date(2024, 1, 31))
+
+
+def test_mask_dates_ignores_bits_past_the_end_of_a_short_month():
+    # 30 天的月份与 2 月没有对应第 30 / 31 天的日期
+    assert summary.mask_dates(date(2024, 4, 1), 1 << 29) == [date(2024, 4, 30)]
+    assert summary.mask_dates(date(2023, 2, 1), (1 << 28) | (1 << 27)) == [date(2023, 2, 28)]
+
+
+def test_range_mask_whole_month_matches_month_length():
+    assert summary.range_mask(date(2024, 1, 1), date(2024, 1, 1), date(2024, 2, 1)) == (1 << 31) - 1
+    assert summary.range_mask(date(2024, 4, 1), date(2024, 1, 1), date(2025, 1, 1)) == (1 << 30) - 1
+    assert summary.range_mask(date(2023, 2, 1), date(2023, 1, 1), date(2023, 12, 1)) == (1 << 28) - 1
+    assert summary.range_mask(date(2024, 2, 1), date(2024, 1, 1), date(2024, 12, 1)) == (1 << 29) - 1
+
+
+def test_range_mask_is_half_open():
+    month = date(2024, 3, 1)
+    mask = summary.range_mask(month, date(2024, 3, 10), date(2024, 3, 20))
+    assert summary.mask_dates(month, mask) == days(date(2024, 3, 10), date(2024, 3, 19))
+    # 只含最后一天：第 31 天对应第 30 位
+    assert summary.range_mask(month, date(2024, 3, 31), date(2024, 4, 1)) == 1 << 30
+
+
+def test_range_mask_outside_the_month_is_empty():
+    month = date(2024, 4, 1)
+    assert summary.range_mask(month, date(2024, 5, 1), date(2024, 6, 1)) == 0
+    assert summary.range_mask(month, date(2024, 3, 1), date(2024, 4, 1)) == 0
+    assert summary.range_mask(month, date(2024, 4, 10), date(2024, 4, 10)) == 0
+
+
+def test_days_present_counts_across_months():
+    summaries = [
+        Row(date(2024, 1, 1), (1 << 31) - 1),  # 1 月每天都打卡
+        Row(date(2024, 2, 1), (1 << 29) - 1),  # 2 月（闰年）每天都打卡
+        Row(date(2024, 4, 1), 1 << 29),        # 4 月 30 日
+    ]
+    assert summary.days_present(summaries, date(2024, 1, 25), date(2024, 2, 5)) == 7 + 4
+    assert summary.days_present(summaries, date(2024, 1, 1), date(2024, 5, 1)) == 31 + 29 + 1
+    assert summary.days_present(summaries, date(2024, 4, 1), date(2024, 4, 30)) == 0
+    assert summary.days_present([], date(2024, 1, 1), date(2025, 1, 1)) == 0
+
+
+def test_workday_mask_marks_weekdays_only():
+    # 2021 年 2 月从周一开始、共 4 周：20 个工作日，没有超出月末的位
+    mask = summary.workday_mask(date(2021, 2, 1))
+    assert bin(mask).count('1') == 20
+    assert mask < 1 << 28
+    assert all(day.weekday() < 5 for day in summary.mask_dates(date(2021, 2, 1), mask))
+    # 2024 年 3 月 31 日是周日，4 月 30 日是周二
+    assert not summary.workday_mask(date(2024, 3, 1)) & 1 << 30
+    assert summary.workday_mask(date(2024, 4, 1)) & 1 << 29
+    assert summary.workday_mask(date(2024, 4, 1)) < 1 << 30
+
+
+def test_is_perfect():
+    month = date(2024, 4, 1)
+    workdays = summary.workday_mask(month)
+    after = date(2024, 5, 1)
+    assert summary.is_perfect(month, workdays, after)
+    # 周末是否打卡不影响
+    assert summary.is_perfect(month, (1 << 30) - 1, after)
+    # 缺一个工作日（4 月 30 日）
+    assert not summary.is_perfect(month, workdays & ~(1 << 29), after)
+    # 尚未结束的月份不算全勤
+    assert not summary.is_perfect(month, workdays, date(2024, 4, 30))
+
+
+def test_summarize_streaks_and_masks():
+    dates = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 2), date(2024, 1, 3),
+             date(2024, 1, 10), date(2024, 1, 30), date(2024, 1, 31)]
+    item = summary.summarize(dates)[date(2024, 1, 1)]
+    assert item['days_present'] == 6
+    assert item['first_date'] == date(2024, 1, 1)
+    assert item['last_date'] == date(2024, 1, 31)
+    assert item['longest_streak'] == 3
+    assert item['current_streak'] == 2
+    assert item['day_mask'] == 0b111 | 1 << 9 | 1 << 29 | 1 << 30
+
+
+def test_summarize_restarts_streaks_each_month():
+    # 连续打卡跨月时按月分别计算，与打卡时的 UPSERT 一致
+    months = summary.summarize(days(date(2024, 2, 27), date(2024, 3, 2)))
+    february, march = months[date(2024, 2, 1)], months[date(2024, 3, 1)]
+    assert (february['days_present'], february['longest_streak']) == (3, 3)
+    assert february['day_mask'] == 0b111 << 26
+    assert (march['days_present'], march['current_streak']) == (2, 2)
+    assert march['day_mask'] == 0b11
+
+
+def test_summarize_of_mask_dates_restores_the_mask():
+    # 重建时先把已有位图展开成日期再与逐天记录合并，展开后重新汇总必须得到同一个位图
+    month = date(2023, 2, 1)
+    mask = 1 | 1 << 13 | 1 << 14 | 1 << 27
+    item = summary.summarize(summary.mask_dates(month, mask))[month]
+    assert item['day_mask'] == mask
+    assert item['days_present'] == 4
+    assert item['longest_streak'] == 2
+    assert item['last_date'] == date(2023, 2, 28)
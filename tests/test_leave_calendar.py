@@ -0,0 +1,86 @@
+import random
+from collections import namedtuple
+from datetime import date, timedelta
+
+import leave_calendar
+
+Leave = namedtuple('Leave', 'emp_id start_date end_date status')
+
+
+def counts(intervals_by_emp, start, end):
+    return dict(leave_calendar.daily_headcount(intervals_by_emp, start, end))
+
+
+def brute_force(intervals_by_emp, start, end):
+    # 逐天逐人判断是否落在某段 [start_date, end_date) 内
+    result = {}
+    day = start
+    while day < end:
+        result[day] = sum(any(lo <= day < hi for lo, hi in intervals) for intervals in intervals_by_emp.values())
+        day += timedelta(days=1)
+    return result
+
+
+def test_end_date_is_exclusive():
+    result = counts({'E1': [(date(2024, 3, 3), date(2024, 3, 5))]}, date(2024, 3, 1), date(2024, 3, 8))
+    assert [day.day for day, n in result.items() if n] == [3, 4]
+
+
+def test_overlapping_and_adjacent_leaves_of_one_employee_count_once():
+    intervals = [(date(2024, 3, 1), date(2024, 3, 4)), (date(2024, 3, 2), date(2024, 3, 6)),
+                 (date(2024, 3, 6), date(2024, 3, 8))]
+    assert leave_calendar.merge_intervals(intervals) == [[date(2024, 3, 1), date(2024, 3, 8)]]
+    result = counts({'E1': intervals}, date(2024, 3, 1), date(2024, 3, 10))
+    assert set(result.values()) == {0, 1}
+    assert result[date(2024, 3, 7)] == 1 and result[date(2024, 3, 8)] == 0
+
+
+def test_leaves_are_clipped_to_the_window():
+    leaves = {
+        'E1': [(date(2024, 1, 20), date(2024, 2, 3))],  # 跨越窗口起点
+        'E2': [(date(2024, 2, 28), date(2024, 3, 10))],  # 跨越窗口终点（闰年 2 月）
+        'E3': [(date(2024, 1, 1), date(2024, 2, 1))],  # 返岗日正好是窗口起点
+        'E4': [(date(2024, 3, 1), date(2024, 3, 2))],  # 起点正好是窗口终点
+    }
+    start, end = date(2024, 2, 1), date(2024, 3, 1)
+    result = counts(leaves, start, end)
+    assert len(result) == 29
+    assert result[date(2024, 2, 1)] == 1 and result[date(2024, 2, 2)] == 1 and result[date(2024, 2, 3)] == 0
+    assert result[date(2024, 2, 28)] == 1 and result[date(2024, 2, 29)] == 1
+    assert result == brute_force(leaves, start, end)
+
+
+def test_matches_brute_force_on_random_leaves():
+    rng = random.Random(7)
+    start, end = date(2023, 2, 1), date(2023, 5, 1)
+    leaves = {}
+    for n in range(40):
+        intervals = []
+        for _ in range(rng.randint(1, 4)):
+            lo = date(2023, 1, 15) + timedelta(days=rng.randint(0, 110))
+            intervals.append((lo, lo + timedelta(days=rng.randint(1, 20))))
+        leaves[f'E{n}'] = intervals
+    assert counts(leaves, start, end) == brute_force(leaves, start, end)
+
+
+def test_build_calendar_separates_approved_from_pending():
+    leaves = [
+        Leave('E1', date(2024, 4, 29), date(2024, 5, 2), '已批准'),
+        Leave('E2', date(2024, 4, 30), date(2024, 5, 1), '待审批'),
+    ]
+    calendar = leave_calendar.build_calendar(leaves, date(2024, 4, 28), date(2024, 5, 3))
+    assert calendar == [
+        (date(2024, 4, 28), 0, 0),
+        (date(2024, 4, 29), 1, 1),
+        (date(2024, 4, 30), 1, 2),
+        (date(2024, 5, 1), 1, 1),
+        (date(2024, 5, 2), 0, 0),
+    ]
+
+
+def test_parse_range_defaults_to_the_current_month_and_caps_length():
+    assert leave_calendar.parse_range(None, None, today=date(2024, 2, 15)) == (date(2024, 2, 1), date(2024, 3, 1))
+    assert leave_calendar.parse_range('2024-04-01', 'bad', today=date(2024, 2, 15)) == \
+        (date(2024, 4, 1), date(2024, 5, 1))
+    start, end = leave_calendar.parse_range('2024-01-01', '2024-12-31')
+    assert end - start == timedelta(days=leave_calendar.MAX_DAYS)
@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import salary_adjust
+from salary_adjust import AdjustmentError, plan_adjustment
+
+SCHEMA = [
+    "CREATE TABLE Department (dept_id TEXT PRIMARY KEY, dept_name TEXT, manager_id TEXT)",
+    "CREATE TABLE Position (pos_id TEXT PRIMARY KEY, pos_name TEXT, dept_id TEXT, min_salary DECIMAL(10,2),"
+    " max_salary DECIMAL(10,2))",
+    "CREATE TABLE Employee (emp_id TEXT PRIMARY KEY, name TEXT, pos_id TEXT, salary DECIMAL(10,2))",
+]
+EMPLOYEES = [
+    ('EMP001', '负责人', 'TECH001', 9000),
+    ('EMP002', '张三', 'TECH001', 9000),
+    ('EMP003', '李四', 'TECH001', 8200),
+    ('EMP004', '王五', 'TECH001', 9500),
+    ('EMP005', '赵六', 'TECH002', 12000),
+]
+
+
+@pytest.fixture
+def conn():
+    # 内存 SQLite 上的最小表结构：预览只读 Employee / Position / Department
+    engine = create_engine('sqlite://')
+    with engine.connect() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO Department VALUES ('TECH', '技术部', 'EMP001')"))
+        conn.execute(text("INSERT INTO Position VALUES (:p, :n, 'TECH', :lo, :hi)"), [
+            {'p': 'TECH001', 'n': '工程师', 'lo': 8000, 'hi': 9500},
+            {'p': 'TECH002', 'n': '架构师', 'lo': 11000, 'hi': 15000},
+        ])
+        conn.execute(text("INSERT INTO Employee VALUES (:e, :n, :p, :s)"),
+                     [{'e': e, 'n': n, 'p': p, 's': s} for e, n, p, s in EMPLOYEES])
+        yield conn
+
+
+def by_id(plan):
+    return {change['emp_id']: change for change in plan.changes}
+
+
+def test_raise_is_clamped_to_the_band_maximum(conn):
+    plan = plan_adjustment(conn, 'pos', 'TECH001', 'percent', '10')
+    changes = by_id(plan)
+    assert changes['EMP002']['new_salary'] == Decimal('9500')
+    assert changes['EMP002']['clamped']
+    assert changes['EMP003']['new_salary'] == Decimal('9020.00')
+    assert not changes['EMP003']['clamped']
+    # 已在上限的员工调整后不变，不进入变更列表
+    assert 'EMP004' not in changes
+    assert plan.unchanged == 1
+    assert plan.clamped == 1
+    assert plan.total_delta == Decimal('500') + Decimal('820.00')
+
+
+def test_cut_is_clamped_to_the_band_minimum(conn):
+    plan = plan_adjustment(conn, 'dept', 'TECH', 'amount', '-1000')
+    changes = by_id(plan)
+    assert changes['EMP003']['new_salary'] == Decimal('8000') and changes['EMP003']['clamped']
+    assert changes['EMP005']['new_salary'] == Decimal('11000') and not changes['EMP005']['clamped']
+
+
+def test_department_managers_are_excluded(conn):
+    plan = plan_adjustment(conn, 'dept', 'TECH', 'percent', '1')
+    assert [m['emp_id'] for m in plan.managers] == ['EMP001']
+    assert 'EMP001' not in by_id(plan)
+
+
+def test_missing_ids_are_reported(conn):
+    plan = plan_adjustment(conn, 'ids', 'EMP003, EMP404\nEMP003', 'amount', '100')
+    assert plan.missing == ['EMP404']
+    assert list(by_id(plan)) == ['EMP003']
+
+
+def test_fingerprint_is_stable_for_the_same_data(conn):
+    first = plan_adjustment(conn, 'pos', 'TECH001', 'percent', '5')
+    second = plan_adjustment(conn, 'pos', 'TECH001', 'percent', '5')
+    assert first.fingerprint == second.fingerprint
+
+
+def test_fingerprint_changes_with_parameters_and_data(conn):
+    base = plan_adjustment(conn, 'pos', 'TECH001', 'percent', '5').fingerprint
+    assert plan_adjustment(conn, 'pos', 'TECH001', 'percent', '6').fingerprint != base
+    assert plan_adjustment(conn, 'pos', 'TECH001', 'amount', '5').fingerprint != base
+    # 预览之后有员工薪资变化：执行时重新计算的指纹不再一致
+    conn.execute(text("UPDATE Employee SET salary = 8300 WHERE emp_id = 'EMP003'"))
+    assert plan_adjustment(conn, 'pos', 'TECH001', 'percent', '5').fingerprint != base
+    # 岗位上下限变化不影响预览数据中的员工集合与薪资
+    conn.execute(text("UPDATE Employee SET salary = 8200 WHERE emp_id = 'EMP003'"))
+    assert plan_adjustment(conn, 'pos', 'TECH001', 'percent', '5').fingerprint == base
+
+
+@pytest.mark.parametrize('scope, target, mode, value', [
+    ('team', 'TECH', 'percent', '5'),
+    ('dept', '', 'percent', '5'),
+    ('ids', ' , ', 'percent', '5'),
+    ('dept', 'TECH', 'ratio', '5'),
+    ('dept', 'TECH', 'percent', 'abc'),
+    ('dept', 'TECH', 'percent', 'NaN'),
+    ('dept', 'TECH', 'percent', '-100'),
+])
+def test_invalid_input_is_rejected(conn, scope, target, mode, value):
+    with pytest.raises(AdjustmentError):
+        plan_adjustment(conn, scope, target, mode, value)
+
+
+def test_too_many_ids_are_rejected():
+    with pytest.raises(AdjustmentError):
+        salary_adjust.parse_ids(','.join(f'EMP{n}' for n in range(salary_adjust.MAX_IDS + 1)))
+
+
+def test_adjusted_salary_rounds_half_up_to_cents():
+    assert salary_adjust.adjusted_salary(Decimal('8888.88'), 'percent', Decimal('3')) == Decimal('9155.55')
+    assert salary_adjust.adjusted_salary(Decimal('100.01'), 'percent', Decimal('50')) == Decimal('150.02')
+    assert salary_adjust.adjusted_salary(Decimal('9000'), 'amount', Decimal('-0.005')) == Decimal('9000.00')